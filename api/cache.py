@@ -0,0 +1,159 @@
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT
+from django.core.cache.backends.locmem import LocMemCache
+
+# Taille totale (en octets) des entrées de chaque cache borné, partagée par nom
+# comme les données de LocMemCache.
+_sizes = {}
+
+
+class SizeBoundedLocMemCache(LocMemCache):
+    """
+    Cache mémoire local borné en octets (option ``MAX_SIZE``).
+
+    Les entrées les moins récemment lues sont évincées (LRU) dès que la taille
+    totale des valeurs dépasse le plafond.
+    """
+
+    def __init__(self, name, params):
+        super().__init__(name, params)
+        options = params.get('OPTIONS', {})
+        self._max_size = int(options.get('MAX_SIZE', 64 * 1024 * 1024))
+        self._size = _sizes.setdefault(name, [0])
+
+    def _set(self, key, value, timeout=DEFAULT_TIMEOUT):
+        self._delete(key)
+        if len(value) > self._max_size:
+            return
+        while self._cache and self._size[0] + len(value) > self._max_size:
+            self._evict_lru()
+        super()._set(key, value, timeout)
+        self._size[0] += len(value)
+
+    def _evict_lru(self):
+        key, value = self._cache.popitem()
+        self._expire_info.pop(key, None)
+        self._size[0] -= len(value)
+
+    def _cull(self):
+        if self._cull_frequency == 0:
+            self.clear_unlocked()
+        else:
+            for _ in range(len(self._cache) // self._cull_frequency):
+                self._evict_lru()
+
+    def _delete(self, key):
+        value = self._cache.get(key)
+        deleted = super()._delete(key)
+        if deleted:
+            self._size[0] -= len(value)
+        return deleted
+
+    def clear_unlocked(self):
+        self._cache.clear()
+        self._expire_info.clear()
+        self._size[0] = 0
+
+    def clear(self):
+        with self._lock:
+            self.clear_unlocked()
+
+
+class PlanPayloadCache:
+    """
+    Cache des réponses JSON déjà rendues des plans.
+
+    Une entrée est indexée par l'identifiant du plan et contient sa version
+    (ETag) avec le contenu rendu : une entrée d'une version antérieure n'est
+    jamais servie, même si l'invalidation explicite n'a pas atteint ce processus.
+    """
+
+    def __init__(self, alias=None):
+        self.alias = alias
+
+    @property
+    def cache(self):
+        return caches[self.alias or getattr(settings, 'PLAN_PAYLOAD_CACHE_ALIAS', 'plans')]
+
+    @staticmethod
+    def make_key(plan_id):
+        return f'plan-payload:{plan_id}'
+
+    def get(self, plan_id, version):
+        entry = self.cache.get(self.make_key(plan_id))
+        if entry is None:
+            return None
+        cached_version, content = entry
+        return content if cached_version == version else None
+
+    def set(self, plan_id, version, content):
+        self.cache.set(self.make_key(plan_id), (version, content), timeout=None)
+
+    def invalidate(self, *plan_ids):
+        self.cache.delete_many([self.make_key(plan_id) for plan_id in plan_ids])
+
+
+plan_payload_cache = PlanPayloadCache()
+
+
+class TileCache:
+    """
+    Cache des tuiles vectorielles encodées. La clé contient l'empreinte des
+    versions des plans de la tuile : une tuile n'est réencodée qu'après une
+    écriture sur l'un d'eux, sans invalidation explicite (les entrées
+    périmées ne sont plus lues et finissent évincées).
+    """
+
+    def __init__(self, alias=None):
+        self.alias = alias
+
+    @property
+    def cache(self):
+        return caches[self.alias or getattr(settings, 'PLAN_TILE_CACHE_ALIAS', 'plans')]
+
+    @staticmethod
+    def make_key(z, x, y, digest):
+        return f'tile:{z}/{x}/{y}:{digest}'
+
+    def get(self, z, x, y, digest):
+        return self.cache.get(self.make_key(z, x, y, digest))
+
+    def set(self, z, x, y, digest, content):
+        self.cache.set(self.make_key(z, x, y, digest), content, timeout=None)
+
+
+tile_cache = TileCache()
+
+
+class PlanResultCache:
+    """
+    Cache de résultats calculés à partir du contenu d'un plan (couverture,
+    graphe du réseau...).
+    La clé contient la version du plan : un résultat n'est recalculé qu'après
+    une écriture sur le plan, sans invalidation explicite.
+    """
+
+    def __init__(self, name, alias=None):
+        self.name = name
+        self.alias = alias
+
+    @property
+    def cache(self):
+        return caches[self.alias or getattr(settings, 'PLAN_RESULT_CACHE_ALIAS', 'plans')]
+
+    def make_key(self, plan_id, version):
+        return f'{self.name}:{plan_id}:{version}'
+
+    def get_or_compute(self, plan, compute):
+        """Résultat de ``compute()`` pour la version courante de ``plan``."""
+        key = self.make_key(plan.id, plan.version)
+        result = self.cache.get(key)
+        if result is None:
+            result = compute()
+            self.cache.set(key, result, timeout=None)
+        return result
+
+
+coverage_cache = PlanResultCache('coverage')
+network_cache = PlanResultCache('network')
@@ -0,0 +1,115 @@
+import io
+import zlib
+
+from django.conf import settings
+from django.http import JsonResponse
+from django.middleware.gzip import GZipMiddleware
+
+from .instrumentation import timed
+
+# Paramètre ``wbits`` de zlib selon l'encodage (deflate : flux zlib, RFC 9110)
+DECODERS = {
+    'gzip': 16 + zlib.MAX_WBITS,
+    'x-gzip': 16 + zlib.MAX_WBITS,
+    'deflate': zlib.MAX_WBITS,
+}
+CHUNK_SIZE = 64 * 1024
+# Limite sans API_MAX_DECOMPRESSED_SIZE ni DATA_UPLOAD_MAX_MEMORY_SIZE
+DEFAULT_MAX_DECOMPRESSED_SIZE = 50 * 1024 * 1024
+
+
+class RequestTooLarge(Exception):
+    pass
+
+
+def max_decompressed_size():
+    """
+    Taille maximale d'un corps décompressé : ``API_MAX_DECOMPRESSED_SIZE``, à
+    défaut la limite des corps non compressés (``DATA_UPLOAD_MAX_MEMORY_SIZE``),
+    pour qu'une requête compressée n'accepte pas plus qu'une requête en clair.
+    """
+    size = getattr(settings, 'API_MAX_DECOMPRESSED_SIZE', None)
+    if size is None:
+        size = settings.DATA_UPLOAD_MAX_MEMORY_SIZE
+    return DEFAULT_MAX_DECOMPRESSED_SIZE if size is None else size
+
+
+def decompress(body, encoding, max_size):
+    """
+    Décompresse ``body`` par morceaux, sans jamais produire plus de
+    ``max_size`` octets (protection contre les bombes de décompression).
+    """
+    decoder = zlib.decompressobj(DECODERS[encoding])
+    chunks, size = [], 0
+    data = body
+    while data:
+        chunk = decoder.decompress(data, CHUNK_SIZE)
+        size += len(chunk)
+        if size > max_size:
+            raise RequestTooLarge
+        chunks.append(chunk)
+        data = decoder.unconsumed_tail
+    chunk = decoder.flush()
+    size += len(chunk)
+    if size > max_size:
+        raise RequestTooLarge
+    chunks.append(chunk)
+    if not decoder.eof:
+        raise zlib.error('flux compressé incomplet')
+    return b''.join(chunks)
+
+
+class RequestDecompressionMiddleware:
+    """
+    Accepte les corps de requête compressés (``Content-Encoding: gzip`` ou
+    ``deflate``) sur les routes des plans : l'éditeur peut envoyer la géométrie
+    complète d'un plan compressée. Le corps est décompressé avant d'atteindre
+    les vues, dans la limite de ``max_decompressed_size()`` octets (413 au-delà).
+    """
+    path_prefix = '/api/plans/'
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        encoding = request.META.get('HTTP_CONTENT_ENCODING', '').strip().lower()
+        if not encoding or encoding == 'identity' or not request.path_info.startswith(self.path_prefix):
+            return self.get_response(request)
+        if encoding not in DECODERS:
+            return JsonResponse({'detail': f'Encodage non supporté : {encoding}'}, status=415)
+
+        try:
+            body = decompress(request.body, encoding, max_decompressed_size())
+        except RequestTooLarge:
+            return JsonResponse({'detail': 'Corps de requête décompressé trop volumineux'}, status=413)
+        except zlib.error:
+            return JsonResponse({'detail': 'Corps de requête compressé invalide'}, status=400)
+
+        # Le reste de la pile lit le corps décompressé comme s'il avait été envoyé tel quel
+        request._body = body
+        request._stream = io.BytesIO(body)
+        request.META['CONTENT_LENGTH'] = str(len(body))
+        del request.META['HTTP_CONTENT_ENCODING']
+        return self.get_response(request)
+
+
+class ResponseCompressionMiddleware(GZipMiddleware):
+    """
+    Compression gzip des réponses de l'API au-delà de ``API_COMPRESSION_MIN_SIZE``
+    octets. Les réponses en flux (``?stream=true``) sont compressées morceau par
+    morceau au fil de l'envoi, sans être mises en mémoire ; leur taille n'étant
+    pas connue à l'avance, elles sont toujours compressées.
+
+    Les ETag forts des réponses compressées deviennent faibles (RFC 9110) ;
+    ``If-Match`` accepte les deux formes (voir ``api.conditional.expected_version``).
+    """
+    path_prefix = '/api/'
+
+    def process_response(self, request, response):
+        if not request.path_info.startswith(self.path_prefix):
+            return response
+        min_size = getattr(settings, 'API_COMPRESSION_MIN_SIZE', 1024)
+        if not response.streaming and len(response.content) < min_size:
+            return response
+        with timed('compression'):
+            return super().process_response(request, response)
@@ -0,0 +1,159 @@
+import hashlib
+
+from django.db.models import Count, Max
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from django.utils.http import http_date, parse_etags, quote_etag
+from rest_framework import status
+from rest_framework.exceptions import APIException, ValidationError
+from rest_framework.response import Response
+
+
+def _digest(*parts):
+    return hashlib.sha1('|'.join(str(part) for part in parts).encode()).hexdigest()
+
+
+def compute_etag(*parts, weak=False):
+    """Construit un ETag à partir d'une liste de valeurs."""
+    etag = quote_etag(_digest(*parts))
+    return f'W/{etag}' if weak else etag
+
+
+# Utilisateurs affichés dans la représentation d'un plan (créateur avec le nom
+# de son concessionnaire, usine, concessionnaire et agriculteur)
+DISPLAYED_USERS = ('createur', 'createur__concessionnaire', 'usine', 'concessionnaire', 'agriculteur')
+
+
+def plan_etag(queryset, pk):
+    """
+    Retourne l'ETag fort du plan ``pk`` (ou ``None`` s'il n'est pas visible),
+    sans charger ni sérialiser le plan.
+
+    La version du plan est incrémentée à chaque écriture du plan ou de ses
+    formes, connexions et annotations ; la date de modification des
+    utilisateurs affichés (voir ``DISPLAYED_USERS``) sert de version à leurs
+    détails : les deux suffisent à identifier le contenu. L'ETag juxtapose
+    l'empreinte du plan et celle des utilisateurs : seule la première compte
+    pour ``If-Match`` (voir ``expected_version``), la modification d'un
+    utilisateur ne met pas en conflit les écritures du plan.
+    """
+    values = (
+        queryset.select_related(None)
+        .prefetch_related(None)
+        .filter(pk=pk)
+        .values_list('id', 'version', 'date_modification',
+                     *(f'{user}__date_modification' for user in DISPLAYED_USERS))
+        .first()
+    )
+    if values is None:
+        return None
+    return quote_etag(f'{_digest(*values[:3])}.{_digest(*values[3:])}')
+
+
+def stored_plan_etag(plan):
+    """
+    ETag actuel de la représentation du plan, celui que renvoie sa lecture
+    (ETag des réponses aux écritures).
+    """
+    return plan_etag(type(plan).objects.all(), plan.pk)
+
+
+def plan_instance_etag(plan):
+    """
+    ETag fort d'une ressource calculée à partir des seuls éléments d'un plan
+    déjà chargé (mesures, couverture, réseau), qui n'affiche pas d'utilisateur.
+    C'est aussi l'empreinte du plan en tête de son ETag (voir ``plan_etag``).
+    """
+    return compute_etag(plan.id, plan.version, plan.date_modification)
+
+
+def list_etag(queryset):
+    """
+    ETag faible d'une liste de plans, en une requête : nombre de plans visibles,
+    date de la dernière modification d'un plan et d'un utilisateur affiché.
+
+    Une suppression ne change pas la date maximale, seulement le nombre : la
+    liste n'a donc pas de validateur Last-Modified (If-Modified-Since n'y est
+    pas pris en compte).
+    """
+    stats = queryset.select_related(None).prefetch_related(None).order_by().aggregate(
+        count=Count('id'),
+        last_modified=Max('date_modification'),
+        **{f'utilisateur_{index}': Max(f'{user}__date_modification') for index, user in enumerate(DISPLAYED_USERS)},
+    )
+    return compute_etag(*stats.values(), weak=True)
+
+
+def _strip_weak(etag):
+    return etag[2:] if etag.startswith('W/') else etag
+
+
+def _plan_digest(etag):
+    """Empreinte du plan en tête d'un ETag de plan (sans celle des utilisateurs)."""
+    return _strip_weak(etag).strip('"').split('.', 1)[0]
+
+
+def etag_matches(request, etag):
+    """Comparaison faible de l'ETag avec l'en-tête If-None-Match."""
+    header = request.META.get('HTTP_IF_NONE_MATCH')
+    if not header or etag is None:
+        return False
+    etags = parse_etags(header)
+    return '*' in etags or _strip_weak(etag) in {_strip_weak(value) for value in etags}
+
+
+def set_validators(response, etag=None, last_modified=None):
+    """Ajoute les validateurs et impose une revalidation à chaque lecture."""
+    if etag is not None:
+        response['ETag'] = etag
+    if last_modified is not None:
+        response['Last-Modified'] = http_date(last_modified)
+    patch_cache_control(response, private=True, no_cache=True)
+    patch_vary_headers(response, ('Authorization', 'Cookie'))
+    return response
+
+
+def not_modified_response(etag=None, last_modified=None):
+    return set_validators(Response(status=status.HTTP_304_NOT_MODIFIED), etag, last_modified)
+
+
+class PlanVersionConflict(APIException):
+    """Écriture conditionnelle refusée : le plan a changé depuis la version du client."""
+    status_code = status.HTTP_409_CONFLICT
+    default_code = 'conflict'
+
+    def __init__(self, current_version):
+        super().__init__({
+            'detail': 'Le plan a été modifié depuis la version indiquée',
+            'version': current_version,
+        })
+
+
+def expected_version(request, plan, field=None):
+    """
+    Version du plan attendue par une écriture conditionnelle, ou ``None``.
+
+    Lue dans l'en-tête ``If-Match`` (ETag obtenu à la lecture du plan ;
+    ``*`` désactive le contrôle) ou, à défaut et si ``field`` est indiqué,
+    dans ce champ du corps de la requête. Un ETag qui ne correspond plus au
+    plan lève ``PlanVersionConflict``.
+    """
+    header = request.META.get('HTTP_IF_MATCH')
+    if header:
+        etags = parse_etags(header)
+        if '*' in etags:
+            return None
+        # Comparaison de la seule empreinte du plan, sans le préfixe faible : la
+        # compression des réponses affaiblit les ETag
+        digest = _digest(plan.id, plan.version, plan.date_modification)
+        if digest not in {_plan_digest(etag) for etag in etags}:
+            raise PlanVersionConflict(plan.version)
+        return plan.version
+
+    if field is None or not hasattr(request.data, 'get'):
+        return None
+    value = request.data.get(field)
+    if value is None:
+        return None
+    if not isinstance(value, int) or isinstance(value, bool):
+        raise ValidationError({field: 'La version doit être un entier'})
+    return value
@@ -0,0 +1,166 @@
+import logging
+import random
+import time
+from contextlib import ExitStack, contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger('api.performance')
+
+_current_metrics = ContextVar('api_request_metrics', default=None)
+
+
+class RequestMetrics:
+    """Mesures accumulées pendant le traitement d'une requête."""
+
+    def __init__(self):
+        self.sql_count = 0
+        self.sql_time = 0.0
+        self.timings = {}
+        self.view_start = None
+        self.view_end = None
+        self.view_time = None
+        self._active = set()
+
+    def __call__(self, execute, sql, params, many, context):
+        # Enveloppe d'exécution SQL (connection.execute_wrapper)
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.sql_count += 1
+            self.sql_time += time.perf_counter() - start
+
+    def add(self, name, duration):
+        self.timings[name] = self.timings.get(name, 0.0) + duration
+
+
+def current_metrics():
+    """Retourne les mesures de la requête en cours, ou ``None`` si elle n'est pas instrumentée."""
+    return _current_metrics.get()
+
+
+@contextmanager
+def timed(name):
+    """
+    Ajoute la durée du bloc à la mesure ``name`` de la requête en cours.
+
+    Ne coûte rien hors d'une requête instrumentée. Les blocs imbriqués de même
+    nom (sérialiseurs imbriqués) ne sont comptés qu'une fois.
+    """
+    metrics = _current_metrics.get()
+    if metrics is None or name in metrics._active:
+        yield
+        return
+    metrics._active.add(name)
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        metrics._active.discard(name)
+        metrics.add(name, time.perf_counter() - start)
+
+
+def _ms(seconds):
+    return round(seconds * 1000, 2)
+
+
+class ServerTimingMiddleware:
+    """
+    Mesure les requêtes de l'API : nombre et durée des requêtes SQL, temps de
+    sérialisation, temps de la vue (jusqu'à ce qu'elle retourne sa réponse),
+    temps de rendu et de compression de la réponse, et temps total.
+
+    Les mesures sont renvoyées dans l'en-tête ``Server-Timing`` si
+    ``API_SERVER_TIMING`` est activé, et journalisées (logger ``api.performance``)
+    pour une fraction ``API_TIMING_SAMPLE_RATE`` des requêtes. Les requêtes qui
+    ne sont ni exposées ni échantillonnées ne sont pas instrumentées.
+
+    Les réponses en flux (``?stream=true``) ne sont mesurées que jusqu'à l'envoi
+    des en-têtes.
+    """
+    path_prefix = '/api/'
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        header_enabled = getattr(settings, 'API_SERVER_TIMING', False)
+        sample_rate = getattr(settings, 'API_TIMING_SAMPLE_RATE', 0.0)
+        sampled = sample_rate > 0 and random.random() < sample_rate
+        if not (header_enabled or sampled) or not request.path_info.startswith(self.path_prefix):
+            return self.get_response(request)
+
+        metrics = RequestMetrics()
+        token = _current_metrics.set(metrics)
+        start = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(metrics))
+                response = self.get_response(request)
+        finally:
+            _current_metrics.reset(token)
+        end = time.perf_counter()
+        total = end - start
+        if metrics.view_start is not None:
+            if metrics.view_end is None:
+                # Réponse sans rendu différé : depuis la vue, elle n'a traversé que
+                # les middlewares, dont la compression (mesurée à part)
+                metrics.view_end = end - metrics.timings.get('compression', 0.0)
+            metrics.view_time = metrics.view_end - metrics.view_start
+
+        if header_enabled:
+            response['Server-Timing'] = self.server_timing(metrics, total)
+        if sampled:
+            self.log(request, response, metrics, total)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        metrics = _current_metrics.get()
+        if metrics is not None:
+            metrics.view_start = time.perf_counter()
+        return None
+
+    def process_template_response(self, request, response):
+        """
+        Fin de la vue : appelé dès son retour, avant le rendu de la réponse
+        (réponses DRF), dont la durée est mesurée à part (``render``).
+        """
+        metrics = _current_metrics.get()
+        if metrics is not None:
+            metrics.view_end = time.perf_counter()
+
+            def rendered(response):
+                metrics.add('render', time.perf_counter() - metrics.view_end)
+
+            response.add_post_render_callback(rendered)
+        return response
+
+    def server_timing(self, metrics, total):
+        entries = [f'db;dur={_ms(metrics.sql_time)};desc="SQL x{metrics.sql_count}"']
+        for name, duration in metrics.timings.items():
+            entries.append(f'{name};dur={_ms(duration)}')
+        if metrics.view_time is not None:
+            entries.append(f'view;dur={_ms(metrics.view_time)}')
+        entries.append(f'total;dur={_ms(total)}')
+        return ', '.join(entries)
+
+    def log(self, request, response, metrics, total):
+        record = {
+            'method': request.method,
+            'path': request.path_info,
+            'status': response.status_code,
+            'sql_count': metrics.sql_count,
+            'sql_ms': _ms(metrics.sql_time),
+            'view_ms': _ms(metrics.view_time) if metrics.view_time is not None else None,
+            'total_ms': _ms(total),
+        }
+        record.update({f'{name}_ms': _ms(duration) for name, duration in metrics.timings.items()})
+        logger.info(
+            '%(method)s %(path)s %(status)s %(total_ms)sms (%(sql_count)s requêtes SQL)',
+            record,
+            extra={'metrics': record},
+        )
@@ -0,0 +1,64 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Q
+
+from plans.models import Connexion, FormeGeometrique, Plan, forme_geometry, simplify_pyramid
+
+
+class Command(BaseCommand):
+    help = (
+        "Calcule les champs géométriques dérivés des éléments existants : géométrie et "
+        "points simplifiés des formes, points simplifiés des connexions. Traite les plans "
+        "par lots ; seules les formes sans géométrie sont traitées, sauf avec --all "
+        "(à utiliser après un changement de PLAN_SIMPLIFY_ZOOMS). La version des plans "
+        "n'est pas modifiée."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--plans', type=int, default=100, help='Nombre de plans traités par transaction')
+        parser.add_argument('--batch-size', type=int, default=500, help='Taille des lots de bulk_update')
+        parser.add_argument('--all', action='store_true', help='Recalculer aussi les éléments déjà renseignés')
+
+    def handle(self, *args, **options):
+        formes = FormeGeometrique.objects.all()
+        connexions = Connexion.objects.all()
+        if not options['all']:
+            formes = formes.filter(geometrie__isnull=True)
+            connexions = connexions.filter(simplifications={})
+        plan_ids = list(
+            Plan.objects.filter(Q(id__in=formes.values('plan_id')) | Q(id__in=connexions.values('plan_id')))
+            .order_by('id')
+            .values_list('id', flat=True)
+        )
+
+        updated = missing = 0
+        for start in range(0, len(plan_ids), options['plans']):
+            batch = plan_ids[start:start + options['plans']]
+            with transaction.atomic():
+                to_update = []
+                for forme in formes.filter(plan_id__in=batch).only('id', 'type_forme', 'data').iterator(
+                    chunk_size=options['batch_size']
+                ):
+                    forme.geometrie = forme_geometry(forme.type_forme, forme.data)
+                    if forme.geometrie is None:
+                        missing += 1
+                        continue
+                    forme.simplifications = simplify_pyramid(forme.geometrie) if 'points' in forme.data else {}
+                    to_update.append(forme)
+                FormeGeometrique.objects.bulk_update(
+                    to_update, ['geometrie', 'simplifications'], batch_size=options['batch_size']
+                )
+
+                to_simplify = []
+                for connexion in connexions.filter(plan_id__in=batch).only('id', 'geometrie').iterator(
+                    chunk_size=options['batch_size']
+                ):
+                    connexion.simplifications = simplify_pyramid(connexion.geometrie)
+                    to_simplify.append(connexion)
+                Connexion.objects.bulk_update(to_simplify, ['simplifications'], batch_size=options['batch_size'])
+            updated += len(to_update) + len(to_simplify)
+            self.stdout.write(f"{min(start + len(batch), len(plan_ids))}/{len(plan_ids)} plans, {updated} éléments")
+
+        self.stdout.write(self.style.SUCCESS(f"{updated} éléments mis à jour"))
+        if missing:
+            self.stdout.write(self.style.WARNING(f"{missing} formes sans géométrie exploitable"))
@@ -0,0 +1,83 @@
+import math
+import random
+import timeit
+
+from django.core.management.base import BaseCommand
+
+from api.renderers import dumps, loads, orjson
+
+
+def build_plan_payload(formes_count, points_per_shape, seed=0):
+    """Construit un plan fictif mais réaliste (formes variées, longues polylignes)."""
+    rng = random.Random(seed)
+    origin = (2.35, 48.85)
+    formes = []
+    for index in range(formes_count):
+        lng = origin[0] + rng.uniform(-0.05, 0.05)
+        lat = origin[1] + rng.uniform(-0.05, 0.05)
+        style = {'color': '#3388ff', 'weight': 3, 'opacity': 1, 'fillColor': '#3388ff', 'fillOpacity': 0.2}
+        kind = index % 4
+        if kind == 0:
+            data = {'center': [lng, lat], 'radius': rng.uniform(5, 80), 'style': style}
+            type_forme = 'CERCLE'
+        elif kind == 1:
+            data = {
+                'bounds': {'southWest': [lng, lat], 'northEast': [lng + 0.001, lat + 0.001]},
+                'rotation': rng.uniform(0, 90),
+                'style': style,
+            }
+            type_forme = 'RECTANGLE'
+        else:
+            data = {
+                'points': [
+                    [lng + 0.0001 * math.cos(step / 10) * step, lat + 0.0001 * math.sin(step / 10) * step]
+                    for step in range(points_per_shape)
+                ],
+                'style': style,
+            }
+            type_forme = 'LIGNE' if kind == 2 else 'POLYGON'
+        formes.append({'id': index + 1, 'plan': 1, 'type_forme': type_forme, 'data': data})
+    return {
+        'id': 1,
+        'nom': 'Plan de démonstration',
+        'description': 'Parcelles et réseau d\'irrigation',
+        'date_creation': '2025-03-01T10:00:00Z',
+        'date_modification': '2025-03-02T10:00:00Z',
+        'formes': formes,
+        'connexions': [],
+        'annotations': [],
+        'preferences': {'currentTool': '', 'currentStyle': {'strokeWidth': 2}},
+        'elements': [],
+    }
+
+
+class Command(BaseCommand):
+    help = "Compare l'encodage/décodage JSON des réponses de plans (orjson vs json)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--formes', type=int, default=2000)
+        parser.add_argument('--points', type=int, default=200)
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def handle(self, *args, **options):
+        payload = build_plan_payload(options['formes'], options['points'])
+        backends = ['json'] + (['orjson'] if orjson is not None else [])
+        if orjson is None:
+            self.stdout.write(self.style.WARNING("orjson n'est pas installé : seul le repli json est mesuré"))
+
+        content = dumps(payload, backend='json')
+        self.stdout.write(f"Charge utile : {len(payload['formes'])} formes, {len(content) / 1024 / 1024:.1f} Mo")
+
+        results = {}
+        for backend in backends:
+            encode = min(timeit.repeat(lambda: dumps(payload, backend=backend), number=1, repeat=options['repeat']))
+            decode = min(timeit.repeat(lambda: loads(content, backend=backend), number=1, repeat=options['repeat']))
+            results[backend] = (encode, decode)
+            self.stdout.write(f"{backend:>7} : encodage {encode * 1000:8.1f} ms, décodage {decode * 1000:8.1f} ms")
+
+        if 'orjson' in results:
+            encode_ratio = results['json'][0] / results['orjson'][0]
+            decode_ratio = results['json'][1] / results['orjson'][1]
+            self.stdout.write(self.style.SUCCESS(
+                f"Gain orjson : x{encode_ratio:.1f} à l'encodage, x{decode_ratio:.1f} au décodage"
+            ))
@@ -0,0 +1,64 @@
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+
+from plans.models import Plan
+from plans.services import get_batch_size, save_plan_elements
+
+from .benchmark_json import build_plan_payload
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        "Mesure le nombre de requêtes SQL et la durée de l'enregistrement d'un plan "
+        "(création, mise à jour de toutes ses formes, puis réenvoi à l'identique) selon sa taille. "
+        "Les données créées sont annulées en fin de mesure."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', default='10,100,1000,2000',
+                            help='Nombres de formes à mesurer, séparés par des virgules')
+        parser.add_argument('--points', type=int, default=50)
+
+    def handle(self, *args, **options):
+        sizes = [int(size) for size in options['sizes'].split(',')]
+        self.stdout.write(f"Taille des lots : {get_batch_size()} formes")
+        self.stdout.write(f"{'formes':>8} | {'création':>18} | {'mise à jour':>18} | {'inchangé':>18}")
+
+        try:
+            with transaction.atomic():
+                user = get_user_model().objects.create(username='benchmark-save', role='ADMIN')
+                for size in sizes:
+                    self.stdout.write(self.measure(user, size, options['points']))
+                raise Rollback
+        except Rollback:
+            pass
+
+    def measure(self, user, size, points):
+        plan = Plan.objects.create(nom=f'Benchmark {size}', createur=user)
+        formes = build_plan_payload(size, points)['formes']
+        for forme in formes:
+            forme.pop('id')
+
+        creation = self.run(plan, formes)
+        ids = list(plan.formes.order_by('id').values_list('id', flat=True))
+        for forme, forme_id in zip(formes, ids):
+            forme['id'] = forme_id
+            forme['data']['style'] = {**forme['data']['style'], 'color': '#ff0000'}
+        update = self.run(plan, formes)
+        unchanged = self.run(plan, formes)
+        return f"{size:>8} | {creation:>18} | {update:>18} | {unchanged:>18}"
+
+    def run(self, plan, formes):
+        with CaptureQueriesContext(connection) as context:
+            start = time.perf_counter()
+            save_plan_elements(plan, formes_data=formes)
+            elapsed = time.perf_counter() - start
+        return f"{len(context):>4} req. {elapsed * 1000:>7.1f} ms"
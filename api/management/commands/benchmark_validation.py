@@ -0,0 +1,56 @@
+import timeit
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from api.serializers import FormeGeometriqueSerializer
+from plans.models import Plan
+from plans.validation import validate_formes
+
+from .benchmark_json import build_plan_payload
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare la validation des formes d'un enregistrement par le serializer DRF "
+        "et par les schémas compilés de plans.validation. Les données créées sont annulées."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--formes', type=int, default=2000)
+        parser.add_argument('--points', type=int, default=50)
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                user = get_user_model().objects.create(username='benchmark-validation', role='ADMIN')
+                plan = Plan.objects.create(nom='Benchmark validation', createur=user)
+                self.measure(plan, options)
+                raise Rollback
+        except Rollback:
+            pass
+
+    def measure(self, plan, options):
+        formes = build_plan_payload(options['formes'], options['points'])['formes']
+        for forme in formes:
+            forme['plan'] = plan.pk
+
+        def serializer():
+            validator = FormeGeometriqueSerializer(data=formes, many=True)
+            assert validator.is_valid(), validator.errors
+
+        def compiled():
+            assert not validate_formes(formes)
+
+        self.stdout.write(f"{len(formes)} formes de {options['points']} points")
+        results = {}
+        for name, function in (('serializer', serializer), ('compilé', compiled)):
+            results[name] = min(timeit.repeat(function, number=1, repeat=options['repeat']))
+            self.stdout.write(f"{name:>10} : {results[name] * 1000:8.1f} ms")
+        self.stdout.write(f"Rapport : x{results['serializer'] / results['compilé']:.1f}")
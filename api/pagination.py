@@ -0,0 +1,40 @@
+from rest_framework.pagination import CursorPagination
+
+
+class PlanCursorPagination(CursorPagination):
+    """
+    Pagination par curseur (keyset) des plans, triée sur la date de modification.
+
+    La pagination n'est activée que si le client la demande explicitement
+    (paramètre ``page_size`` ou ``cursor``), afin de conserver la liste
+    complète pour les appels existants.
+    """
+    ordering = ('-date_modification', 'id')
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 500
+
+    def paginate_queryset(self, queryset, request, view=None):
+        params = request.query_params
+        if self.cursor_query_param not in params and self.page_size_query_param not in params:
+            return None
+        return super().paginate_queryset(queryset, request, view)
+
+
+class RevisionCursorPagination(CursorPagination):
+    """Pagination par curseur de l'historique d'un plan, de la plus récente révision à la plus ancienne."""
+    ordering = ('-version',)
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 200
+
+
+class FormeCursorPagination(PlanCursorPagination):
+    """
+    Pagination par curseur des formes, activée à la demande comme celle des
+    plans. Triée par identifiant pour les listes multi-plans ; les formes d'un
+    plan sont triées dans leur ordre de dessin.
+    """
+    ordering = ('id',)
+    page_size = 500
+    max_page_size = 5000
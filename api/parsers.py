@@ -0,0 +1,21 @@
+from django.conf import settings
+from rest_framework import parsers
+from rest_framework.exceptions import ParseError
+
+from .renderers import FastJSONRenderer, loads
+
+
+class FastJSONParser(parsers.JSONParser):
+    """Parser JSON rapide (orjson si disponible), pendant de ``FastJSONRenderer``."""
+    renderer_class = FastJSONRenderer
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        parser_context = parser_context or {}
+        encoding = parser_context.get('encoding', settings.DEFAULT_CHARSET)
+        try:
+            content = stream.read()
+            if encoding.lower().replace('-', '') != 'utf8':
+                content = content.decode(encoding)
+            return loads(content)
+        except ValueError as exc:
+            raise ParseError('JSON parse error - %s' % str(exc))
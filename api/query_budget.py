@@ -0,0 +1,67 @@
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.test.utils import CaptureQueriesContext
+
+
+class QueryBudgetExceeded(AssertionError):
+    """Levée lorsqu'un bloc exécute plus de requêtes SQL que son budget."""
+
+
+def _format_queries(context):
+    return '\n'.join(
+        f"{index}. {query['sql']}" for index, query in enumerate(context.captured_queries, start=1)
+    )
+
+
+@contextmanager
+def assert_max_queries(max_queries, using=DEFAULT_DB_ALIAS, label='bloc'):
+    """
+    Vérifie qu'un bloc de code n'exécute pas plus de ``max_queries`` requêtes.
+
+    Utilisable dans les tests :
+
+        with assert_max_queries(5):
+            client.get('/api/plans/?include_details=true')
+    """
+    with CaptureQueriesContext(connections[using]) as context:
+        yield context
+    executed = len(context)
+    if executed > max_queries:
+        raise QueryBudgetExceeded(
+            f"{label}: {executed} requêtes exécutées pour un budget de {max_queries}\n"
+            f"{_format_queries(context)}"
+        )
+
+
+class QueryBudgetMixin:
+    """
+    Déclare un budget de requêtes SQL par action d'un ViewSet.
+
+    Les budgets (``query_budgets = {'list': 5}``) sont constants : ils ne doivent
+    pas dépendre du nombre d'objets renvoyés. Ils ne sont contrôlés que si
+    ``API_ENFORCE_QUERY_BUDGETS`` est activé (tests, développement), afin de ne
+    rien coûter en production.
+    """
+    query_budgets = {}
+
+    def get_query_budget(self, request):
+        action = getattr(self, 'action_map', {}).get(request.method.lower())
+        return self.query_budgets.get(action), action
+
+    def dispatch(self, request, *args, **kwargs):
+        if not getattr(settings, 'API_ENFORCE_QUERY_BUDGETS', False):
+            return super().dispatch(request, *args, **kwargs)
+
+        budget, action = self.get_query_budget(request)
+        if budget is None:
+            return super().dispatch(request, *args, **kwargs)
+
+        label = f"{self.__class__.__name__}.{action}"
+        with assert_max_queries(budget, label=label):
+            response = super().dispatch(request, *args, **kwargs)
+            # Le rendu peut encore déclencher des requêtes (relations paresseuses)
+            if hasattr(response, 'render') and not getattr(response, 'is_rendered', True):
+                response.render()
+        return response
@@ -0,0 +1,73 @@
+import json
+
+from rest_framework import renderers
+from rest_framework.utils import encoders
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - repli en pur Python
+    orjson = None
+
+_drf_encoder = encoders.JSONEncoder()
+
+if orjson is not None:
+    ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+
+
+def _default(obj):
+    # Types non natifs (dates, Decimal, UUID, chaînes paresseuses...) : même
+    # représentation que l'encodeur JSON de DRF.
+    return _drf_encoder.default(obj)
+
+
+def dumps(data, backend=None):
+    """
+    Encode ``data`` en JSON compact (UTF-8).
+
+    Utilise orjson lorsqu'il est installé, sinon le module ``json`` de la
+    bibliothèque standard avec l'encodeur de DRF ; la sortie est équivalente.
+    """
+    backend = backend or ('orjson' if orjson is not None else 'json')
+    if backend == 'orjson':
+        return orjson.dumps(data, default=_default, option=ORJSON_OPTIONS)
+    return json.dumps(
+        data, cls=encoders.JSONEncoder, ensure_ascii=False, separators=(',', ':')
+    ).encode('utf-8')
+
+
+def loads(content, backend=None):
+    """Décode un document JSON (``bytes`` ou ``str``)."""
+    backend = backend or ('orjson' if orjson is not None else 'json')
+    if backend == 'orjson':
+        return orjson.loads(content)
+    if isinstance(content, bytes):
+        content = content.decode('utf-8')
+    return json.loads(content)
+
+
+class FastJSONRenderer(renderers.JSONRenderer):
+    """
+    Renderer JSON rapide (orjson si disponible).
+
+    Les rendus indentés (``Accept: application/json; indent=4``) restent
+    délégués au renderer standard de DRF.
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        renderer_context = renderer_context or {}
+        if self.get_indent(accepted_media_type, renderer_context):
+            return super().render(data, accepted_media_type, renderer_context)
+        return dumps(data)
+
+
+class MVTRenderer(renderers.BaseRenderer):
+    """Tuiles vectorielles Mapbox déjà encodées (par PostGIS) : renvoyées telles quelles."""
+    media_type = 'application/vnd.mapbox-vector-tile'
+    format = 'mvt'
+    charset = None
+    render_style = 'binary'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return bytes(data or b'')
@@ -1,12 +1,39 @@
-from rest_framework import serializers
+import logging
+
+from rest_framework import permissions, serializers
 from rest_framework_gis.serializers import GeoFeatureModelSerializer
 from django.contrib.auth import get_user_model
-from plans.models import Plan, FormeGeometrique, Connexion, TexteAnnotation
+from plans.models import Plan, FormeGeometrique, Connexion, TexteAnnotation, RevisionPlan, pick_simplification
+from plans.validation import validate_forme
 from authentication.models import Utilisateur
+from .instrumentation import timed
 
 User = get_user_model()  # Ceci pointera vers authentication.Utilisateur
 
-class UserSerializer(serializers.ModelSerializer):
+logger = logging.getLogger(__name__)
+
+
+class TimedSerializerMixin:
+    """Comptabilise le temps de sérialisation dans l'en-tête Server-Timing."""
+
+    def to_representation(self, instance):
+        with timed('serializer'):
+            return super().to_representation(instance)
+
+
+def simplify_zoom(context):
+    """Niveau de zoom demandé par ``?simplify=<zoom>``, ou ``None`` (géométrie complète)."""
+    request = context.get('request')
+    value = request.query_params.get('simplify') if request is not None else None
+    if not value:
+        return None
+    try:
+        return int(value)
+    except ValueError:
+        raise serializers.ValidationError({'simplify': 'Le niveau de zoom doit être un entier.'})
+
+
+class UserSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     concessionnaire_name = serializers.CharField(source='concessionnaire.get_full_name', read_only=True)
     
     class Meta:
@@ -56,7 +83,43 @@ class UserDetailsSerializer(serializers.ModelSerializer):
         model = User
         fields = ['id', 'username', 'email', 'first_name', 'last_name', 'role', 'company_name', 'phone']
 
-class PlanSerializer(serializers.ModelSerializer):
+class SparseFieldsetsMixin:
+    """
+    Permet de restreindre les champs renvoyés via les paramètres de requête
+    ``fields`` et ``omit`` (listes séparées par des virgules), par exemple
+    ``?omit=elements,preferences``.
+
+    Les mêmes options peuvent être passées directement au constructeur.
+    Le filtrage ne s'applique qu'aux lectures pour ne jamais ignorer de données envoyées.
+    """
+
+    def __init__(self, *args, **kwargs):
+        fields = kwargs.pop('fields', None)
+        omit = kwargs.pop('omit', None)
+        super().__init__(*args, **kwargs)
+
+        request = self.context.get('request')
+        if request is not None and request.method in permissions.SAFE_METHODS:
+            if fields is None:
+                fields = _split_param(request.query_params.get('fields'))
+            if omit is None:
+                omit = _split_param(request.query_params.get('omit'))
+
+        if fields:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+        if omit:
+            for name in set(self.fields) & set(omit):
+                self.fields.pop(name)
+
+
+def _split_param(value):
+    """Découpe un paramètre de type ``a,b,c`` en liste de noms de champs."""
+    if not value:
+        return None
+    return [name.strip() for name in value.split(',') if name.strip()]
+
+class PlanSerializer(TimedSerializerMixin, SparseFieldsetsMixin, serializers.ModelSerializer):
     """Sérialiseur pour les plans d'irrigation."""
     createur = UserSerializer(read_only=True)
     usine = serializers.PrimaryKeyRelatedField(
@@ -80,9 +143,16 @@ class PlanSerializer(serializers.ModelSerializer):
         fields = [
             'id', 'nom', 'description', 'date_creation', 'date_modification',
             'createur', 'usine', 'concessionnaire', 'agriculteur', 'preferences',
-            'elements', 'historique'
+            'elements', 'version'
         ]
-        read_only_fields = ['date_creation', 'date_modification', 'historique']
+        read_only_fields = ['date_creation', 'date_modification', 'version']
+
+    @classmethod
+    def setup_eager_loading(cls, queryset, field_names=None):
+        """Précharge le créateur (et son concessionnaire, utilisé par ``concessionnaire_name``)."""
+        if field_names is None or 'createur' in field_names:
+            queryset = queryset.select_related('createur__concessionnaire')
+        return queryset
 
     def validate(self, data):
         """Valide les relations entre usine, concessionnaire et agriculteur."""
@@ -101,7 +171,7 @@ class PlanSerializer(serializers.ModelSerializer):
         return data
 
     def create(self, validated_data):
-        print("[PlanSerializer] Création avec données:", validated_data)
+        logger.debug("[PlanSerializer] Création avec données: %s", validated_data)
         user = self.context['request'].user
 
         # Si l'utilisateur est un agriculteur, utiliser ses relations
@@ -119,54 +189,63 @@ class PlanSerializer(serializers.ModelSerializer):
         return super().create(validated_data)
 
     def update(self, instance, validated_data):
-        print("[PlanSerializer] Début update avec données:", validated_data)
+        logger.debug("[PlanSerializer] Début update avec données: %s", validated_data)
         
         # Si un client est assigné, il devient le créateur
         if 'agriculteur' in validated_data and validated_data['agriculteur']:
             instance.createur = validated_data['agriculteur']
         
         instance = super().update(instance, validated_data)
-        print(f"[PlanSerializer] Fin update - concessionnaire_id: {instance.concessionnaire_id}, client_id: {instance.agriculteur_id}")
+        logger.debug(
+            "[PlanSerializer] Fin update - concessionnaire_id: %s, client_id: %s",
+            instance.concessionnaire_id, instance.agriculteur_id,
+        )
         return instance
 
-class FormeGeometriqueSerializer(serializers.ModelSerializer):
+class FormeGeometriqueSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = FormeGeometrique
-        fields = ['id', 'plan', 'type_forme', 'data']
-        read_only_fields = ['id']
+        fields = ['id', 'plan', 'type_forme', 'data', 'ordre', 'version']
+        read_only_fields = ['id', 'version']
 
-    def validate(self, attrs):
-        """Valide les données selon le type de forme."""
-        type_forme = attrs.get('type_forme')
-        data = attrs.get('data', {})
-
-        if not data:
-            raise serializers.ValidationError("Les données de la forme sont requises")
-
-        # Validation spécifique selon le type de forme
-        if type_forme == FormeGeometrique.TypeForme.CERCLE:
-            if 'center' not in data or 'radius' not in data:
-                raise serializers.ValidationError("Un cercle nécessite un centre et un rayon")
-        elif type_forme == FormeGeometrique.TypeForme.RECTANGLE:
-            if 'bounds' not in data:
-                raise serializers.ValidationError("Un rectangle nécessite des limites (bounds)")
-        elif type_forme == FormeGeometrique.TypeForme.DEMI_CERCLE:
-            if not all(k in data for k in ['center', 'radius', 'startAngle', 'endAngle']):
-                raise serializers.ValidationError("Un demi-cercle nécessite un centre, un rayon et des angles")
-        elif type_forme == FormeGeometrique.TypeForme.LIGNE:
-            if 'points' not in data:
-                raise serializers.ValidationError("Une ligne nécessite des points")
-        elif type_forme == FormeGeometrique.TypeForme.TEXTE:
-            if not all(k in data for k in ['position', 'content']):
-                raise serializers.ValidationError("Un texte nécessite une position et un contenu")
+    def to_representation(self, instance):
+        """
+        Avec ``?simplify=<zoom>``, les points sont remplacés par leur version
+        simplifiée ; une géométrie vide est servie telle quelle.
+        """
+        representation = super().to_representation(instance)
+        points = pick_simplification(instance.simplifications, simplify_zoom(self.context))
+        data = representation['data']
+        original = data.get('points') if isinstance(data, dict) else None
+        if points and original:
+            # Même convention d'anneau que les données d'origine (fermé ou non)
+            if original[0] != original[-1] and points[0] == points[-1]:
+                points = points[:-1]
+            representation['data'] = {**data, 'points': points}
+        return representation
 
+    def validate(self, attrs):
+        """Valide les données selon le type de forme (voir ``plans.validation``)."""
+        type_forme = attrs.get('type_forme', getattr(self.instance, 'type_forme', None))
+        data = attrs.get('data', getattr(self.instance, 'data', None))
+        error = validate_forme(type_forme, data)
+        if error:
+            raise serializers.ValidationError(error)
         return attrs
 
-class ConnexionSerializer(serializers.ModelSerializer):
+class ConnexionSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = Connexion
-        fields = ['id', 'plan', 'forme_source', 'forme_destination', 'geometrie']
-        read_only_fields = ['id']
+        fields = ['id', 'plan', 'forme_source', 'forme_destination', 'geometrie', 'version']
+        read_only_fields = ['id', 'version']
+
+    def to_representation(self, instance):
+        """Avec ``?simplify=<zoom>``, la géométrie est remplacée par sa version simplifiée."""
+        representation = super().to_representation(instance)
+        points = pick_simplification(instance.simplifications, simplify_zoom(self.context))
+        if points is not None and representation.get('geometrie'):
+            representation['geometrie'] = {**representation['geometrie'], 'coordinates': points}
+        return representation
 
     def validate(self, data):
         """
@@ -184,13 +263,13 @@ class ConnexionSerializer(serializers.ModelSerializer):
 
         return data
 
-class TexteAnnotationSerializer(serializers.ModelSerializer):
+class TexteAnnotationSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = TexteAnnotation
-        fields = ['id', 'plan', 'texte', 'position', 'rotation']
-        read_only_fields = ['id']
+        fields = ['id', 'plan', 'texte', 'position', 'rotation', 'version']
+        read_only_fields = ['id', 'version']
 
-class PlanDetailSerializer(serializers.ModelSerializer):
+class PlanDetailSerializer(TimedSerializerMixin, SparseFieldsetsMixin, serializers.ModelSerializer):
     createur = UserDetailsSerializer(read_only=True)
     usine = UserDetailsSerializer(read_only=True)
     usine_id = serializers.PrimaryKeyRelatedField(
@@ -226,50 +305,25 @@ class PlanDetailSerializer(serializers.ModelSerializer):
             'id', 'nom', 'description', 'date_creation', 'date_modification',
             'createur', 'usine', 'usine_id', 'concessionnaire', 'concessionnaire_id',
             'agriculteur', 'agriculteur_id', 'formes', 'connexions', 'annotations',
-            'preferences', 'elements', 'historique'
+            'preferences', 'elements', 'version'
         ]
-        read_only_fields = ['date_creation', 'date_modification', 'historique']
-
-    def to_representation(self, instance):
-        """
-        Surcharge pour s'assurer que les relations sont renvoyées comme des objets.
-        """
-        print(f"\n[PlanDetailSerializer] Début to_representation pour plan {instance.id}")
-        print(f"- Usine: {instance.usine_id} ({type(instance.usine_id)})")
-        print(f"- Concessionnaire: {instance.concessionnaire_id} ({type(instance.concessionnaire_id)})")
-        print(f"- Agriculteur: {instance.agriculteur_id} ({type(instance.agriculteur_id)})")
-        
-        # Utiliser super() pour obtenir la représentation de base
-        data = super().to_representation(instance)
-        
-        print("\nDonnées sérialisées initiales:")
-        print("- usine:", data.get('usine'))
-        print("- concessionnaire:", data.get('concessionnaire'))
-        print("- agriculteur:", data.get('agriculteur'))
-        
-        # S'assurer que les relations sont bien sérialisées en objets complets
-        if data.get('usine') is None and instance.usine:
-            print(f"[PlanDetailSerializer] Forçage sérialisation de usine: {instance.usine}")
-            data['usine'] = UserDetailsSerializer(instance.usine, context=self.context).data
-            
-        if data.get('concessionnaire') is None and instance.concessionnaire:
-            print(f"[PlanDetailSerializer] Forçage sérialisation de concessionnaire: {instance.concessionnaire}")
-            data['concessionnaire'] = UserDetailsSerializer(instance.concessionnaire, context=self.context).data
-            
-        if data.get('agriculteur') is None and instance.agriculteur:
-            print(f"[PlanDetailSerializer] Forçage sérialisation de agriculteur: {instance.agriculteur}")
-            data['agriculteur'] = UserDetailsSerializer(instance.agriculteur, context=self.context).data
-        
-        print("\nDonnées sérialisées finales:")
-        print("- usine:", data.get('usine'))
-        print("- concessionnaire:", data.get('concessionnaire'))
-        print("- agriculteur:", data.get('agriculteur'))
-        
-        return data
+        read_only_fields = ['date_creation', 'date_modification', 'version']
+
+    @classmethod
+    def setup_eager_loading(cls, queryset, field_names=None):
+        """Précharge les utilisateurs et les éléments du plan en un nombre constant de requêtes."""
+        field_names = set(field_names) if field_names is not None else set(cls.Meta.fields)
+        related = [name for name in ('createur', 'usine', 'concessionnaire', 'agriculteur') if name in field_names]
+        prefetched = [name for name in ('formes', 'connexions', 'annotations') if name in field_names]
+        if related:
+            queryset = queryset.select_related(*related)
+        if prefetched:
+            queryset = queryset.prefetch_related(*prefetched)
+        return queryset
 
     def validate(self, data):
         """Valide les relations entre usine, concessionnaire et agriculteur."""
-        print("\n[PlanDetailSerializer] Validation des données:", data)
+        logger.debug("[PlanDetailSerializer] Validation des données: %s", data)
         
         # Si un agriculteur est spécifié, vérifier qu'il a un concessionnaire
         if 'agriculteur' in data and data['agriculteur'] and not data.get('concessionnaire'):
@@ -286,14 +340,32 @@ class PlanDetailSerializer(serializers.ModelSerializer):
         return data
 
     def update(self, instance, validated_data):
-        print("\n[PlanDetailSerializer] Début update avec données:", validated_data)
-        print(f"État initial - usine: {instance.usine_id}, concessionnaire: {instance.concessionnaire_id}, agriculteur: {instance.agriculteur_id}")
+        logger.debug("[PlanDetailSerializer] Début update avec données: %s", validated_data)
+        logger.debug(
+            "État initial - usine: %s, concessionnaire: %s, agriculteur: %s",
+            instance.usine_id, instance.concessionnaire_id, instance.agriculteur_id,
+        )
         
         instance = super().update(instance, validated_data)
         
-        print(f"État final - usine: {instance.usine_id}, concessionnaire: {instance.concessionnaire_id}, agriculteur: {instance.agriculteur_id}")
+        logger.debug(
+            "État final - usine: %s, concessionnaire: %s, agriculteur: %s",
+            instance.usine_id, instance.concessionnaire_id, instance.agriculteur_id,
+        )
         return instance
 
     def create(self, validated_data):
         validated_data['createur'] = self.context['request'].user
-        return super().create(validated_data) 
\ No newline at end of file
+        return super().create(validated_data) 
+
+
+class RevisionPlanSerializer(serializers.ModelSerializer):
+    """Entrée de l'historique d'un plan (sans le contenu de la révision)."""
+    plan_id = serializers.IntegerField(read_only=True)
+    date_modification = serializers.DateTimeField(source='date', read_only=True)
+    modifications = serializers.JSONField(source='resume', read_only=True)
+    keyframe = serializers.BooleanField(source='is_keyframe', read_only=True)
+
+    class Meta:
+        model = RevisionPlan
+        fields = ['id', 'plan_id', 'version', 'date_modification', 'utilisateur', 'modifications', 'keyframe']
@@ -0,0 +1,26 @@
+from django.contrib.gis.geos import Polygon
+from rest_framework.exceptions import ValidationError
+
+
+def parse_bbox(value, param='bbox'):
+    """
+    Convertit ``minx,miny,maxx,maxy`` (longitudes et latitudes WGS 84) en
+    polygone SRID 4326, utilisable par un filtre spatial indexé.
+    """
+    try:
+        minx, miny, maxx, maxy = (float(part) for part in value.split(','))
+    except ValueError:
+        raise ValidationError({param: 'Format attendu : minx,miny,maxx,maxy'})
+    if not (-180 <= minx < maxx <= 180 and -90 <= miny < maxy <= 90):
+        raise ValidationError({param: 'Emprise invalide ou hors des limites WGS 84'})
+    bbox = Polygon.from_bbox((minx, miny, maxx, maxy))
+    bbox.srid = 4326
+    return bbox
+
+
+def filter_bbox(queryset, request, field='geometrie', param='bbox'):
+    """Restreint ``queryset`` aux objets dont ``field`` intersecte l'emprise ``?bbox=``, si indiquée."""
+    value = request.query_params.get(param)
+    if not value:
+        return queryset
+    return queryset.filter(**{f'{field}__intersects': parse_bbox(value, param)})
@@ -0,0 +1,34 @@
+from django.http import StreamingHttpResponse
+
+from .renderers import dumps
+
+
+def iter_json_array(queryset, serializer, chunk_size):
+    """
+    Produit un tableau JSON morceau par morceau.
+
+    Le queryset est parcouru par lots de ``chunk_size`` objets (les
+    ``prefetch_related`` sont appliqués à chaque lot) : la mémoire utilisée ne
+    dépend que de la taille d'un lot, jamais du nombre total d'objets.
+    """
+    yield b'['
+    separator = b''
+    batch = []
+    for instance in queryset.iterator(chunk_size=chunk_size):
+        batch.append(dumps(serializer.to_representation(instance)))
+        if len(batch) >= chunk_size:
+            yield separator + b','.join(batch)
+            separator = b','
+            batch = []
+    if batch:
+        yield separator + b','.join(batch)
+    yield b']'
+
+
+def streaming_json_response(queryset, serializer, chunk_size=100, **kwargs):
+    """Retourne une réponse HTTP qui sérialise ``queryset`` au fil de l'envoi."""
+    return StreamingHttpResponse(
+        iter_json_array(queryset, serializer, chunk_size),
+        content_type='application/json',
+        **kwargs
+    )
@@ -0,0 +1,65 @@
+from django.core.cache import caches
+from django.test import TestCase
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from authentication.models import Utilisateur
+from plans.models import FormeGeometrique, Plan
+from plans.revisions import record_revision
+
+# Requêtes exécutées hors des vues : utilisateur du jeton chargé par le middleware JWT
+REQUEST_OVERHEAD = 1
+
+
+def cercle(lng=2.35, lat=48.85, radius=10):
+    return {'type_forme': 'CERCLE', 'data': {'center': [lng, lat], 'radius': radius}}
+
+
+class PlanAPITestCase(TestCase):
+    """Hiérarchie usine → concessionnaire → agriculteur et client authentifié par JWT."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = Utilisateur.objects.create_user(
+            'admin', 'admin@example.com', 'motdepasse', role=Utilisateur.Role.ADMIN
+        )
+        cls.usine = Utilisateur.objects.create_user(
+            'usine', 'usine@example.com', 'motdepasse', role=Utilisateur.Role.USINE
+        )
+        cls.concessionnaire = Utilisateur.objects.create_user(
+            'concessionnaire', 'concessionnaire@example.com', 'motdepasse',
+            role=Utilisateur.Role.CONCESSIONNAIRE, usine=cls.usine,
+        )
+        cls.agriculteur = Utilisateur.objects.create_user(
+            'agriculteur', 'agriculteur@example.com', 'motdepasse',
+            role=Utilisateur.Role.AGRICULTEUR, concessionnaire=cls.concessionnaire,
+        )
+
+    def setUp(self):
+        caches['plans'].clear()
+        self.client = self.client_for(self.concessionnaire)
+
+    @staticmethod
+    def client_for(user):
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(user).access_token}')
+        return client
+
+    def create_plan(self, formes=0, **fields):
+        """Plan du concessionnaire et de son agriculteur, avec ``formes`` cercles et sa première révision."""
+        fields = {
+            'nom': 'Plan',
+            'createur': self.concessionnaire,
+            'usine': self.usine,
+            'concessionnaire': self.concessionnaire,
+            'agriculteur': self.agriculteur,
+            **fields,
+        }
+        plan = Plan.objects.create(**fields)
+        for ordre in range(formes):
+            FormeGeometrique.objects.create(plan=plan, ordre=ordre, **cercle(lng=2.35 + ordre * 0.001))
+        record_revision(plan, plan.version, self.concessionnaire)
+        return plan
+
+    def plan_url(self, plan, action=''):
+        return f'/api/plans/{plan.pk}/{action + "/" if action else ""}'
@@ -0,0 +1,44 @@
+from plans.models import Plan
+
+from .base import PlanAPITestCase
+
+
+class PlanBatchTests(PlanAPITestCase):
+    """Modification de plusieurs plans en une requête (``batch/``)."""
+
+    url = '/api/plans/batch/'
+
+    def test_statuses(self):
+        premier, second = self.create_plan(), self.create_plan()
+        premier.refresh_from_db()
+        second.refresh_from_db()
+        autre = Plan.objects.create(nom='Autre', createur=self.admin)
+
+        response = self.client.post(self.url, {'plans': [
+            {'id': premier.id, 'version': premier.version, 'nom': 'Premier'},
+            {'id': second.id, 'version': second.version - 1, 'nom': 'Conflit'},
+            {'id': autre.id, 'nom': 'Invisible'},
+            {'id': premier.id + second.id + autre.id, 'nom': 'Inconnu'},
+            {'id': second.id, 'nom': ''},
+        ]}, format='json')
+        self.assertEqual(response.status_code, 200)
+        statuses = [result['status'] for result in response.data['results']]
+        self.assertEqual(statuses, ['ok', 'conflict', 'not_found', 'not_found', 'invalid'])
+        self.assertEqual(response.data['results'][0]['version'], premier.version + 1)
+        self.assertEqual(response.data['results'][1]['version'], second.version)
+
+        premier.refresh_from_db()
+        second.refresh_from_db()
+        autre.refresh_from_db()
+        self.assertEqual(premier.nom, 'Premier')
+        self.assertEqual(second.nom, 'Plan')
+        self.assertEqual(autre.nom, 'Autre')
+
+    def test_agriculteur_cannot_reassign(self):
+        plan = self.create_plan()
+        client = self.client_for(self.agriculteur)
+        response = client.post(self.url, {'plans': [{'id': plan.id, 'concessionnaire': None}]}, format='json')
+        self.assertEqual(response.data['results'][0]['status'], 'invalid')
+
+    def test_empty_batch(self):
+        self.assertEqual(self.client.post(self.url, {'plans': []}, format='json').status_code, 400)
@@ -0,0 +1,49 @@
+from .base import PlanAPITestCase, cercle
+
+
+class PlanChangesTests(PlanAPITestCase):
+    """Resynchronisation d'un plan depuis une version (``changes/?since=``)."""
+
+    def setUp(self):
+        super().setUp()
+        self.plan = self.create_plan(formes=2)
+        self.plan.refresh_from_db()
+        self.formes = list(self.plan.formes.order_by('ordre'))
+
+    def changes(self, since):
+        response = self.client.get(self.plan_url(self.plan, 'changes'), {'since': since})
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def test_nothing_changed(self):
+        data = self.changes(self.plan.version)
+        self.assertEqual(data['version'], self.plan.version)
+        self.assertEqual(data['formes'], [])
+        self.assertEqual(data['supprimes'], {'formes': [], 'connexions': [], 'annotations': []})
+
+    def test_created_updated_and_deleted_formes(self):
+        since = self.plan.version
+        gardee, supprimee = self.formes
+        response = self.client.post(self.plan_url(self.plan, 'save_with_elements'), {
+            'formes': [
+                {'id': gardee.id, **cercle(radius=25)},
+                cercle(lng=2.4),
+            ],
+            'elementsToDelete': [supprimee.id],
+        }, format='json')
+        self.assertEqual(response.status_code, 200)
+
+        data = self.changes(since)
+        self.assertEqual(data['version'], since + 1)
+        self.assertEqual(len(data['formes']), 2)
+        self.assertIn(gardee.id, [forme['id'] for forme in data['formes']])
+        self.assertEqual(data['supprimes']['formes'], [supprimee.id])
+
+        # Depuis la nouvelle version, plus rien à transmettre
+        data = self.changes(data['version'])
+        self.assertEqual(data['formes'], [])
+        self.assertEqual(data['supprimes']['formes'], [])
+
+    def test_invalid_since(self):
+        response = self.client.get(self.plan_url(self.plan, 'changes'), {'since': 'hier'})
+        self.assertEqual(response.status_code, 400)
@@ -0,0 +1,49 @@
+import gzip
+import json
+
+from django.test import override_settings
+
+from .base import PlanAPITestCase
+
+ORIGIN = 'http://localhost:8080'
+
+
+@override_settings(CORS_ALLOWED_ORIGINS=[ORIGIN])
+class RequestDecompressionTests(PlanAPITestCase):
+    """Corps de requête compressés sur les routes des plans."""
+
+    def setUp(self):
+        super().setUp()
+        self.plan = self.create_plan()
+        self.url = self.plan_url(self.plan, 'save_with_elements')
+
+    def post(self, body, encoding):
+        return self.client.generic(
+            'POST', self.url, body, content_type='application/json',
+            HTTP_CONTENT_ENCODING=encoding, HTTP_ORIGIN=ORIGIN,
+        )
+
+    def test_gzip_body(self):
+        response = self.post(gzip.compress(json.dumps({'formes': []}).encode()), 'gzip')
+        self.assertEqual(response.status_code, 200)
+
+    def test_rejections_carry_cors_headers(self):
+        for body, encoding, status_code in (
+            (b'{}', 'br', 415),
+            (b'pas du gzip', 'gzip', 400),
+        ):
+            response = self.post(body, encoding)
+            self.assertEqual(response.status_code, status_code)
+            self.assertEqual(response['Access-Control-Allow-Origin'], ORIGIN)
+
+    @override_settings(API_MAX_DECOMPRESSED_SIZE=10)
+    def test_too_large(self):
+        response = self.post(gzip.compress(b'{"formes": []}' + b' ' * 100), 'gzip')
+        self.assertEqual(response.status_code, 413)
+        self.assertEqual(response['Access-Control-Allow-Origin'], ORIGIN)
+
+    @override_settings(API_MAX_DECOMPRESSED_SIZE=None, DATA_UPLOAD_MAX_MEMORY_SIZE=100)
+    def test_defaults_to_upload_limit(self):
+        # Corps compressé sous la limite, mais pas une fois décompressé
+        response = self.post(gzip.compress(b'{"formes": []}' + b' ' * 1000), 'gzip')
+        self.assertEqual(response.status_code, 413)
@@ -0,0 +1,54 @@
+from plans.models import FormeGeometrique
+
+from .base import PlanAPITestCase, cercle
+
+
+class ConditionalWriteTests(PlanAPITestCase):
+    """Écritures conditionnelles (compare-and-swap sur la version du plan)."""
+
+    def setUp(self):
+        super().setUp()
+        self.plan = self.create_plan(formes=1)
+        self.plan.refresh_from_db()
+
+    def save(self, version=None, **headers):
+        payload = {'formes': [cercle(lng=2.36)]}
+        if version is not None:
+            payload['version'] = version
+        return self.client.post(self.plan_url(self.plan, 'save_with_elements'), payload, format='json', **headers)
+
+    def test_save_with_current_version(self):
+        response = self.save(version=self.plan.version)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['version'], self.plan.version + 1)
+        self.assertEqual(response.data['sauvegarde']['created'], 1)
+        self.assertIn('ETag', response)
+
+    def test_save_with_stale_version(self):
+        response = self.save(version=self.plan.version - 1)
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.data['version'], self.plan.version)
+        self.assertEqual(FormeGeometrique.objects.filter(plan=self.plan).count(), 1)
+
+    def test_save_with_stale_if_match(self):
+        etag = self.client.get(self.plan_url(self.plan))['ETag']
+        self.assertEqual(self.save(HTTP_IF_MATCH=etag).status_code, 200)
+        response = self.save(HTTP_IF_MATCH=etag)
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(FormeGeometrique.objects.filter(plan=self.plan).count(), 2)
+
+    def test_save_without_condition_is_last_writer_wins(self):
+        self.assertEqual(self.save().status_code, 200)
+        self.assertEqual(self.save().status_code, 200)
+
+    def test_patch_with_if_match(self):
+        url = self.plan_url(self.plan)
+        etag = self.client.get(url)['ETag']
+        response = self.client.patch(url, {'nom': 'Renommé'}, format='json', HTTP_IF_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+        response = self.client.patch(url, {'nom': 'Conflit'}, format='json', HTTP_IF_MATCH=etag)
+        self.assertEqual(response.status_code, 409)
+        self.plan.refresh_from_db()
+        self.assertEqual(self.plan.nom, 'Renommé')
@@ -0,0 +1,29 @@
+from django.utils.http import http_date
+
+from .base import PlanAPITestCase
+
+URL = '/api/plans/'
+
+
+class PlanListValidatorTests(PlanAPITestCase):
+    """ETag de la liste des plans."""
+
+    def setUp(self):
+        super().setUp()
+        self.plans = [self.create_plan(), self.create_plan()]
+
+    def test_not_modified(self):
+        etag = self.client.get(URL)['ETag']
+        self.assertEqual(self.client.get(URL, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+    def test_deletion_changes_etag(self):
+        etag = self.client.get(URL)['ETag']
+        self.assertEqual(self.client.delete(self.plan_url(self.plans[0])).status_code, 204)
+        response = self.client.get(URL, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data), 1)
+
+    def test_if_modified_since_ignored(self):
+        response = self.client.get(URL, HTTP_IF_MODIFIED_SINCE=http_date())
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('Last-Modified', response)
@@ -0,0 +1,63 @@
+from plans.models import FormeGeometrique, JournalOperation
+
+from .base import PlanAPITestCase, cercle
+
+
+class PlanOperationsTests(PlanAPITestCase):
+    """Lots d'opérations incrémentales sur les formes (``operations/``)."""
+
+    def setUp(self):
+        super().setUp()
+        self.plan = self.create_plan(formes=2)
+        self.plan.refresh_from_db()
+        self.formes = list(self.plan.formes.order_by('ordre'))
+
+    def apply(self, operations, base_version=None):
+        return self.client.post(self.plan_url(self.plan, 'operations'), {
+            'base_version': self.plan.version if base_version is None else base_version,
+            'operations': operations,
+        }, format='json')
+
+    def test_add_update_move_and_delete(self):
+        premiere, seconde = self.formes
+        response = self.apply([
+            {'op': 'add', 'ref': 'tmp-1', 'forme': cercle(lng=2.4)},
+            {'op': 'update', 'id': premiere.id, 'data': {'radius': 30}},
+            {'op': 'move', 'id': 'tmp-1', 'dx': 0.001, 'dy': 0},
+            {'op': 'delete', 'id': seconde.id},
+        ])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['version'], self.plan.version + 1)
+        self.assertEqual(response.data['updated'], [premiere.id])
+        self.assertEqual(response.data['deleted'], [seconde.id])
+
+        ajoutee = FormeGeometrique.objects.get(pk=response.data['created']['tmp-1'])
+        self.assertAlmostEqual(ajoutee.data['center'][0], 2.401)
+        premiere.refresh_from_db()
+        self.assertEqual(premiere.data['radius'], 30)
+        self.assertFalse(FormeGeometrique.objects.filter(pk=seconde.pk).exists())
+        self.assertTrue(JournalOperation.objects.filter(plan=self.plan, version=response.data['version']).exists())
+
+    def test_stale_base_version(self):
+        response = self.apply([{'op': 'delete', 'id': self.formes[0].id}], base_version=self.plan.version - 1)
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.data['version'], self.plan.version)
+        self.assertTrue(FormeGeometrique.objects.filter(pk=self.formes[0].pk).exists())
+
+    def test_invalid_operation_rejects_the_whole_batch(self):
+        response = self.apply([
+            {'op': 'add', 'ref': 'tmp-1', 'forme': cercle()},
+            {'op': 'update', 'id': self.formes[0].id, 'data': {'radius': -5}},
+        ])
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['index'], 1)
+        self.assertEqual(FormeGeometrique.objects.filter(plan=self.plan).count(), 2)
+
+    def test_unknown_forme(self):
+        response = self.apply([{'op': 'delete', 'id': 'tmp-inconnue'}])
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['index'], 0)
+
+    def test_base_version_required(self):
+        response = self.client.post(self.plan_url(self.plan, 'operations'), {'operations': []}, format='json')
+        self.assertEqual(response.status_code, 400)
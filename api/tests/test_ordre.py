@@ -0,0 +1,62 @@
+from plans.models import FormeGeometrique
+
+from .base import PlanAPITestCase, cercle
+
+
+class FormeOrdreTests(PlanAPITestCase):
+    """Ordre de dessin des formes selon la liste envoyée ou les opérations."""
+
+    def setUp(self):
+        super().setUp()
+        self.plan = self.create_plan(formes=3)
+        self.plan.refresh_from_db()
+        self.formes = list(self.plan.formes.order_by('ordre'))
+
+    def save(self, formes):
+        response = self.client.post(
+            self.plan_url(self.plan, 'save_with_elements'), {'formes': formes}, format='json'
+        )
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def ordres(self):
+        return dict(FormeGeometrique.objects.filter(plan=self.plan).values_list('id', 'ordre'))
+
+    def test_full_list_sets_ordre_from_position(self):
+        premiere, seconde, troisieme = self.formes
+        self.save([
+            {'id': forme.id, 'type_forme': forme.type_forme, 'data': forme.data}
+            for forme in (troisieme, premiere, seconde)
+        ])
+        self.assertEqual(self.ordres(), {troisieme.id: 0, premiere.id: 1, seconde.id: 2})
+
+    def test_subset_keeps_stored_ordre(self):
+        premiere, seconde, troisieme = self.formes
+        data = self.save([{'id': troisieme.id, **cercle(radius=40)}, cercle(lng=2.5)])
+        self.assertEqual(data['sauvegarde']['updated'], 1)
+        ordres = self.ordres()
+        nouvelle = (ordres.keys() - {forme.id for forme in self.formes}).pop()
+        self.assertEqual(ordres, {
+            premiere.id: premiere.ordre,
+            seconde.id: seconde.ordre,
+            troisieme.id: troisieme.ordre,
+            nouvelle: troisieme.ordre + 1,
+        })
+
+    def test_explicit_ordre(self):
+        premiere = self.formes[0]
+        self.save([{'id': premiere.id, 'type_forme': premiere.type_forme, 'data': premiere.data, 'ordre': 10}])
+        self.assertEqual(self.ordres()[premiere.id], 10)
+
+    def test_reorder_subset_swaps_ranks(self):
+        premiere, seconde, troisieme = self.formes
+        response = self.client.post(self.plan_url(self.plan, 'operations'), {
+            'base_version': self.plan.version,
+            'operations': [{'op': 'reorder', 'ids': [troisieme.id, premiere.id]}],
+        }, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.ordres(), {
+            troisieme.id: premiere.ordre,
+            seconde.id: seconde.ordre,
+            premiere.id: troisieme.ordre,
+        })
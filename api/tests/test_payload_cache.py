@@ -0,0 +1,70 @@
+from django.utils import timezone
+
+from plans.models import Plan
+
+from .base import PlanAPITestCase, cercle
+
+
+class PlanPayloadCacheTests(PlanAPITestCase):
+    """Réponses en cache et 304 des plans après modification des utilisateurs affichés."""
+
+    def setUp(self):
+        super().setUp()
+        self.plan = self.create_plan(formes=1)
+        self.url = self.plan_url(self.plan)
+
+    def test_not_modified(self):
+        etag = self.client.get(self.url)['ETag']
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+    def test_user_edit_changes_etag_and_payload(self):
+        etag = self.client.get(self.url)['ETag']
+        date_modification = Plan.objects.get(pk=self.plan.pk).date_modification
+        self.agriculteur.first_name = 'Renommé'
+        self.agriculteur.save()
+
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(response.json()['agriculteur']['first_name'], 'Renommé')
+        # Le plan lui-même n'est ni modifié ni redaté
+        plan = Plan.objects.get(pk=self.plan.pk)
+        self.assertEqual((plan.version, plan.date_modification), (self.plan.version, date_modification))
+
+    def test_createur_concessionnaire_edit(self):
+        self.plan.createur = self.agriculteur
+        self.plan.save()
+        etag = self.client.get(self.url)['ETag']
+        self.concessionnaire.last_name = 'Nouveau'
+        self.concessionnaire.save(update_fields=['last_name'])
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_login_keeps_etag(self):
+        etag = self.client.get(self.url)['ETag']
+        self.agriculteur.last_login = timezone.now()
+        self.agriculteur.save(update_fields=['last_login'])
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+    def test_list_etag_follows_user_edit(self):
+        etag = self.client.get('/api/plans/')['ETag']
+        self.agriculteur.phone = '0600000000'
+        self.agriculteur.save(update_fields=['phone'])
+        self.assertEqual(self.client.get('/api/plans/', HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_if_match_after_user_edit(self):
+        etag = self.client.get(self.url)['ETag']
+        self.agriculteur.first_name = 'Renommé'
+        self.agriculteur.save()
+        # Le plan n'a pas changé : l'ETag lu avant la modification de l'utilisateur reste valable
+        response = self.client.post(
+            self.plan_url(self.plan, 'save_with_elements'), {'formes': [cercle()]},
+            format='json', HTTP_IF_MATCH=etag,
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['ETag'], self.client.get(self.url)['ETag'])
+
+        response = self.client.post(
+            self.plan_url(self.plan, 'save_with_elements'), {'formes': [cercle()]},
+            format='json', HTTP_IF_MATCH=etag,
+        )
+        self.assertEqual(response.status_code, 409)
@@ -0,0 +1,44 @@
+from django.test import override_settings
+
+from api.query_budget import assert_max_queries
+from api.views import PlanViewSet
+
+from .base import REQUEST_OVERHEAD, PlanAPITestCase
+
+N = 3
+
+
+@override_settings(API_ENFORCE_QUERY_BUDGETS=True)
+class PlanQueryBudgetTests(PlanAPITestCase):
+    """Le nombre de requêtes des lectures de plans ne dépend pas du nombre de plans."""
+
+    def count_queries(self, action, url):
+        budget = PlanViewSet.query_budgets[action] + REQUEST_OVERHEAD
+        with assert_max_queries(budget, label=url) as context:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(context)
+
+    def create_plans(self, count):
+        return [self.create_plan(formes=2) for _ in range(count)]
+
+    def assert_constant(self, action, url):
+        self.create_plans(N)
+        few = self.count_queries(action, url)
+        self.create_plans(10 * N - N)
+        many = self.count_queries(action, url)
+        self.assertEqual(few, many)
+
+    def test_list(self):
+        self.assert_constant('list', '/api/plans/')
+
+    def test_list_include_details(self):
+        self.assert_constant('list', '/api/plans/?include_details=true')
+
+    def test_list_paginated(self):
+        self.assert_constant('list', '/api/plans/?page_size=5&include_details=true')
+
+    def test_retrieve(self):
+        for formes in (N, 10 * N):
+            plan = self.create_plan(formes=formes)
+            self.count_queries('retrieve', self.plan_url(plan))
@@ -0,0 +1,66 @@
+from plans.models import FormeGeometrique, Plan, RevisionPlan
+
+from .base import PlanAPITestCase, cercle
+
+
+class PlanRevisionTests(PlanAPITestCase):
+    """Historique des révisions d'un plan et restauration (``historique/``, ``restaurer/``)."""
+
+    def setUp(self):
+        super().setUp()
+        self.plan = self.create_plan(formes=2)
+        self.plan.refresh_from_db()
+        self.formes = list(self.plan.formes.order_by('ordre'))
+        self.revision = self.plan.revisions.get(version=self.plan.version)
+
+    def edit(self):
+        """Modifie la première forme et supprime la seconde."""
+        premiere, seconde = self.formes
+        response = self.client.post(self.plan_url(self.plan, 'save_with_elements'), {
+            'formes': [{'id': premiere.id, **cercle(radius=50)}],
+            'elementsToDelete': [seconde.id],
+        }, format='json')
+        self.assertEqual(response.status_code, 200)
+        return response.data['version']
+
+    def test_create_records_first_revision(self):
+        response = self.client.post('/api/plans/', {'nom': 'Nouveau'}, format='json')
+        self.assertEqual(response.status_code, 201)
+        plan = Plan.objects.get(pk=response.data['id'])
+        self.assertTrue(RevisionPlan.objects.filter(plan=plan, version=plan.version).exists())
+
+    def test_historique(self):
+        version = self.edit()
+        response = self.client.get(self.plan_url(self.plan, 'historique'))
+        self.assertEqual(response.status_code, 200)
+        versions = [revision['version'] for revision in response.data['results']]
+        self.assertEqual(versions, [version, self.revision.version])
+
+    def test_restaurer(self):
+        version = self.edit()
+        response = self.client.post(
+            self.plan_url(self.plan, 'restaurer'), {'version_id': self.revision.id}, format='json'
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['version'], version + 1)
+
+        restored = {forme.id: forme for forme in FormeGeometrique.objects.filter(plan=self.plan)}
+        self.assertEqual(set(restored), {forme.id for forme in self.formes})
+        for forme in self.formes:
+            self.assertEqual(restored[forme.id].data, forme.data)
+            self.assertEqual(restored[forme.id].ordre, forme.ordre)
+        # La restauration est elle-même une révision
+        self.assertTrue(self.plan.revisions.filter(version=version + 1).exists())
+
+    def test_restaurer_with_stale_if_match(self):
+        etag = self.client.get(self.plan_url(self.plan))['ETag']
+        self.edit()
+        response = self.client.post(
+            self.plan_url(self.plan, 'restaurer'), {'version_id': self.revision.id},
+            format='json', HTTP_IF_MATCH=etag,
+        )
+        self.assertEqual(response.status_code, 409)
+
+    def test_restaurer_requires_revision_id(self):
+        response = self.client.post(self.plan_url(self.plan, 'restaurer'), {}, format='json')
+        self.assertEqual(response.status_code, 400)
@@ -0,0 +1,19 @@
+from django.test import override_settings
+
+from .base import PlanAPITestCase
+
+
+@override_settings(API_SERVER_TIMING=True)
+class ServerTimingTests(PlanAPITestCase):
+    """En-tête Server-Timing des réponses de l'API."""
+
+    def timings(self, response):
+        entries = (entry.split(';') for entry in response['Server-Timing'].split(', '))
+        return {name: float(params[0].removeprefix('dur=')) for name, *params in entries}
+
+    def test_view_excludes_rendering(self):
+        plan = self.create_plan(formes=2)
+        timings = self.timings(self.client.get(self.plan_url(plan, 'measurements')))
+        self.assertIn('render', timings)
+        # Durées arrondies au centième de milliseconde
+        self.assertLessEqual(timings['view'] + timings['render'], timings['total'] + 0.02)
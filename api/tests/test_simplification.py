@@ -0,0 +1,29 @@
+from django.test import SimpleTestCase
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from api.serializers import FormeGeometriqueSerializer
+from plans.models import FormeGeometrique
+
+SIMPLIFICATIONS = {'12': [[0.0, 0.0], [2.0, 2.0], [0.0, 0.0]]}
+
+
+class FormeSimplificationTests(SimpleTestCase):
+    """Points simplifiés servis avec ``?simplify=<zoom>``."""
+
+    def serialize(self, data, zoom='10'):
+        request = Request(APIRequestFactory().get('/', {'simplify': zoom}))
+        forme = FormeGeometrique(type_forme='POLYGON', data=data, ordre=0, simplifications=SIMPLIFICATIONS)
+        return FormeGeometriqueSerializer(forme, context={'request': request}).data
+
+    def test_simplified_open_ring(self):
+        data = self.serialize({'points': [[0, 0], [1, 1], [2, 2], [1, 0]]})
+        self.assertEqual(data['data']['points'], [[0.0, 0.0], [2.0, 2.0]])
+
+    def test_full_geometry_beyond_the_bands(self):
+        points = [[0, 0], [1, 1], [2, 2], [1, 0]]
+        self.assertEqual(self.serialize({'points': points}, zoom='18')['data']['points'], points)
+
+    def test_empty_geometry(self):
+        self.assertEqual(self.serialize({'points': []})['data'], {'points': []})
+        self.assertEqual(self.serialize({})['data'], {})
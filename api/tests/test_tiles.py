@@ -0,0 +1,36 @@
+from plans.models import FormeGeometrique
+
+from .base import PlanAPITestCase, cercle
+
+# Tuile de zoom 12 contenant le centre des cercles de test (Paris)
+TILE = '/api/tiles/12/2074/1409.mvt'
+
+
+class PlanTileTests(PlanAPITestCase):
+    """Empreinte des tuiles limitée aux plans présents dans la tuile."""
+
+    def setUp(self):
+        super().setUp()
+        self.paris = self.create_plan(formes=1)
+        self.new_york = self.create_plan()
+        FormeGeometrique.objects.create(plan=self.new_york, ordre=0, **cercle(lng=-73.98, lat=40.75))
+
+    def save(self, plan, formes):
+        response = self.client.post(self.plan_url(plan, 'save_with_elements'), {'formes': formes}, format='json')
+        self.assertEqual(response.status_code, 200)
+
+    def test_edit_outside_the_tile_keeps_etag(self):
+        etag = self.client.get(TILE)['ETag']
+        self.save(self.new_york, [cercle(lng=-73.97, lat=40.76)])
+        self.assertEqual(self.client.get(TILE, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+    def test_edit_inside_the_tile_changes_etag(self):
+        etag = self.client.get(TILE)['ETag']
+        self.save(self.paris, [cercle(lng=2.351)])
+        self.assertEqual(self.client.get(TILE, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_forme_moved_into_the_tile_changes_etag(self):
+        etag = self.client.get(TILE)['ETag']
+        forme = self.new_york.formes.get()
+        self.save(self.new_york, [{'id': forme.id, **cercle(lng=2.352)}])
+        self.assertEqual(self.client.get(TILE, HTTP_IF_NONE_MATCH=etag).status_code, 200)
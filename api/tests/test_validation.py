@@ -0,0 +1,48 @@
+from django.test import SimpleTestCase
+
+from plans.models import FormeGeometrique
+from plans.validation import validate_forme, validate_formes
+
+from .base import PlanAPITestCase, cercle
+
+
+class ValidateFormeTests(SimpleTestCase):
+    """Schémas compilés des données de formes."""
+
+    def test_valid_formes(self):
+        self.assertIsNone(validate_forme('CERCLE', {'center': [2.35, 48.85], 'radius': 10}))
+        self.assertIsNone(validate_forme('POLYGON', {'points': [[0, 0], [1, 0], [1, 1], [0, 0]]}))
+        self.assertIsNone(validate_forme('TEXTE', {'content': 'Vanne', 'position': [2.35, 48.85]}))
+
+    def test_invalid_formes(self):
+        for type_forme, data in (
+            ('UNKNOWN', {'center': [0, 0]}),
+            ('CERCLE', {}),
+            ('CERCLE', {'center': [2.35, 48.85], 'radius': -1}),
+            ('CERCLE', {'center': [2.35, 48.85], 'radius': float('nan')}),
+            ('CERCLE', {'center': [200, 48.85], 'radius': 1}),
+            ('LIGNE', {'points': [[0, 0]]}),
+            ('POLYGON', {'points': [[0, 0], [1, 0], [0, 0]]}),
+            ('RECTANGLE', {'bounds': {'southWest': [1, 1], 'northEast': [0, 0]}}),
+            ('TEXTE', {'content': 'Vanne'}),
+        ):
+            with self.subTest(type_forme=type_forme, data=data):
+                self.assertIsNotNone(validate_forme(type_forme, data))
+
+    def test_errors_by_position(self):
+        erreurs = validate_formes([cercle(), {'type_forme': 'UNKNOWN', 'data': {}}, 'forme', cercle()])
+        self.assertEqual(set(erreurs), {1, 2})
+
+
+class SaveWithInvalidFormesTests(PlanAPITestCase):
+    """Les formes invalides sont écartées sans bloquer l'enregistrement des autres."""
+
+    def test_invalid_formes_are_reported(self):
+        plan = self.create_plan()
+        response = self.client.post(self.plan_url(plan, 'save_with_elements'), {
+            'formes': [cercle(), {'type_forme': 'UNKNOWN', 'data': {}}, cercle(radius=-1), cercle(lng=2.4)],
+        }, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['sauvegarde']['created'], 2)
+        self.assertEqual(set(response.data['sauvegarde']['rejetees']), {1, 2})
+        self.assertEqual(FormeGeometrique.objects.filter(plan=plan).count(), 2)
@@ -0,0 +1,84 @@
+from authentication.models import Utilisateur
+from plans.models import Plan
+
+from .base import PlanAPITestCase
+
+URL = '/api/plans/'
+
+
+class PlanVisibilityTests(PlanAPITestCase):
+    """Plans visibles selon le rôle (``plans_visibles``) et usine de rattachement des plans."""
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.autre_usine = Utilisateur.objects.create_user(
+            'autre_usine', 'autre_usine@example.com', 'motdepasse', role=Utilisateur.Role.USINE
+        )
+        cls.autre_concessionnaire = Utilisateur.objects.create_user(
+            'autre_concessionnaire', 'autre_concessionnaire@example.com', 'motdepasse',
+            role=Utilisateur.Role.CONCESSIONNAIRE, usine=cls.usine,
+        )
+        cls.autre_agriculteur = Utilisateur.objects.create_user(
+            'autre_agriculteur', 'autre_agriculteur@example.com', 'motdepasse',
+            role=Utilisateur.Role.AGRICULTEUR, concessionnaire=cls.autre_concessionnaire,
+        )
+
+    def visible_ids(self, user):
+        response = self.client_for(user).get(URL)
+        self.assertEqual(response.status_code, 200)
+        return {plan['id'] for plan in response.data}
+
+    def test_usine_sees_plans_through_hierarchy(self):
+        par_concessionnaire = self.create_plan(usine=None, agriculteur=None)
+        par_agriculteur = self.create_plan(usine=None, concessionnaire=None)
+        assigne = self.create_plan(concessionnaire=None, agriculteur=None)
+        ids = {par_concessionnaire.id, par_agriculteur.id, assigne.id}
+        self.assertEqual(self.visible_ids(self.usine), ids)
+        self.assertEqual(self.visible_ids(self.autre_usine), set())
+
+    def test_concessionnaire_and_agriculteur_scopes(self):
+        commun = self.create_plan()
+        sans_agriculteur = self.create_plan(agriculteur=None)
+        autre = self.create_plan(
+            createur=self.autre_concessionnaire,
+            concessionnaire=self.autre_concessionnaire,
+            agriculteur=self.autre_agriculteur,
+        )
+        self.assertEqual(self.visible_ids(self.concessionnaire), {commun.id, sans_agriculteur.id})
+        self.assertEqual(self.visible_ids(self.agriculteur), {commun.id})
+        self.assertEqual(self.visible_ids(self.autre_concessionnaire), {autre.id})
+        self.assertEqual(self.visible_ids(self.autre_agriculteur), {autre.id})
+        self.assertEqual(self.visible_ids(self.usine), {commun.id, sans_agriculteur.id, autre.id})
+        # Un plan invisible n'est pas non plus accessible directement
+        response = self.client_for(self.agriculteur).get(self.plan_url(autre))
+        self.assertEqual(response.status_code, 404)
+
+    def test_moving_concessionnaire_to_another_usine(self):
+        plan = self.create_plan(usine=None)
+        self.assertEqual(Plan.objects.get(pk=plan.pk).root_usine_id, self.usine.id)
+
+        self.concessionnaire.usine = self.autre_usine
+        self.concessionnaire.save(update_fields=['usine'])
+
+        self.assertEqual(Plan.objects.get(pk=plan.pk).root_usine_id, self.autre_usine.id)
+        self.agriculteur.refresh_from_db()
+        self.assertEqual(self.agriculteur.root_usine_id, self.autre_usine.id)
+        self.assertEqual(self.visible_ids(self.usine), set())
+        self.assertEqual(self.visible_ids(self.autre_usine), {plan.id})
+        self.assertEqual(self.visible_ids(self.concessionnaire), {plan.id})
+
+    def test_moving_concessionnaire_moves_plans_of_its_agriculteurs(self):
+        plan = self.create_plan(usine=None, concessionnaire=None)
+        self.concessionnaire.usine = self.autre_usine
+        self.concessionnaire.save()
+        self.assertEqual(Plan.objects.get(pk=plan.pk).root_usine_id, self.autre_usine.id)
+        self.assertEqual(self.visible_ids(self.autre_usine), {plan.id})
+        self.assertEqual(self.visible_ids(self.agriculteur), {plan.id})
+
+    def test_assigned_usine_takes_precedence(self):
+        plan = self.create_plan()
+        self.concessionnaire.usine = self.autre_usine
+        self.concessionnaire.save(update_fields=['usine'])
+        self.assertEqual(Plan.objects.get(pk=plan.pk).root_usine_id, self.usine.id)
+        self.assertEqual(self.visible_ids(self.usine), {plan.id})
@@ -0,0 +1,119 @@
+"""
+Tuiles vectorielles (Mapbox Vector Tile) des plans, encodées par PostGIS.
+
+Chaque tuile contient trois couches : ``formes`` (géométrie dérivée, avec les
+propriétés de style de la forme), ``connexions`` et ``annotations``. Seuls les
+éléments qui intersectent la tuile sont lus, grâce aux index spatiaux.
+"""
+import hashlib
+import math
+
+from django.contrib.gis.geos import Polygon
+from django.db import connection
+from django.db.models import Q
+from rest_framework.exceptions import ValidationError
+
+from plans.models import Connexion, FormeGeometrique, TexteAnnotation
+
+EXTENT = 4096
+BUFFER = 64
+MAX_ZOOM = 24
+# Marge (degrés) de l'emprise des plans d'une tuile : les arrondis de la
+# projection ne doivent pas écarter un élément que PostGIS place sur le bord
+ENVELOPE_MARGIN = 1e-7
+
+
+def validate_tile(z, x, y):
+    if not 0 <= z <= MAX_ZOOM or not (0 <= x < 2 ** z and 0 <= y < 2 ** z):
+        raise ValidationError({'detail': f'Tuile inexistante : {z}/{x}/{y}'})
+
+
+def tile_envelope(z, x, y):
+    """Emprise WGS 84 de la tuile ``z/x/y`` (comme ``ST_Transform(ST_TileEnvelope(z, x, y), 4326)``)."""
+    n = 2 ** z
+
+    def lat(row):
+        return math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * row / n))))
+
+    envelope = Polygon.from_bbox((
+        x / n * 360 - 180 - ENVELOPE_MARGIN,
+        lat(y + 1) - ENVELOPE_MARGIN,
+        (x + 1) / n * 360 - 180 + ENVELOPE_MARGIN,
+        lat(y) + ENVELOPE_MARGIN,
+    ))
+    envelope.srid = 4326
+    return envelope
+
+
+def plans_in_tile(plans, z, x, y):
+    """
+    Plans de ``plans`` dont une forme, une connexion ou une annotation
+    intersecte l'emprise de la tuile (recherche par les index spatiaux des
+    éléments, indépendante du nombre de plans du portefeuille).
+    """
+    envelope = tile_envelope(z, x, y)
+    return plans.filter(
+        Q(id__in=FormeGeometrique.objects.filter(geometrie__bboverlaps=envelope).values('plan_id'))
+        | Q(id__in=Connexion.objects.filter(geometrie__bboverlaps=envelope).values('plan_id'))
+        | Q(id__in=TexteAnnotation.objects.filter(position__bboverlaps=envelope).values('plan_id'))
+    )
+
+
+def plans_digest(plans):
+    """
+    Empreinte des plans d'une tuile (identifiants et versions), en une requête :
+    elle change dès qu'un des plans est modifié, ajouté ou retiré du périmètre.
+
+    ``plans`` est restreint aux plans présents dans la tuile (voir
+    ``plans_in_tile``) : un élément déplacé hors de la tuile retire son plan
+    de l'empreinte, un élément déplacé dedans l'y ajoute.
+    """
+    versions = plans.order_by('id').values_list('id', 'version')
+    return hashlib.sha1(','.join(f'{pk}:{version}' for pk, version in versions).encode()).hexdigest()
+
+
+def _layer(name, columns, table, geometry):
+    return f"""
+    {name} AS (
+        SELECT {columns},
+               ST_AsMVTGeom(ST_Transform(t.{geometry}, 3857), bounds.envelope, {EXTENT}, {BUFFER}, true) AS geom
+        FROM {table} t, bounds
+        WHERE t.plan_id IN (SELECT id FROM visibles)
+          AND t.{geometry} && bounds.envelope_4326
+    )"""
+
+
+def build_tile(z, x, y, plans):
+    """Encode la tuile ``z/x/y`` des formes, connexions et annotations des plans ``plans``."""
+    plans_sql, plans_params = plans.order_by().values('id').query.sql_with_params()
+    layers = ',\n'.join([
+        _layer(
+            'formes',
+            "t.id, t.plan_id, t.type_forme, t.ordre, t.data -> 'style' AS style",
+            FormeGeometrique._meta.db_table, 'geometrie',
+        ),
+        _layer(
+            'connexions',
+            't.id, t.plan_id, t.forme_source_id, t.forme_destination_id',
+            Connexion._meta.db_table, 'geometrie',
+        ),
+        _layer(
+            'annotations',
+            't.id, t.plan_id, t.texte, t.rotation',
+            TexteAnnotation._meta.db_table, 'position',
+        ),
+    ])
+    mvt = ' || '.join(
+        f"COALESCE((SELECT ST_AsMVT({name}, '{name}', {EXTENT}, 'geom') FROM {name} WHERE geom IS NOT NULL), ''::bytea)"
+        for name in ('formes', 'connexions', 'annotations')
+    )
+    sql = f"""
+    WITH tile AS (SELECT ST_TileEnvelope(%s, %s, %s) AS envelope),
+    bounds AS (SELECT envelope, ST_Transform(envelope, 4326) AS envelope_4326 FROM tile),
+    visibles AS ({plans_sql}),
+    {layers}
+    SELECT {mvt}
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [z, x, y, *plans_params])
+        return bytes(cursor.fetchone()[0])
@@ -7,6 +7,7 @@ from .views import (
     FormeGeometriqueViewSet,
     ConnexionViewSet,
     TexteAnnotationViewSet,
+    PlanTileView,
     elevation_proxy
 )
 
@@ -21,4 +22,5 @@ router.register(r'annotations', TexteAnnotationViewSet, basename='annotation')
 urlpatterns = [
     path('', include(router.urls)),
     path('elevation/', elevation_proxy, name='elevation-proxy'),
+    path('tiles/<int:z>/<int:x>/<int:y>.mvt', PlanTileView.as_view(), name='plan-tile'),
 ] 
\ No newline at end of file
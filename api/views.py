@@ -1,7 +1,11 @@
+import logging
+from concurrent.futures import TimeoutError as FutureTimeoutError
+
 from django.shortcuts import render
 from rest_framework import viewsets, permissions, status
 from rest_framework.decorators import action, api_view
 from rest_framework.response import Response
+from rest_framework.views import APIView
 from django.db.models import Q, Count
 from .serializers import (
     UserSerializer,
@@ -11,25 +15,71 @@ from .serializers import (
     FormeGeometriqueSerializer,
     ConnexionSerializer,
     TexteAnnotationSerializer,
-    PlanDetailSerializer
+    PlanDetailSerializer,
+    RevisionPlanSerializer,
 )
 from .permissions import IsAdmin, IsConcessionnaire, IsUsine
+from .pagination import FormeCursorPagination, PlanCursorPagination, RevisionCursorPagination
+from .spatial import filter_bbox
+from .query_budget import QueryBudgetMixin
+from .cache import coverage_cache, network_cache, plan_payload_cache, tile_cache
+from .renderers import FastJSONRenderer, MVTRenderer
+from .tiles import build_tile, plans_digest, plans_in_tile, validate_tile
+from .streaming import streaming_json_response
+from .conditional import (
+    compute_etag,
+    etag_matches,
+    list_etag,
+    not_modified_response,
+    plan_etag,
+    plan_instance_etag,
+    PlanVersionConflict,
+    stored_plan_etag,
+    expected_version,
+    set_validators,
+)
 from django.contrib.auth import get_user_model
-from plans.models import Plan, FormeGeometrique, Connexion, TexteAnnotation
+from plans.models import Plan, FormeGeometrique, Connexion, TexteAnnotation, ElementSupprime, VersionConflict
+from plans.services import batch_update_plans, restore_plan_revision, save_plan_elements
+from plans.revisions import record_revision
+from plans.operations import OperationError, apply_operations
+from plans.coalescing import SaveSnapshot, plan_save_coalescer
+from plans.validation import validate_formes
+from plans.measurements import measure_formes
+from plans.coverage import EMITTER_TYPES, PARCEL_TYPES, compute_coverage
+from plans.network import PipeNetwork
 import requests
 from django.db import transaction
 from django.shortcuts import get_object_or_404
+from django.http import HttpResponse
+from django.conf import settings
 from rest_framework.exceptions import ValidationError
 from rest_framework.exceptions import PermissionDenied
 
 User = get_user_model()  # Ceci pointera vers authentication.Utilisateur
 
+logger = logging.getLogger(__name__)
+
 # Mise à jour des valeurs de rôle pour correspondre au modèle Utilisateur
 ROLE_ADMIN = 'ADMIN'
 ROLE_USINE = 'USINE'
 ROLE_DEALER = 'CONCESSIONNAIRE'
 ROLE_AGRICULTEUR = 'AGRICULTEUR'
 
+def plans_visibles(user, prefix=''):
+    """
+    Condition de visibilité des plans selon le rôle de l'utilisateur, réduite à
+    une égalité sur une colonne indexée. Avec ``prefix='plan__'``, s'applique
+    aux formes, connexions et annotations.
+    """
+    if user.role == ROLE_ADMIN:
+        return Q()
+    if user.role == ROLE_USINE:
+        return Q(**{f'{prefix}root_usine': user})
+    if user.role == ROLE_DEALER:
+        return Q(**{f'{prefix}concessionnaire': user})
+    return Q(**{f'{prefix}agriculteur': user})
+
 # Create your views here.
 
 class UserViewSet(viewsets.ModelViewSet):
@@ -53,67 +103,58 @@ class UserViewSet(viewsets.ModelViewSet):
         usine_id = self.request.query_params.get('usine')
         concessionnaire_id = self.request.query_params.get('concessionnaire')
         
-        print(f"\n[UserViewSet][get_queryset] ====== DÉBUT REQUÊTE ======")
-        print(f"Utilisateur connecté: {user.username} (role: {user.role}, id: {user.id})")
-        print(f"Paramètres reçus:")
-        print(f"- role demandé: {role}")
-        print(f"- usine_id: {usine_id}")
-        print(f"- concessionnaire_id: {concessionnaire_id}")
+        debug = logger.isEnabledFor(logging.DEBUG)
+        logger.debug(
+            "[UserViewSet][get_queryset] Utilisateur: %s (role: %s, id: %s) - "
+            "role demandé: %s, usine_id: %s, concessionnaire_id: %s",
+            user.username, user.role, user.id, role, usine_id, concessionnaire_id,
+        )
         
         # Appliquer les filtres de base selon le rôle demandé
         if role:
-            print(f"\nApplication du filtre de rôle: {role}")
             base_queryset = base_queryset.filter(role=role)
-            print(f"Nombre d'utilisateurs après filtre de rôle: {base_queryset.count()}")
+            if debug:
+                logger.debug("Nombre d'utilisateurs après filtre de rôle %s: %s", role, base_queryset.count())
 
         # Filtrer selon le rôle de l'utilisateur connecté
         if user.role == ROLE_ADMIN:
-            print("\nTraitement pour ADMIN")
             if usine_id:
                 if role == ROLE_DEALER:
-                    print(f"Filtrage des concessionnaires pour l'usine {usine_id}")
                     base_queryset = base_queryset.filter(usine_id=usine_id)
                 elif role == ROLE_AGRICULTEUR:
-                    print(f"Filtrage des agriculteurs pour l'usine {usine_id}")
-                    base_queryset = base_queryset.filter(concessionnaire__usine_id=usine_id)
+                    base_queryset = base_queryset.filter(root_usine_id=usine_id)
             if concessionnaire_id:
-                print(f"Filtrage par concessionnaire: {concessionnaire_id}")
                 base_queryset = base_queryset.filter(concessionnaire_id=concessionnaire_id)
         
         elif user.role == ROLE_USINE:
-            print("\nTraitement pour USINE")
             if role == ROLE_DEALER:
-                print("Filtrage des concessionnaires de l'usine")
                 base_queryset = base_queryset.filter(usine=user)
             elif role == ROLE_AGRICULTEUR:
-                print("Filtrage des agriculteurs de l'usine")
-                base_queryset = base_queryset.filter(concessionnaire__usine=user)
+                base_queryset = base_queryset.filter(root_usine=user)
                 if concessionnaire_id:
-                    print(f"Filtrage supplémentaire par concessionnaire: {concessionnaire_id}")
                     base_queryset = base_queryset.filter(concessionnaire_id=concessionnaire_id)
                     
-                # Debug des agriculteurs trouvés
-                agriculteurs = base_queryset.values('id', 'username', 'first_name', 'last_name', 'concessionnaire__username')
-                print("\nAgriculteurs trouvés:")
-                for agri in agriculteurs:
-                    print(f"- {agri['username']} (ID: {agri['id']}, Concessionnaire: {agri['concessionnaire__username']})")
+                # Debug des agriculteurs trouvés (requête supplémentaire, uniquement en DEBUG)
+                if debug:
+                    for agri in base_queryset.values('id', 'username', 'concessionnaire__username'):
+                        logger.debug(
+                            "- %s (ID: %s, Concessionnaire: %s)",
+                            agri['username'], agri['id'], agri['concessionnaire__username'],
+                        )
         
         elif user.role == ROLE_DEALER:
-            print("\nTraitement pour CONCESSIONNAIRE")
             if role == ROLE_AGRICULTEUR:
-                print("Filtrage des agriculteurs du concessionnaire")
                 base_queryset = base_queryset.filter(concessionnaire=user)
             else:
                 base_queryset = base_queryset.filter(id=user.id)
         
         else:  # ROLE_AGRICULTEUR
-            print("\nTraitement pour AGRICULTEUR")
             base_queryset = base_queryset.filter(id=user.id)
 
-        print(f"\nRequête SQL finale: {base_queryset.query}")
         result = base_queryset.distinct()
-        print(f"Nombre total de résultats: {result.count()}")
-        print("[UserViewSet][get_queryset] ====== FIN REQUÊTE ======\n")
+        if debug:
+            logger.debug("Requête SQL finale: %s", result.query)
+            logger.debug("Nombre total de résultats: %s", result.count())
         return result
 
     def get_permissions(self):
@@ -217,7 +258,7 @@ class UserViewSet(viewsets.ModelViewSet):
         concessionnaire = serializer.validated_data.get('concessionnaire')
         agriculteur = serializer.validated_data.get('agriculteur')
 
-        print(f"[PlanViewSet] perform_create - Données validées: {serializer.validated_data}")
+        logger.debug("[PlanViewSet] perform_create - Données validées: %s", serializer.validated_data)
 
         # Vérifier l'existence de l'usine
         if usine:
@@ -256,7 +297,7 @@ class UserViewSet(viewsets.ModelViewSet):
             data['concessionnaire'] = concessionnaire
             data['agriculteur'] = agriculteur
 
-        print(f"[PlanViewSet] perform_create - Données finales: {data}")
+        logger.debug("[PlanViewSet] perform_create - Données finales: %s", data)
         serializer.save(createur=user, **data)
 
     def perform_update(self, serializer):
@@ -328,12 +369,36 @@ class ClientViewSet(viewsets.ModelViewSet):
         else:
             serializer.save(role='AGRICULTEUR')
 
-class PlanViewSet(viewsets.ModelViewSet):
+class PlanViewSet(QueryBudgetMixin, viewsets.ModelViewSet):
     """
     ViewSet pour gérer les plans d'irrigation.
+
+    La liste accepte une pagination par curseur (``?page_size=``/``?cursor=``),
+    des champs partiels (``?fields=``/``?omit=``) et un envoi en flux (``?stream=true``).
+    Avec ``?simplify=<zoom>``, les lignes, polygones et connexions sont servis
+    avec leurs points simplifiés pour ce niveau de zoom.
     """
     serializer_class = PlanSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = PlanCursorPagination
+    # Authentification + validateurs HTTP + plans + formes/connexions/annotations
+    # préchargées (+ curseur)
+    query_budgets = {
+        'list': 7,
+        'retrieve': 6,
+        'changes': 7,
+        # Authentification + plan + formes (+ curseur)
+        'formes': 3,
+        # Authentification + plan + formes
+        'measurements': 3,
+        # Authentification + plan + arroseurs et parcelles (résultat en cache ensuite)
+        'coverage': 3,
+        # Authentification + plan + connexions avec le type de leurs formes (graphe en cache ensuite)
+        'network': 3,
+        # Authentification + plans + utilisateurs + écriture + usine de
+        # rattachement + dernières révisions + formes des images + révisions
+        'batch': 8,
+    }
 
     def get_queryset(self):
         """
@@ -344,7 +409,7 @@ class PlanViewSet(viewsets.ModelViewSet):
         - Agriculteur : uniquement ses plans
         """
         user = self.request.user
-        base_queryset = Plan.objects.all()
+        base_queryset = self.setup_eager_loading(Plan.objects.all())
 
         # Récupérer les paramètres de filtrage
         concessionnaire_id = self.request.query_params.get('concessionnaire')
@@ -362,11 +427,8 @@ class PlanViewSet(viewsets.ModelViewSet):
         elif user.role == ROLE_USINE:
             # Une usine peut voir les plans où elle est assignée directement
             # ou liés à ses concessionnaires et leurs agriculteurs
-            base_queryset = base_queryset.filter(
-                Q(usine=user) |  # Plans directement liés à l'usine
-                Q(concessionnaire__usine=user) |  # Plans liés aux concessionnaires de l'usine
-                Q(agriculteur__concessionnaire__usine=user)  # Plans liés aux agriculteurs des concessionnaires de l'usine
-            )
+            # (usine de rattachement dénormalisée, maintenue à l'enregistrement)
+            base_queryset = base_queryset.filter(plans_visibles(user))
             
             # Filtres additionnels si spécifiés
             if concessionnaire_id:
@@ -377,54 +439,198 @@ class PlanViewSet(viewsets.ModelViewSet):
             return base_queryset
         elif user.role == ROLE_DEALER:
             # Filtrer d'abord par le concessionnaire connecté
-            base_queryset = base_queryset.filter(concessionnaire=user)
+            base_queryset = base_queryset.filter(plans_visibles(user))
             # Si un agriculteur est spécifié, filtrer par cet agriculteur
             if agriculteur_id:
                 base_queryset = base_queryset.filter(agriculteur_id=agriculteur_id)
             return base_queryset
         else:  # agriculteur
-            return base_queryset.filter(agriculteur=user)
+            return base_queryset.filter(plans_visibles(user))
+
+    def list(self, request, *args, **kwargs):
+        """
+        Liste les plans avec un ETag : renvoie 304 si aucun plan visible n'a
+        été modifié, ajouté ou supprimé depuis la dernière lecture du client.
+        """
+        queryset = self.filter_queryset(self.get_queryset())
+        etag = list_etag(queryset)
+        if etag_matches(request, etag):
+            return not_modified_response(etag)
+        if request.query_params.get('stream') == 'true':
+            response = self.stream_list(queryset)
+        else:
+            response = super().list(request, *args, **kwargs)
+        return set_validators(response, etag)
+
+    def stream_list(self, queryset):
+        """
+        Sérialise la liste au fil de l'envoi (``?stream=true``) au lieu de
+        construire toute la réponse en mémoire ; utile avec ``include_details``.
+        """
+        chunk_size = getattr(settings, 'PLAN_STREAM_CHUNK_SIZE', 100)
+        return streaming_json_response(queryset, self.get_serializer(), chunk_size=chunk_size)
+
+    def retrieve(self, request, *args, **kwargs):
+        """
+        Retourne un plan avec un ETag fort. Si le client possède déjà la version
+        courante (If-None-Match), renvoie 304 sans sérialiser le plan.
+        """
+        pk = kwargs[self.lookup_field]
+        etag = plan_etag(self.filter_queryset(self.get_queryset()), pk)
+        if etag_matches(request, etag):
+            return not_modified_response(etag)
+
+        cacheable = etag is not None and self.is_payload_cacheable(request)
+        if cacheable:
+            content = plan_payload_cache.get(pk, etag)
+            if content is not None:
+                return set_validators(HttpResponse(content, content_type='application/json'), etag)
+
+        response = super().retrieve(request, *args, **kwargs)
+        if cacheable:
+            content = request.accepted_renderer.render(
+                response.data, request.accepted_media_type, self.get_renderer_context()
+            )
+            plan_payload_cache.set(pk, etag, content)
+            response = HttpResponse(content, content_type='application/json')
+        return set_validators(response, etag)
+
+    def is_payload_cacheable(self, request):
+        """Seules les réponses JSON complètes (sans champs partiels ni simplification) sont mises en cache."""
+        params = request.query_params
+        return (
+            request.accepted_renderer.format == 'json'
+            and 'fields' not in params
+            and 'omit' not in params
+            and 'simplify' not in params
+        )
+
+    def update(self, request, *args, **kwargs):
+        response = super().update(request, *args, **kwargs)
+        response['ETag'] = stored_plan_etag(self.updated_plan)
+        return response
+
+    def perform_create(self, serializer):
+        """Création du plan et de sa première révision (image complète)."""
+        with transaction.atomic():
+            plan = serializer.save()
+            record_revision(plan, plan.version, self.request.user)
+
+    def perform_update(self, serializer):
+        """
+        Mise à jour conditionnelle : avec ``If-Match``, la version du plan est
+        incrémentée par compare-and-swap avant l'écriture (409 en cas de conflit).
+        """
+        plan = serializer.instance
+        expected = expected_version(self.request, plan)
+        with transaction.atomic():
+            try:
+                plan.bump_version(expected_version=expected)
+            except VersionConflict as e:
+                raise PlanVersionConflict(e.current_version)
+            super().perform_update(serializer)
+            record_revision(plan, plan.version, self.request.user)
+        plan_payload_cache.invalidate(plan.pk)
+        self.updated_plan = serializer.instance
+
+    def perform_destroy(self, instance):
+        plan_id = instance.pk
+        super().perform_destroy(instance)
+        plan_payload_cache.invalidate(plan_id)
+
+    def setup_eager_loading(self, queryset):
+        """
+        Précharge les relations utilisées par le serializer de l'action courante,
+        pour un nombre de requêtes constant quel que soit le nombre de plans.
+        """
+        if self.action in ('save_with_elements', 'operations', 'historique', 'restaurer', 'formes',
+                           'measurements', 'coverage', 'network'):
+            # Actions sans sérialisation du plan chargé : seul le créateur sert au contrôle d'accès
+            return queryset.select_related('createur__concessionnaire')
+        serializer_class = self.get_serializer_class()
+        field_names = self.get_serializer().fields.keys()
+        return serializer_class.setup_eager_loading(queryset, field_names)
 
     def get_serializer_class(self):
         """
         Retourne le serializer approprié selon le contexte.
         """
-        print(f"[PlanViewSet] get_serializer_class - Action: {self.action}, Params: {self.request.query_params}")
-        
         # Si l'action est 'list' et que le paramètre include_details est True, utiliser PlanDetailSerializer
         if self.action == 'list' and self.request.query_params.get('include_details') == 'true':
-            print("[PlanViewSet] Utilisation de PlanDetailSerializer pour la liste avec détails")
             return PlanDetailSerializer
         elif self.action in ['retrieve', 'update', 'partial_update', 'save_with_elements']:
-            print(f"[PlanViewSet] Utilisation de PlanDetailSerializer pour {self.action}")
             return PlanDetailSerializer
-        
-        print(f"[PlanViewSet] Utilisation de PlanSerializer par défaut pour {self.action}")
+
         return PlanSerializer
 
+    @action(detail=True, methods=['get'])
+    def changes(self, request, pk=None):
+        """
+        Retourne les éléments créés, modifiés ou supprimés depuis une version
+        (``?since=<version>``), pour resynchroniser un plan déjà chargé.
+        """
+        try:
+            since = int(request.query_params.get('since', 0))
+        except ValueError:
+            raise ValidationError({'since': 'La version doit être un entier.'})
+
+        plan = self.get_object()
+        supprimes = {'formes': [], 'connexions': [], 'annotations': []}
+        cles = {
+            ElementSupprime.TypeElement.FORME: 'formes',
+            ElementSupprime.TypeElement.CONNEXION: 'connexions',
+            ElementSupprime.TypeElement.ANNOTATION: 'annotations',
+        }
+        for type_element, element_id in plan.suppressions.filter(version__gt=since).values_list('type_element', 'element_id'):
+            supprimes[cles[type_element]].append(element_id)
+
+        return Response({
+            'id': plan.id,
+            'since': since,
+            'version': plan.version,
+            'date_modification': plan.date_modification,
+            'nom': plan.nom,
+            'description': plan.description,
+            'preferences': plan.preferences,
+            'formes': FormeGeometriqueSerializer(plan.formes.filter(version__gt=since), many=True).data,
+            'connexions': ConnexionSerializer(plan.connexions.filter(version__gt=since), many=True).data,
+            'annotations': TexteAnnotationSerializer(plan.annotations.filter(version__gt=since), many=True).data,
+            'supprimes': supprimes,
+        })
+
+    def can_edit_elements(self, plan, user):
+        """Vérifie que l'utilisateur peut modifier les éléments du plan."""
+        return not (
+            plan.createur != user and
+            user.role not in [ROLE_ADMIN, ROLE_DEALER] and
+            (user.role == ROLE_DEALER and plan.createur.concessionnaire != user)
+        )
+
     @action(detail=True, methods=['post'])
-    @transaction.atomic
     def save_with_elements(self, request, pk=None):
         """
-        Sauvegarde un plan avec ses formes géométriques, connexions et annotations
+        Sauvegarde un plan avec ses formes géométriques, connexions et annotations.
+
+        L'écriture (voir ``plans.services.save_plan_elements``) se fait par lots,
+        en un nombre de requêtes indépendant du nombre de formes ; la transaction
+        ne couvre que l'écriture, pas la sérialisation de la réponse.
+
+        Écriture conditionnelle : avec ``If-Match`` (ETag du plan) ou le champ
+        ``version``, un plan modifié entre-temps renvoie 409 et sa version courante.
+
+        Les formes invalides (voir ``plans.validation``) n'empêchent pas
+        l'enregistrement des autres : elles sont écartées et
+        ``sauvegarde.rejetees`` associe leur position dans ``formes`` à l'erreur.
         """
-        print(f"\n[PlanViewSet][save_with_elements] Début de la sauvegarde - Plan ID: {pk}")
-        print(f"[PlanViewSet][save_with_elements] URL de la requête: {request.path}")
-        print(f"[PlanViewSet][save_with_elements] Méthode: {request.method}")
-        print(f"[PlanViewSet][save_with_elements] User: {request.user.username} (role: {request.user.role})")
-        
-        try:
-            plan = self.get_object()
-            print(f"[PlanViewSet][save_with_elements] Plan trouvé: {plan.id} - {plan.nom}")
-        except Exception as e:
-            print(f"[PlanViewSet][save_with_elements] ERREUR lors de la récupération du plan: {str(e)}")
-            raise
+        logger.debug(
+            "[PlanViewSet][save_with_elements] Début de la sauvegarde - Plan ID: %s, User: %s (role: %s)",
+            pk, request.user.username, request.user.role,
+        )
+        plan = self.get_object()
         
         # Vérifier les permissions
-        if (plan.createur != request.user and 
-            request.user.role not in [ROLE_ADMIN, ROLE_DEALER] and
-            (request.user.role == ROLE_DEALER and plan.createur.concessionnaire != request.user)):
-            print(f"[PlanViewSet][save_with_elements] Permission refusée pour l'utilisateur {request.user.username}")
+        if not self.can_edit_elements(plan, request.user):
+            logger.debug("[PlanViewSet][save_with_elements] Permission refusée pour l'utilisateur %s", request.user.username)
             return Response(
                 {'detail': 'Vous n\'avez pas la permission de modifier ce plan'},
                 status=status.HTTP_403_FORBIDDEN
@@ -436,117 +642,440 @@ class PlanViewSet(viewsets.ModelViewSet):
         annotations_data = request.data.get('annotations', [])
         elements_to_delete = request.data.get('elementsToDelete', [])
         
-        print(f"[PlanViewSet][save_with_elements] Données reçues:")
-        print(f"- Formes: {len(formes_data)} éléments")
-        print(f"- Connexions: {len(connexions_data)} éléments")
-        print(f"- Annotations: {len(annotations_data)} éléments")
-        print(f"- Éléments à supprimer: {elements_to_delete}")
+        logger.debug(
+            "[PlanViewSet][save_with_elements] Données reçues: %s formes, %s connexions, %s annotations, éléments à supprimer: %s",
+            len(formes_data), len(connexions_data), len(annotations_data), elements_to_delete,
+        )
         
+        if not isinstance(formes_data, list):
+            return Response({'formes': 'Une liste de formes est attendue'}, status=status.HTTP_400_BAD_REQUEST)
+        # Validation en une passe sur les données brutes, avant toute écriture :
+        # les formes invalides sont écartées (et signalées), les autres enregistrées
+        rejetees = validate_formes(formes_data)
+        positions = [position for position in range(len(formes_data)) if position not in rejetees]
+        if rejetees:
+            logger.warning(
+                "[PlanViewSet][save_with_elements] %s forme(s) invalide(s) écartée(s) - Plan ID: %s: %s",
+                len(rejetees), pk, rejetees,
+            )
+            formes_data = [formes_data[position] for position in positions]
+
+        expected = expected_version(request, plan, field='version')
+        snapshot = SaveSnapshot(
+            formes_data=formes_data,
+            elements_to_delete=elements_to_delete,
+            clear_existing=request.data.get('clear_existing', False),
+            preferences=request.data.get('preferences'),
+            user=request.user,
+        )
+        # Les enregistrements groupés ne sont pas conditionnels (dernier écrivain gagnant)
+        if request.query_params.get('coalesce') == 'true' and plan_save_coalescer.enabled and expected is None:
+            return self.coalesced_save(plan, snapshot, positions, rejetees)
+
         try:
-            # Supprimer les éléments existants si demandé
-            if request.data.get('clear_existing', False):
-                print("[PlanViewSet][save_with_elements] Suppression de tous les éléments existants")
-                plan.formes.all().delete()
-                plan.connexions.all().delete()
-                plan.annotations.all().delete()
-            
-            # Supprimer les éléments spécifiques demandés
-            if elements_to_delete:
-                print(f"[PlanViewSet][save_with_elements] Suppression des éléments: {elements_to_delete}")
-                deleted_count = FormeGeometrique.objects.filter(
-                    id__in=elements_to_delete,
-                    plan=plan
-                ).delete()[0]
-                print(f"[PlanViewSet][save_with_elements] {deleted_count} éléments supprimés")
-
-            # Créer/Mettre à jour les formes
-            for forme_data in formes_data:
-                forme_id = forme_data.pop('id', None)
-                type_forme = forme_data.get('type_forme')
-                data = forme_data.get('data', {})
-                
-                print(f"[PlanViewSet][save_with_elements] Traitement forme: ID={forme_id}, Type={type_forme}")
-                
-                if forme_id:
-                    try:
-                        forme = FormeGeometrique.objects.get(id=forme_id, plan=plan)
-                        print(f"[PlanViewSet][save_with_elements] Mise à jour forme existante: {forme_id}")
-                        forme.type_forme = type_forme
-                        forme.data = data
-                        forme.save()
-                    except FormeGeometrique.DoesNotExist:
-                        print(f"[PlanViewSet][save_with_elements] Forme {forme_id} non trouvée, création d'une nouvelle")
-                        FormeGeometrique.objects.create(
-                            plan=plan,
-                            type_forme=type_forme,
-                            data=data
-                        )
-                else:
-                    print("[PlanViewSet][save_with_elements] Création d'une nouvelle forme")
-                    FormeGeometrique.objects.create(
-                        plan=plan,
-                        type_forme=type_forme,
-                        data=data
-                    )
+            result = save_plan_elements(
+                plan,
+                formes_data=snapshot.formes_data,
+                elements_to_delete=snapshot.elements_to_delete,
+                clear_existing=snapshot.clear_existing,
+                preferences=snapshot.preferences,
+                expected_version=expected,
+                user=snapshot.user,
+            )
+            plan_payload_cache.invalidate(plan.pk)
+            logger.debug("[PlanViewSet][save_with_elements] Sauvegarde réussie - Plan ID: %s, %s", plan.pk, result)
+
+            # Retourner le plan mis à jour (rechargé : les éléments préchargés sont obsolètes)
+            plan = PlanDetailSerializer.setup_eager_loading(Plan.objects.filter(pk=plan.pk)).get()
+            data = PlanDetailSerializer(plan).data
+            # Compteurs d'écriture : les formes inchangées (même empreinte) ne sont pas réécrites
+            data['sauvegarde'] = {key: result[key] for key in ('created', 'updated', 'skipped', 'deleted')}
+            data['sauvegarde']['rejetees'] = rejetees
+            return Response(data, headers={'ETag': stored_plan_etag(plan)})
 
-            # Sauvegarder les préférences
-            if preferences := request.data.get('preferences'):
-                print("[PlanViewSet][save_with_elements] Mise à jour des préférences")
-                plan.preferences = preferences
-                plan.save(update_fields=['preferences'])
+        except VersionConflict as e:
+            raise PlanVersionConflict(e.current_version)
+        except Exception as e:
+            logger.exception("[PlanViewSet][save_with_elements] Erreur lors de la sauvegarde du plan %s", plan.pk)
+            return Response(
+                {'detail': f'Erreur lors de la sauvegarde: {str(e)}'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
 
-            # Forcer la mise à jour de la date de modification
-            plan.touch()
-            print("[PlanViewSet][save_with_elements] Sauvegarde réussie")
+    def coalesced_save(self, plan, snapshot, positions, rejetees):
+        """
+        Enregistrement groupé (``?coalesce=true``) : l'instantané est fusionné
+        avec ceux du même plan reçus dans la fenêtre de regroupement, puis écrit
+        par les threads d'enregistrement. La réponse est un simple accusé de
+        réception avec la version écrite et les identifiants attribués aux
+        formes nouvelles de l'instantané (``ids`` : position dans ``formes`` ->
+        identifiant), que l'éditeur reporte sur ses éléments.
 
-            # Retourner le plan mis à jour
-            serializer = PlanDetailSerializer(plan)
-            return Response(serializer.data)
+        ``positions`` donne la position dans la requête de chaque forme de
+        l'instantané (les formes invalides, ``rejetees``, en sont écartées).
 
+        Un 503 (délai dépassé) garantit que l'instantané n'a pas été écrit et
+        ne le sera pas : il peut être renvoyé sans créer de doublons.
+        """
+        future = plan_save_coalescer.submit(plan.pk, snapshot)
+        try:
+            try:
+                result = future.result(timeout=settings.PLAN_SAVE_COALESCE_TIMEOUT)
+            except FutureTimeoutError:
+                # Retiré de la file, l'instantané ne sera pas écrit : le client peut le renvoyer.
+                # Sinon son lot est en cours d'écriture : on attend son résultat, pour ne pas
+                # inviter le client à renvoyer des formes déjà créées.
+                if plan_save_coalescer.cancel(plan.pk, future):
+                    return Response(
+                        {'detail': 'L\'enregistrement est toujours en attente, réessayez plus tard'},
+                        status=status.HTTP_503_SERVICE_UNAVAILABLE
+                    )
+                result = future.result()
         except Exception as e:
-            print(f"[PlanViewSet][save_with_elements] ERREUR lors de la sauvegarde: {str(e)}")
-            print(f"[PlanViewSet][save_with_elements] Type d'erreur: {type(e)}")
-            import traceback
-            print(f"[PlanViewSet][save_with_elements] Traceback:\n{traceback.format_exc()}")
             return Response(
                 {'detail': f'Erreur lors de la sauvegarde: {str(e)}'},
                 status=status.HTTP_400_BAD_REQUEST
             )
 
-class FormeGeometriqueViewSet(viewsets.ModelViewSet):
+        plan_payload_cache.invalidate(plan.pk)
+        return Response({
+            'id': plan.pk,
+            'version': result['version'],
+            'coalesced': result['coalesced'],
+            'ids': {positions[position]: forme_id for position, forme_id in result['ids'].items()},
+            'sauvegarde': {
+                **{key: result[key] for key in ('created', 'updated', 'skipped', 'deleted')},
+                'rejetees': rejetees,
+            },
+        })
+
+    @action(detail=True, methods=['post'])
+    def operations(self, request, pk=None):
+        """
+        Applique un lot ordonné d'opérations sur les formes du plan (ajout,
+        modification, déplacement/transformation, suppression, réordonnancement),
+        de manière atomique et à partir de ``base_version``.
+
+        Voir ``plans.operations`` pour le format. Retourne la nouvelle version
+        et les identifiants des formes créées (par référence), modifiées et
+        supprimées ; 409 si le plan a changé depuis ``base_version`` (ou
+        depuis l'ETag indiqué par ``If-Match``).
+        """
+        plan = self.get_object()
+        if not self.can_edit_elements(plan, request.user):
+            return Response(
+                {'detail': 'Vous n\'avez pas la permission de modifier ce plan'},
+                status=status.HTTP_403_FORBIDDEN
+            )
+
+        base_version = expected_version(request, plan, field='base_version')
+        if base_version is None:
+            return Response(
+                {'base_version': 'La version de base du lot est requise'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        try:
+            result = apply_operations(plan, request.data.get('operations'), base_version, user=request.user)
+        except VersionConflict as e:
+            raise PlanVersionConflict(e.current_version)
+        except OperationError as e:
+            return Response({'detail': e.message, 'index': e.index}, status=status.HTTP_400_BAD_REQUEST)
+
+        plan_payload_cache.invalidate(plan.pk)
+        return Response(result, headers={'ETag': stored_plan_etag(plan)})
+
+    @action(detail=False, methods=['post'])
+    def batch(self, request):
+        """
+        Modifie les champs de plusieurs plans en une requête :
+
+            {"plans": [{"id": 12, "version": 4, "nom": "..."}, {"id": 15, "agriculteur": 7}]}
+
+        Champs modifiables : ``nom``, ``description``, ``preferences``,
+        ``usine``, ``concessionnaire`` et ``agriculteur`` ; ``version`` rend la
+        modification conditionnelle. Retourne un statut par plan au lieu des
+        plans complets (voir ``plans.services.batch_update_plans``).
+        """
+        edits = request.data.get('plans')
+        max_size = getattr(settings, 'PLAN_BATCH_MAX_SIZE', 100)
+        if not isinstance(edits, list) or not edits:
+            return Response(
+                {'plans': 'Une liste non vide de modifications est requise'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if len(edits) > max_size:
+            return Response(
+                {'plans': f'Au plus {max_size} plans par requête'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        results = batch_update_plans(
+            Plan.objects.filter(plans_visibles(request.user)), edits, request.user
+        )
+        plan_payload_cache.invalidate(*(result['id'] for result in results if result['status'] == 'ok'))
+        return Response({'results': results})
+
+    @action(detail=True, methods=['get'])
+    def formes(self, request, pk=None):
+        """
+        Formes du plan dans leur ordre de dessin, restreintes à celles qui
+        intersectent ``?bbox=minx,miny,maxx,maxy`` (index spatial sur la
+        géométrie dérivée). Paginées à la demande (``?page_size=``, ``?cursor=``)
+        pour charger un grand plan au fil des déplacements de la carte.
+        ``?simplify=<zoom>`` sert les points simplifiés pour ce niveau de zoom.
+        """
+        plan = self.get_object()
+        queryset = filter_bbox(FormeGeometrique.objects.filter(plan=plan), request)
+        paginator = FormeCursorPagination()
+        paginator.ordering = ('ordre', 'id')
+        page = paginator.paginate_queryset(queryset, request, view=self)
+        context = self.get_serializer_context()
+        if page is None:
+            return Response(FormeGeometriqueSerializer(queryset, many=True, context=context).data)
+        return paginator.get_paginated_response(FormeGeometriqueSerializer(page, many=True, context=context).data)
+
+    @action(detail=True, methods=['get'])
+    def measurements(self, request, pk=None):
+        """
+        Mesures géodésiques des formes du plan (voir ``plans.measurements``) :
+        surface, périmètre et longueur par forme, totaux par type et totaux du
+        plan, en m² et m. ``?details=false`` omet les mesures par forme.
+        """
+        plan = self.get_object()
+        etag = plan_instance_etag(plan)
+        if etag_matches(request, etag):
+            return not_modified_response(etag)
+
+        formes = FormeGeometrique.objects.filter(plan=plan).values_list('id', 'type_forme', 'data')
+        mesures, par_type, ignorees = measure_formes(formes)
+        data = {
+            'id': plan.id,
+            'version': plan.version,
+            'totaux': {
+                key: sum(total[key] for total in par_type.values())
+                for key in ('nombre', 'surface', 'perimetre', 'longueur')
+            },
+            'par_type': par_type,
+            'formes_ignorees': ignorees,
+        }
+        if request.query_params.get('details') != 'false':
+            data['formes'] = mesures
+        return set_validators(Response(data), etag)
+
+    @action(detail=True, methods=['get'])
+    def coverage(self, request, pk=None):
+        """
+        Couverture des parcelles (rectangles, polygones) par les arroseurs
+        (cercles, demi-cercles) du plan, voir ``plans.coverage`` : surfaces
+        couverte, non couverte et arrosée plusieurs fois, en m², totales et par
+        parcelle. Le calcul est mis en cache pour chaque version du plan.
+        """
+        plan = self.get_object()
+        etag = plan_instance_etag(plan)
+        if etag_matches(request, etag):
+            return not_modified_response(etag)
+
+        def compute():
+            formes = FormeGeometrique.objects.filter(
+                plan=plan, type_forme__in=EMITTER_TYPES + PARCEL_TYPES
+            ).values_list('id', 'type_forme', 'data')
+            return compute_coverage(formes)
+
+        data = {'id': plan.id, 'version': plan.version, **coverage_cache.get_or_compute(plan, compute)}
+        return set_validators(Response(data), etag)
+
+    @action(detail=True, methods=['get'])
+    def network(self, request, pk=None):
+        """
+        Réseau de canalisations formé par les connexions du plan (voir
+        ``plans.network``) : composantes connexes, boucles, tronçons avec leur
+        longueur et distance de chaque émetteur à sa source. ``?emetteur=<id>``
+        ajoute le chemin depuis la source jusqu'à cet émetteur. Le graphe est
+        mis en cache pour chaque version du plan.
+        """
+        plan = self.get_object()
+        emetteur = request.query_params.get('emetteur')
+        if emetteur is not None and not emetteur.isdigit():
+            raise ValidationError({'emetteur': 'Identifiant de forme attendu'})
+        etag = plan_instance_etag(plan)
+        if etag_matches(request, etag):
+            return not_modified_response(etag)
+
+        def compute():
+            connexions = Connexion.objects.filter(plan=plan).values_list(
+                'id', 'forme_source_id', 'forme_destination_id',
+                'forme_source__type_forme', 'forme_destination__type_forme', 'geometrie',
+            )
+            return PipeNetwork(
+                (*values, geometrie.coords) for *values, geometrie in connexions
+            )
+
+        network = network_cache.get_or_compute(plan, compute)
+        data = {'id': plan.id, 'version': plan.version, **network.summary}
+        if emetteur is not None:
+            chemin = network.emitter_path(int(emetteur))
+            if chemin is None:
+                return Response(
+                    {'detail': 'Cette forme n\'est pas un émetteur du réseau'},
+                    status=status.HTTP_404_NOT_FOUND
+                )
+            data['chemin'] = chemin
+        return set_validators(Response(data), etag)
+
+    @action(detail=True, methods=['get'])
+    def historique(self, request, pk=None):
+        """
+        Historique paginé du plan (``?page_size=``, ``?cursor=``), de la plus
+        récente révision à la plus ancienne, sans le contenu des révisions.
+        """
+        plan = self.get_object()
+        paginator = RevisionCursorPagination()
+        page = paginator.paginate_queryset(plan.revisions.defer('contenu'), request, view=self)
+        return paginator.get_paginated_response(RevisionPlanSerializer(page, many=True).data)
+
+    @action(detail=True, methods=['post'])
+    def restaurer(self, request, pk=None):
+        """
+        Rétablit le plan dans l'état d'une révision (``version_id`` : identifiant
+        de la révision) en écrivant une nouvelle version ; accepte ``If-Match``.
+        """
+        plan = self.get_object()
+        if not self.can_edit_elements(plan, request.user):
+            return Response(
+                {'detail': 'Vous n\'avez pas la permission de modifier ce plan'},
+                status=status.HTTP_403_FORBIDDEN
+            )
+
+        revision_id = request.data.get('version_id')
+        if not isinstance(revision_id, int) or isinstance(revision_id, bool):
+            return Response(
+                {'version_id': 'L\'identifiant de la révision est requis'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        revision = get_object_or_404(plan.revisions.defer('contenu'), pk=revision_id)
+
+        try:
+            restore_plan_revision(plan, revision, expected_version(request, plan), user=request.user)
+        except VersionConflict as e:
+            raise PlanVersionConflict(e.current_version)
+        plan_payload_cache.invalidate(plan.pk)
+
+        plan = PlanDetailSerializer.setup_eager_loading(Plan.objects.filter(pk=plan.pk)).get()
+        return Response(PlanDetailSerializer(plan).data, headers={'ETag': stored_plan_etag(plan)})
+
+class PlanTileView(APIView):
+    """
+    Tuile vectorielle ``/api/tiles/{z}/{x}/{y}.mvt`` des plans visibles par
+    l'utilisateur, éventuellement restreints à ``?plan=<id>[,<id>...]``.
+
+    Les tuiles encodées sont mises en cache sous l'empreinte des versions des
+    plans présents dans la tuile (voir ``api.tiles.plans_in_tile`` et
+    ``plans_digest``) et servies avec un ETag : une tuile n'est réencodée
+    qu'après une écriture sur l'un de ces plans.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+    renderer_classes = [MVTRenderer, FastJSONRenderer]
+
+    def get(self, request, z, x, y):
+        validate_tile(z, x, y)
+        plans = Plan.objects.filter(plans_visibles(request.user))
+        plan_ids = request.query_params.get('plan')
+        if plan_ids:
+            try:
+                plans = plans.filter(id__in=[int(plan_id) for plan_id in plan_ids.split(',')])
+            except ValueError:
+                raise ValidationError({'plan': 'Liste d\'identifiants de plans attendue.'})
+
+        digest = plans_digest(plans_in_tile(plans, z, x, y))
+        etag = compute_etag(z, x, y, digest)
+        if etag_matches(request, etag):
+            return not_modified_response(etag)
+        tile = tile_cache.get(z, x, y, digest)
+        if tile is None:
+            tile = build_tile(z, x, y, plans)
+            tile_cache.set(z, x, y, digest, tile)
+        return set_validators(Response(tile), etag)
+
+    def handle_exception(self, exc):
+        # Les erreurs sont renvoyées en JSON : le renderer MVT n'encode que des tuiles
+        self.request.accepted_renderer = FastJSONRenderer()
+        self.request.accepted_media_type = FastJSONRenderer.media_type
+        return super().handle_exception(exc)
+
+class PlanElementMixin:
+    """
+    Versionne les écritures d'éléments (formes, connexions, annotations) :
+    chaque écriture incrémente la version du plan parent, qui est reportée sur
+    l'élément ou sur sa trace de suppression, et invalide la réponse en cache du plan.
+    """
+
+    def check_plan_access(self, plan):
+        """Vérifie que le plan cible est visible par l'utilisateur."""
+        if not Plan.objects.filter(plans_visibles(self.request.user), pk=plan.pk).exists():
+            raise PermissionDenied('Vous n\'avez pas la permission de modifier ce plan')
+
+    @transaction.atomic
+    def perform_create(self, serializer):
+        plan = serializer.validated_data['plan']
+        self.check_plan_access(plan)
+        serializer.save(version=plan.bump_version())
+        record_revision(plan, plan.version, self.request.user)
+        plan_payload_cache.invalidate(plan.pk)
+
+    @transaction.atomic
+    def perform_update(self, serializer):
+        previous_plan = serializer.instance.plan
+        plan = serializer.validated_data.get('plan', previous_plan)
+        if plan.pk != previous_plan.pk:
+            self.check_plan_access(plan)
+            # Déplacé vers un autre plan : il disparaît de l'ancien
+            ElementSupprime.objects.create(
+                plan=previous_plan,
+                type_element=ElementSupprime.type_for(serializer.instance.__class__),
+                element_id=serializer.instance.pk,
+                version=previous_plan.bump_version()
+            )
+            record_revision(previous_plan, previous_plan.version, self.request.user)
+            plan_payload_cache.invalidate(previous_plan.pk)
+        serializer.save(version=plan.bump_version())
+        record_revision(plan, plan.version, self.request.user)
+        plan_payload_cache.invalidate(plan.pk)
+
+    @transaction.atomic
+    def perform_destroy(self, instance):
+        plan = instance.plan
+        plan.delete_elements(instance.__class__.objects.filter(pk=instance.pk), plan.bump_version())
+        record_revision(plan, plan.version, self.request.user)
+        plan_payload_cache.invalidate(plan.pk)
+
+class FormeGeometriqueViewSet(PlanElementMixin, viewsets.ModelViewSet):
     """
     ViewSet pour gérer les formes géométriques.
     """
     serializer_class = FormeGeometriqueSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = FormeCursorPagination
 
     def get_queryset(self):
         """
-        Ne retourne que les formes des plans accessibles à l'utilisateur
-        """
-        user = self.request.user
-        if user.role == ROLE_ADMIN:
-            return FormeGeometrique.objects.all()
-        elif user.role == ROLE_DEALER:
-            return FormeGeometrique.objects.filter(
-                plan__createur__in=[user.id] + list(user.utilisateurs.values_list('id', flat=True))
-            )
-        else:  # client
-            return FormeGeometrique.objects.filter(plan__createur=user)
+        Ne retourne que les formes des plans accessibles à l'utilisateur.
 
-    def perform_create(self, serializer):
-        """
-        Vérifie que l'utilisateur a le droit de créer une forme sur ce plan
+        La liste accepte ``?bbox=minx,miny,maxx,maxy`` (formes de tous les plans
+        visibles qui intersectent l'emprise, pour les cartes d'ensemble des usines
+        et concessionnaires) et ``?plan=``, et se pagine à la demande.
         """
-        plan = serializer.validated_data['plan']
-        user = self.request.user
-        
-        if plan.createur != user and user.role not in ['admin', 'concessionnaire']:
-            raise PermissionError('Vous n\'avez pas la permission de modifier ce plan')
-        
-        serializer.save()
+        queryset = FormeGeometrique.objects.filter(plans_visibles(self.request.user, prefix='plan__'))
+        if self.action == 'list':
+            queryset = filter_bbox(queryset, self.request)
+            plan_id = self.request.query_params.get('plan')
+            if plan_id:
+                if not plan_id.isdigit():
+                    raise ValidationError({'plan': 'L\'identifiant du plan doit être un entier.'})
+                queryset = queryset.filter(plan_id=plan_id)
+        return queryset
 
-class ConnexionViewSet(viewsets.ModelViewSet):
+class ConnexionViewSet(PlanElementMixin, viewsets.ModelViewSet):
     """
     ViewSet pour gérer les connexions entre formes.
     """
@@ -554,17 +1083,9 @@ class ConnexionViewSet(viewsets.ModelViewSet):
     permission_classes = [permissions.IsAuthenticated]
 
     def get_queryset(self):
-        user = self.request.user
-        if user.role == 'admin':
-            return Connexion.objects.all()
-        elif user.role == 'concessionnaire':
-            return Connexion.objects.filter(
-                plan__createur__in=[user.id] + list(user.clients.values_list('id', flat=True))
-            )
-        else:  # client
-            return Connexion.objects.filter(plan__createur=user)
+        return Connexion.objects.filter(plans_visibles(self.request.user, prefix='plan__'))
 
-class TexteAnnotationViewSet(viewsets.ModelViewSet):
+class TexteAnnotationViewSet(PlanElementMixin, viewsets.ModelViewSet):
     """
     ViewSet pour gérer les annotations textuelles.
     """
@@ -572,15 +1093,7 @@ class TexteAnnotationViewSet(viewsets.ModelViewSet):
     permission_classes = [permissions.IsAuthenticated]
 
     def get_queryset(self):
-        user = self.request.user
-        if user.role == 'admin':
-            return TexteAnnotation.objects.all()
-        elif user.role == 'concessionnaire':
-            return TexteAnnotation.objects.filter(
-                plan__createur__in=[user.id] + list(user.clients.values_list('id', flat=True))
-            )
-        else:  # client
-            return TexteAnnotation.objects.filter(plan__createur=user)
+        return TexteAnnotation.objects.filter(plans_visibles(self.request.user, prefix='plan__'))
 
 @api_view(['POST'])
 def elevation_proxy(request):
@@ -639,7 +1152,7 @@ def elevation_proxy(request):
         )
         
     except Exception as e:
-        print("Erreur complète:", str(e))
+        logger.exception("Erreur lors de la récupération des élévations")
         return Response(
             {'error': str(e)},
             status=status.HTTP_500_INTERNAL_SERVER_ERROR
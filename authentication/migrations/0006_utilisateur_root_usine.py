@@ -0,0 +1,45 @@
+# Generated by Django 5.1.6 on 2026-10-17 11:20
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def remplir_root_usine(apps, schema_editor):
+    Utilisateur = apps.get_model('authentication', 'Utilisateur')
+    Utilisateur.objects.filter(role='CONCESSIONNAIRE').update(root_usine_id=F('usine_id'))
+    Utilisateur.objects.filter(role='AGRICULTEUR').update(
+        root_usine_id=Coalesce(
+            Subquery(
+                Utilisateur.objects.filter(pk=OuterRef('concessionnaire_id')).values('usine_id')[:1]
+            ),
+            F('usine_id'),
+        )
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("authentication", "0005_convert_user_roles"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="utilisateur",
+            name="root_usine",
+            field=models.ForeignKey(
+                blank=True,
+                editable=False,
+                help_text="Usine en tête de la hiérarchie (dénormalisée, maintenue à l'enregistrement)",
+                null=True,
+                on_delete=django.db.models.deletion.SET_NULL,
+                related_name="membres_usine",
+                to=settings.AUTH_USER_MODEL,
+                verbose_name="Usine de rattachement",
+            ),
+        ),
+        migrations.RunPython(remplir_root_usine, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 5.1.6 on 2026-10-17 14:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("authentication", "0006_utilisateur_root_usine"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="utilisateur",
+            name="date_modification",
+            field=models.DateTimeField(
+                auto_now=True,
+                help_text="Sert de version aux représentations qui affichent l'utilisateur (plans)",
+                verbose_name="Date de modification",
+            ),
+        ),
+    ]
@@ -1,5 +1,5 @@
 from django.contrib.auth.models import AbstractUser
-from django.db import models
+from django.db import models, transaction
 
 class Utilisateur(AbstractUser):
     """
@@ -39,6 +39,17 @@ class Utilisateur(AbstractUser):
         verbose_name='Concessionnaire associé'
     )
 
+    root_usine = models.ForeignKey(
+        'self',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        editable=False,
+        related_name='membres_usine',
+        verbose_name='Usine de rattachement',
+        help_text='Usine en tête de la hiérarchie (dénormalisée, maintenue à l\'enregistrement)'
+    )
+
     company_name = models.CharField(
         max_length=255,
         blank=True,
@@ -58,6 +69,12 @@ class Utilisateur(AbstractUser):
         verbose_name='Numéro de téléphone'
     )
 
+    date_modification = models.DateTimeField(
+        auto_now=True,
+        verbose_name='Date de modification',
+        help_text='Sert de version aux représentations qui affichent l\'utilisateur (plans)'
+    )
+
     class Meta:
         verbose_name = 'Utilisateur'
         verbose_name_plural = 'Utilisateurs'
@@ -72,11 +89,47 @@ class Utilisateur(AbstractUser):
         """Représentation string de l'utilisateur utilisant le format standard."""
         return self.get_display_name()
 
+    # Champs dont dépend l'usine de rattachement
+    HIERARCHY_FIELDS = {'role', 'usine', 'concessionnaire'}
+
+    # Champs dont la modification ne change pas la date de modification
+    UNVERSIONED_FIELDS = {'last_login', 'password'}
+
     def save(self, *args, **kwargs):
         # Si c'est un nouveau utilisateur (pas encore d'ID)
         if not self.pk:
             self.must_change_password = True
-        super().save(*args, **kwargs)
+
+        update_fields = kwargs.get('update_fields')
+        hierarchy_changed = update_fields is None or bool(self.HIERARCHY_FIELDS & set(update_fields))
+        if hierarchy_changed:
+            self.root_usine_id = self.compute_root_usine_id()
+            if update_fields is not None:
+                kwargs['update_fields'] = set(update_fields) | {'root_usine'}
+        if update_fields is not None and not set(update_fields) <= self.UNVERSIONED_FIELDS:
+            kwargs['update_fields'] = set(kwargs['update_fields']) | {'date_modification'}
+        with transaction.atomic():
+            # Les agriculteurs d'un concessionnaire héritent de son usine, avant
+            # l'enregistrement : le signal post_save qui met à jour l'usine des
+            # plans lit celle de leur agriculteur
+            if hierarchy_changed and self.pk and self.role == self.Role.CONCESSIONNAIRE:
+                Utilisateur.objects.filter(concessionnaire=self).exclude(
+                    root_usine_id=self.root_usine_id
+                ).update(root_usine_id=self.root_usine_id)
+            super().save(*args, **kwargs)
+
+    def compute_root_usine_id(self):
+        """
+        Retourne l'identifiant de l'usine en tête de la hiérarchie
+        usine → concessionnaire → agriculteur (``None`` pour une usine ou un admin).
+        """
+        if self.role == self.Role.CONCESSIONNAIRE:
+            return self.usine_id
+        if self.role == self.Role.AGRICULTEUR:
+            if self.concessionnaire_id:
+                return self.concessionnaire.usine_id
+            return self.usine_id
+        return None
 
     @property
     def is_admin(self):
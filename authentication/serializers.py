@@ -1,8 +1,12 @@
+import logging
+
 from rest_framework import serializers
 from django.contrib.auth import get_user_model
 from django.contrib.auth.password_validation import validate_password
 from .models import Utilisateur
 
+logger = logging.getLogger(__name__)
+
 User = get_user_model()
 
 class UserDetailsSerializer(serializers.ModelSerializer):
@@ -70,7 +74,7 @@ class UserSerializer(serializers.ModelSerializer):
         concessionnaire = data.get('concessionnaire')
         usine = data.get('usine')
 
-        print(f"Validation des données: role={role}, concessionnaire={concessionnaire}, usine={usine}")
+        logger.debug("Validation des données: role=%s, concessionnaire=%s, usine=%s", role, concessionnaire, usine)
 
         # Validation pour les concessionnaires
         if role == 'CONCESSIONNAIRE':
@@ -179,7 +183,7 @@ class UserSerializer(serializers.ModelSerializer):
         password = validated_data.pop('password', None)
         old_password = validated_data.pop('old_password', None)
         
-        print("Update validated_data:", validated_data)
+        logger.debug("Update validated_data: %s", validated_data)
         
         # Si un nouveau mot de passe est fourni
         if password:
@@ -54,10 +54,8 @@ class UserViewSet(viewsets.ModelViewSet):
             base_queryset = queryset
         elif user.role == 'USINE':
             # Une usine peut voir ses concessionnaires et les agriculteurs de ses concessionnaires
-            base_queryset = queryset.filter(
-                Q(usine=user) |  # Ses concessionnaires
-                Q(concessionnaire__usine=user)  # Les agriculteurs de ses concessionnaires
-            )
+            # (usine de rattachement dénormalisée, maintenue à l'enregistrement)
+            base_queryset = queryset.filter(root_usine=user)
         elif user.role == 'CONCESSIONNAIRE':
             base_queryset = queryset.filter(Q(id=user.id) | Q(concessionnaire=user))
         else:
@@ -72,7 +70,7 @@ class UserViewSet(viewsets.ModelViewSet):
                 # les agriculteurs liés aux concessionnaires de l'usine
                 result = queryset.filter(
                     role='AGRICULTEUR',
-                    concessionnaire__usine=user
+                    root_usine=user
                 )
             else:
                 # Cas standard: on filtre le résultat de base par rôle
@@ -93,7 +91,7 @@ class UserViewSet(viewsets.ModelViewSet):
             if role == 'AGRICULTEUR':
                 # Pour les agriculteurs, on doit chercher ceux dont le concessionnaire
                 # est lié à l'usine spécifiée
-                result = result.filter(concessionnaire__usine_id=usine_id)
+                result = result.filter(root_usine_id=usine_id)
             else:
                 # Pour les autres rôles, filtre direct par usine
                 result = result.filter(usine_id=usine_id)
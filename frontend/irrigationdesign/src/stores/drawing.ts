@@ -593,7 +593,7 @@ export const useDrawingStore = defineStore('drawing', {
         this.loading = false;
       }
     },
-    async saveToPlan(planId?: number, options?: { elementsToDelete?: number[] }) {
+    async saveToPlan(planId?: number, options?: { elementsToDelete?: number[]; coalesce?: boolean }) {
       this.loading = true;
       try {
         const targetPlanId = planId || this.currentPlanId;
@@ -625,7 +625,9 @@ export const useDrawingStore = defineStore('drawing', {
           }))
         });
 
-        const formesAvecType = this.elements.map(element => {
+        // Éléments envoyés, dans l'ordre des formes de la requête
+        const sentElements = [...this.elements];
+        const formesAvecType = sentElements.map(element => {
           console.log('[DrawingStore][saveToPlan] Préparation élément pour sauvegarde', {
             id: element.id,
             type_forme: element.type_forme,
@@ -641,7 +643,8 @@ export const useDrawingStore = defineStore('drawing', {
         });
 
         const elementsToDelete = options?.elementsToDelete || [];
-        const requestUrl = `/plans/${targetPlanId}/save_with_elements/`;
+        // coalesce : enregistrement groupé côté serveur (autosave), la réponse est un simple accusé de réception
+        const requestUrl = `/plans/${targetPlanId}/save_with_elements/${options?.coalesce ? '?coalesce=true' : ''}`;
         console.log('[DrawingStore][saveToPlan] Préparation requête API', {
           url: requestUrl,
           method: 'POST',
@@ -667,17 +670,50 @@ export const useDrawingStore = defineStore('drawing', {
           data: response.data
         });
 
-        this.elements = response.data.formes.map((forme: any) => {
-          console.log('[DrawingStore][saveToPlan] Mise à jour élément après sauvegarde', {
-            forme,
-            type_forme: forme.type_forme
+        // Formes invalides (type inconnu, données incomplètes) écartées par le serveur, par position dans l'envoi
+        const rejetees: Record<string, string> = response.data.sauvegarde?.rejetees || {};
+        const rejectedElements = Object.entries(rejetees).map(([position, erreur]) => {
+          console.warn('[DrawingStore][saveToPlan] Forme non enregistrée', {
+            element: sentElements[Number(position)],
+            erreur
           });
-          return {
-            ...forme,
-            type_forme: forme.type_forme
-          };
-        });
-        this.unsavedChanges = false;
+          return sentElements[Number(position)];
+        }).filter(Boolean);
+
+        if (!response.data.formes) {
+          // Accusé d'un enregistrement groupé : reporter les identifiants des formes créées
+          // (par position dans l'envoi) pour ne pas les recréer au prochain enregistrement
+          const ids: Record<string, number> = response.data.ids || {};
+          Object.entries(ids).forEach(([position, id]) => {
+            const element = sentElements[Number(position)];
+            if (element && !element.id) {
+              element.id = id;
+            }
+          });
+        } else {
+          // Les formes écartées restent telles que dessinées (à corriger ou supprimer) :
+          // elles remplacent la version enregistrée ou s'ajoutent si elles sont nouvelles
+          const rejectedById = new Map(rejectedElements.filter(el => el.id).map(el => [el.id, el]));
+          this.elements = [
+            ...response.data.formes.map((forme: any) => {
+              console.log('[DrawingStore][saveToPlan] Mise à jour élément après sauvegarde', {
+                forme,
+                type_forme: forme.type_forme
+              });
+              return rejectedById.get(forme.id) || {
+                ...forme,
+                type_forme: forme.type_forme
+              };
+            }),
+            ...rejectedElements.filter(el => !el.id)
+          ];
+        }
+
+        // Tant que des formes sont écartées, le plan reste à enregistrer
+        this.unsavedChanges = rejectedElements.length > 0;
+        this.error = rejectedElements.length > 0
+          ? `${rejectedElements.length} forme(s) invalide(s) non enregistrée(s) : corrigez-les ou supprimez-les`
+          : null;
         return response.data;
       } catch (error) {
         console.error('[DrawingStore][saveToPlan] ERREUR:', error);
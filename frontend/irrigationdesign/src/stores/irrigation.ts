@@ -6,9 +6,11 @@ import { useNotificationStore } from './notification';
 interface PlanHistory {
   id: number;
   plan_id: number;
+  version: number;
   date_modification: string;
   modifications: any;
-  utilisateur: number;
+  utilisateur: number | null;
+  keyframe: boolean;
 }
 
 export interface UserDetails {
@@ -38,7 +40,6 @@ export interface Plan {
   agriculteur_id?: number | null;
   preferences?: any;
   elements?: any[];
-  historique?: PlanHistory[];
   version?: number;
 }
 
@@ -79,7 +80,10 @@ export const useIrrigationStore = defineStore('irrigation', {
       this.loading = true;
       try {
         let url = '/plans/';
-        const params: Record<string, any> = {};
+        // Les champs lourds ne sont pas utiles pour la liste
+        const params: Record<string, any> = {
+          omit: 'elements,preferences'
+        };
         
         if (authStore.isConcessionnaire) {
           params.concessionnaire = authStore.user?.id;
@@ -104,7 +108,8 @@ export const useIrrigationStore = defineStore('irrigation', {
       try {
         let url = '/plans/';
         const params: Record<string, any> = {
-          include_details: true
+          include_details: true,
+          omit: 'formes,connexions,annotations,elements,preferences'
         };
         
         if (authStore.isConcessionnaire) {
@@ -372,8 +377,9 @@ export const useIrrigationStore = defineStore('irrigation', {
       this.loading = true;
       try {
         const response = await api.get(`/plans/${planId}/historique/`);
-        this.planHistory = response.data;
-        return response.data;
+        // Historique paginé : { next, previous, results }
+        this.planHistory = response.data.results ?? response.data;
+        return this.planHistory;
       } catch (error) {
         this.error = 'Erreur lors de la récupération de l\'historique';
         throw error;
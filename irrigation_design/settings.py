@@ -14,6 +14,7 @@ from pathlib import Path
 import os
 from datetime import timedelta
 from dotenv import load_dotenv
+from corsheaders.defaults import default_headers
 
 # Charger les variables d'environnement
 load_dotenv()
@@ -59,9 +60,13 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "api.instrumentation.ServerTimingMiddleware",
+    "api.compression.ResponseCompressionMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "corsheaders.middleware.CorsMiddleware",
+    # Sous CorsMiddleware : les refus (400, 413, 415) portent les en-têtes CORS
+    "api.compression.RequestDecompressionMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
@@ -181,6 +186,117 @@ REST_FRAMEWORK = {
         "rest_framework.permissions.IsAuthenticated",
     ),
     'EXCEPTION_HANDLER': 'rest_framework.views.exception_handler',
+    # Rendu/lecture JSON rapides (orjson si installé, repli en pur Python sinon)
+    "DEFAULT_RENDERER_CLASSES": (
+        "api.renderers.FastJSONRenderer",
+        "rest_framework.renderers.BrowsableAPIRenderer",
+    ),
+    "DEFAULT_PARSER_CLASSES": (
+        "api.parsers.FastJSONParser",
+        "rest_framework.parsers.FormParser",
+        "rest_framework.parsers.MultiPartParser",
+    ),
+}
+
+# Cache des réponses JSON des plans (voir api/cache.py).
+# Par défaut en mémoire locale, borné en octets avec éviction LRU ; tout autre
+# backend Django (fichiers, Redis...) peut être choisi par variable d'environnement.
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+    },
+    "plans": {
+        "BACKEND": os.getenv('PLAN_CACHE_BACKEND', 'api.cache.SizeBoundedLocMemCache'),
+        "LOCATION": os.getenv('PLAN_CACHE_LOCATION', 'plans'),
+        "TIMEOUT": None,
+        "OPTIONS": {
+            "MAX_SIZE": int(os.getenv('PLAN_CACHE_MAX_SIZE', 64 * 1024 * 1024)),
+            "MAX_ENTRIES": int(os.getenv('PLAN_CACHE_MAX_ENTRIES', 1000)),
+        },
+    },
+}
+PLAN_PAYLOAD_CACHE_ALIAS = "plans"
+# Tuiles vectorielles encodées (/api/tiles/, voir api/tiles.py)
+PLAN_TILE_CACHE_ALIAS = "plans"
+# Résultats calculés par version de plan (couverture, réseau, voir api/cache.PlanResultCache)
+PLAN_RESULT_CACHE_ALIAS = "plans"
+
+# Nombre de plans sérialisés par lot pour les listes envoyées en flux (?stream=true)
+PLAN_STREAM_CHUNK_SIZE = int(os.getenv('PLAN_STREAM_CHUNK_SIZE', 100))
+
+# Taille des lots d'écriture (bulk_create/bulk_update) lors de l'enregistrement d'un plan
+PLAN_SAVE_BATCH_SIZE = int(os.getenv('PLAN_SAVE_BATCH_SIZE', 500))
+# Nombre de tentatives d'un enregistrement non conditionnel en cas d'écriture concurrente
+PLAN_SAVE_MAX_RETRIES = int(os.getenv('PLAN_SAVE_MAX_RETRIES', 3))
+
+# Historique des plans (voir plans/revisions.py) : une image complète toutes les N révisions,
+# des deltas entre deux images. Restaurer une révision lit au plus une image et N - 1 deltas.
+PLAN_REVISION_KEYFRAME_INTERVAL = int(os.getenv('PLAN_REVISION_KEYFRAME_INTERVAL', 20))
+
+# Niveaux de zoom des points simplifiés des lignes, polygones et connexions (?simplify=<zoom>,
+# voir plans.models.simplify_pyramid) : tolérance d'un pixel à chaque niveau
+PLAN_SIMPLIFY_ZOOMS = [int(zoom) for zoom in os.getenv('PLAN_SIMPLIFY_ZOOMS', '10,13,16').split(',')]
+
+# Regroupement des enregistrements (save_with_elements?coalesce=true, voir plans/coalescing.py) :
+# fenêtre en secondes pendant laquelle les enregistrements d'un même plan sont fusionnés
+# (0 désactive le regroupement), délai d'attente maximal de l'accusé de réception et
+# nombre de threads d'écriture (les lots de plans différents sont écrits en parallèle).
+PLAN_SAVE_COALESCE_WINDOW = float(os.getenv('PLAN_SAVE_COALESCE_WINDOW', 0.25))
+PLAN_SAVE_COALESCE_TIMEOUT = float(os.getenv('PLAN_SAVE_COALESCE_TIMEOUT', 30))
+PLAN_SAVE_COALESCE_WORKERS = int(os.getenv('PLAN_SAVE_COALESCE_WORKERS', 4))
+
+# Nombre maximal de plans modifiés par une requête /api/plans/batch/
+PLAN_BATCH_MAX_SIZE = int(os.getenv('PLAN_BATCH_MAX_SIZE', 100))
+
+# Compression (voir api/compression.py) : taille minimale des réponses de l'API compressées
+# en gzip, et taille maximale d'un corps de requête compressé une fois décompressé
+# (par défaut DATA_UPLOAD_MAX_MEMORY_SIZE, la limite des corps non compressés)
+API_COMPRESSION_MIN_SIZE = int(os.getenv('API_COMPRESSION_MIN_SIZE', 1024))
+API_MAX_DECOMPRESSED_SIZE = int(os.getenv('API_MAX_DECOMPRESSED_SIZE', 0)) or None
+
+# Contrôle des budgets de requêtes SQL par action (voir api/query_budget.py)
+API_ENFORCE_QUERY_BUDGETS = os.getenv('API_ENFORCE_QUERY_BUDGETS', 'False').lower() == 'true'
+
+# Instrumentation des requêtes de l'API (voir api/instrumentation.py) :
+# en-tête Server-Timing (désactivé par défaut hors développement) et
+# journalisation d'un échantillon des requêtes (0.0 à 1.0).
+API_SERVER_TIMING = os.getenv('API_SERVER_TIMING', str(DEBUG)).lower() == 'true'
+API_TIMING_SAMPLE_RATE = float(os.getenv('API_TIMING_SAMPLE_RATE', 0.0))
+
+# Journalisation : les traces de débogage de l'API ne sont émises (et ne coûtent)
+# que si le niveau DEBUG est demandé via API_LOG_LEVEL.
+LOGGING = {
+    "version": 1,
+    "disable_existing_loggers": False,
+    "formatters": {
+        "simple": {
+            "format": "{asctime} {levelname} {name} {message}",
+            "style": "{",
+        },
+    },
+    "handlers": {
+        "console": {
+            "class": "logging.StreamHandler",
+            "formatter": "simple",
+        },
+    },
+    "loggers": {
+        "api": {
+            "handlers": ["console"],
+            "level": os.getenv('API_LOG_LEVEL', 'INFO'),
+            "propagate": False,
+        },
+        "authentication": {
+            "handlers": ["console"],
+            "level": os.getenv('API_LOG_LEVEL', 'INFO'),
+            "propagate": False,
+        },
+        "plans": {
+            "handlers": ["console"],
+            "level": os.getenv('API_LOG_LEVEL', 'INFO'),
+            "propagate": False,
+        },
+    },
 }
 
 # Configuration de CORS
@@ -188,6 +304,9 @@ CORS_ALLOWED_ORIGINS = os.getenv('CORS_ALLOWED_ORIGINS', 'http://localhost:8080,
 
 CORS_ALLOW_CREDENTIALS = True
 
+# Corps de requête compressés acceptés sur les routes des plans (voir api/compression.py)
+CORS_ALLOW_HEADERS = (*default_headers, 'content-encoding')
+
 # Configuration de Simple JWT avec blacklist
 SIMPLE_JWT = {
     "ACCESS_TOKEN_LIFETIME": timedelta(minutes=60),
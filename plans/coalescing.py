@@ -0,0 +1,250 @@
+"""
+File d'enregistrement des plans avec regroupement des écritures.
+
+Pendant l'édition, l'éditeur envoie des instantanés complets du plan en rafale.
+Les instantanés d'un même plan reçus pendant la fenêtre
+``PLAN_SAVE_COALESCE_WINDOW`` (secondes) sont fusionnés et écrits en un seul
+lot par un groupe de threads : une seule transaction, un seul incrément de
+version.
+Chaque requête reçoit la version dans laquelle son instantané a été écrit et
+les identifiants attribués à ses formes nouvelles.
+
+La file est propre au processus : avec plusieurs processus serveur, seules les
+requêtes traitées par le même processus sont regroupées.
+"""
+import logging
+import operator
+import threading
+import time
+from collections import Counter
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+
+from django.conf import settings
+from django.db import close_old_connections, connections
+
+from .models import Plan, forme_content_hash
+from .services import save_plan_elements
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class SaveSnapshot:
+    """Instantané envoyé par l'éditeur (mêmes champs que ``save_plan_elements``)."""
+    formes_data: list
+    elements_to_delete: list = field(default_factory=list)
+    clear_existing: bool = False
+    preferences: dict = None
+    user: object = None
+
+
+@dataclass
+class _PendingSave:
+    deadline: float
+    snapshots: list = field(default_factory=list)
+    futures: list = field(default_factory=list)
+
+
+def _content_key(forme_data):
+    return forme_content_hash(forme_data.get('type_forme'), forme_data.get('data', {}))
+
+
+def merge_snapshots(snapshots):
+    """
+    Fusionne des instantanés successifs d'un même plan : les formes du dernier
+    instantané (état complet), l'union des suppressions demandées et les
+    dernières préférences envoyées. La révision est attribuée à l'auteur du
+    dernier instantané.
+
+    Un enregistrement ne supprime jamais les formes absentes de sa liste : les
+    formes nouvelles (sans identifiant) d'un instantané antérieur que le
+    dernier ne contient pas, à contenu égal, sont ajoutées à la suite (autre
+    utilisateur, autre onglet, forme modifiée entre-temps).
+    """
+    latest = snapshots[-1]
+    formes_data = list(latest.formes_data)
+    merged = Counter(_content_key(forme_data) for forme_data in formes_data if not forme_data.get('id'))
+    for snapshot in snapshots[:-1]:
+        counts = Counter()
+        for forme_data in snapshot.formes_data:
+            if forme_data.get('id'):
+                continue
+            key = _content_key(forme_data)
+            counts[key] += 1
+            if counts[key] > merged[key]:
+                formes_data.append(forme_data)
+                merged[key] += 1
+
+    elements_to_delete = []
+    for snapshot in snapshots:
+        elements_to_delete.extend(
+            element_id for element_id in snapshot.elements_to_delete if element_id not in elements_to_delete
+        )
+    preferences = next((snapshot.preferences for snapshot in reversed(snapshots) if snapshot.preferences), None)
+    return SaveSnapshot(
+        formes_data=formes_data,
+        elements_to_delete=elements_to_delete,
+        clear_existing=any(snapshot.clear_existing for snapshot in snapshots),
+        preferences=preferences,
+        user=latest.user,
+    )
+
+
+def snapshot_ids(snapshot, merged, ids):
+    """
+    Identifiants des formes créées (``ids`` : position dans l'instantané
+    fusionné -> identifiant) rapportés aux positions de ``snapshot``.
+
+    Les formes nouvelles d'un instantané sont retrouvées dans l'instantané
+    fusionné par leur contenu (type et données) ; toutes y figurent (voir
+    ``merge_snapshots``).
+    """
+    size = len(snapshot.formes_data)
+    if all(map(operator.is_, snapshot.formes_data, merged.formes_data[:size])):
+        # Dernier instantané : ses formes sont en tête de l'instantané fusionné
+        return {position: forme_id for position, forme_id in ids.items() if position < size}
+    created = {}
+    for position, forme_id in ids.items():
+        created.setdefault(_content_key(merged.formes_data[position]), []).append(forme_id)
+    matched = {}
+    for position, forme_data in enumerate(snapshot.formes_data):
+        if forme_data.get('id'):
+            continue
+        candidates = created.get(_content_key(forme_data))
+        if candidates:
+            matched[position] = candidates.pop(0)
+    return matched
+
+
+class PlanSaveCoalescer:
+    """
+    Regroupe les enregistrements par plan et les applique dans un groupe de
+    threads (``PLAN_SAVE_COALESCE_WORKERS``) : un enregistrement lent ne
+    retarde que son plan. Les lots d'un même plan sont écrits l'un après
+    l'autre, dans l'ordre de réception.
+    """
+
+    def __init__(self, window=None, workers=None):
+        self._window = window
+        self._workers = workers
+        self._pending = {}
+        # Plans dont un lot est en cours d'écriture
+        self._active = set()
+        self._condition = threading.Condition()
+        self._threads = []
+
+    @property
+    def window(self):
+        if self._window is not None:
+            return self._window
+        return getattr(settings, 'PLAN_SAVE_COALESCE_WINDOW', 0.0)
+
+    @property
+    def workers(self):
+        if self._workers is not None:
+            return self._workers
+        return getattr(settings, 'PLAN_SAVE_COALESCE_WORKERS', 4)
+
+    @property
+    def enabled(self):
+        return self.window > 0
+
+    def submit(self, plan_id, snapshot):
+        """
+        Ajoute un instantané à la file du plan. Retourne un ``Future`` résolu
+        avec le résultat de ``save_plan_elements`` du lot qui l'a écrit, les
+        identifiants des formes créées rapportés à cet instantané (ou
+        l'exception levée par l'écriture).
+        """
+        future = Future()
+        with self._condition:
+            pending = self._pending.get(plan_id)
+            if pending is None:
+                pending = self._pending[plan_id] = _PendingSave(deadline=time.monotonic() + self.window)
+            pending.snapshots.append(snapshot)
+            pending.futures.append(future)
+            self._ensure_workers()
+            self._condition.notify_all()
+        return future
+
+    def cancel(self, plan_id, future):
+        """
+        Retire de la file l'instantané associé à ``future`` s'il n'est pas
+        encore en cours d'écriture. Retourne ``True`` s'il a été retiré (il ne
+        sera jamais écrit), ``False`` si son lot est déjà en cours d'écriture
+        ou écrit.
+        """
+        with self._condition:
+            pending = self._pending.get(plan_id)
+            if pending is None or future not in pending.futures:
+                return False
+            index = pending.futures.index(future)
+            del pending.snapshots[index], pending.futures[index]
+            if not pending.futures:
+                del self._pending[plan_id]
+            future.cancel()
+            return True
+
+    def _ensure_workers(self):
+        self._threads = [thread for thread in self._threads if thread.is_alive()]
+        while len(self._threads) < self.workers:
+            thread = threading.Thread(target=self._run, name='plan-save-coalescer', daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def _next_batch(self):
+        """Attend le prochain lot arrivé à échéance (hors plans en cours d'écriture) et le retire de la file."""
+        with self._condition:
+            while True:
+                ready = [item for item in self._pending.items() if item[0] not in self._active]
+                if not ready:
+                    self._condition.wait()
+                    continue
+                plan_id, pending = min(ready, key=lambda item: item[1].deadline)
+                delay = pending.deadline - time.monotonic()
+                if delay <= 0:
+                    del self._pending[plan_id]
+                    self._active.add(plan_id)
+                    return plan_id, pending
+                self._condition.wait(delay)
+
+    def _run(self):
+        while True:
+            plan_id, pending = self._next_batch()
+            try:
+                self._apply(plan_id, pending)
+            finally:
+                close_old_connections()
+                with self._condition:
+                    self._active.discard(plan_id)
+                    self._condition.notify_all()
+
+    def _apply(self, plan_id, pending):
+        try:
+            merged = merge_snapshots(pending.snapshots)
+            plan = Plan.objects.get(pk=plan_id)
+            result = save_plan_elements(
+                plan,
+                formes_data=merged.formes_data,
+                elements_to_delete=merged.elements_to_delete,
+                clear_existing=merged.clear_existing,
+                preferences=merged.preferences,
+                user=merged.user,
+            )
+        except Exception as e:
+            logger.exception("Échec de l'enregistrement groupé du plan %s", plan_id)
+            for future in pending.futures:
+                future.set_exception(e)
+            # Connexion potentiellement inutilisable après l'erreur
+            connections['default'].close()
+            return
+
+        result['coalesced'] = len(pending.snapshots)
+        logger.debug("Plan %s : %s enregistrements regroupés en version %s",
+                     plan_id, len(pending.snapshots), result['version'])
+        for snapshot, future in zip(pending.snapshots, pending.futures):
+            future.set_result({**result, 'ids': snapshot_ids(snapshot, merged, result['ids'])})
+
+
+plan_save_coalescer = PlanSaveCoalescer()
@@ -0,0 +1,141 @@
+"""
+Transformations des données des formes (coordonnées ``[longitude, latitude]``).
+
+Les rotations et mises à l'échelle sont calculées dans un repère local
+équirectangulaire centré sur la forme, suffisant à l'échelle d'une parcelle.
+"""
+import copy
+import math
+
+
+def _points(data):
+    """Itère sur les listes de coordonnées ``[lng, lat]`` modifiables de la forme."""
+    if 'center' in data:
+        yield data['center']
+    if 'bounds' in data:
+        yield data['bounds']['southWest']
+        yield data['bounds']['northEast']
+    if 'position' in data:
+        yield data['position']
+    yield from data.get('points', [])
+
+
+def centroid(data):
+    """Centre de la forme (moyenne des sommets, ou centre du cercle)."""
+    if 'center' in data:
+        return tuple(data['center'])
+    points = list(_points(data))
+    if not points:
+        raise ValueError("La forme n'a pas de coordonnées")
+    return (
+        sum(point[0] for point in points) / len(points),
+        sum(point[1] for point in points) / len(points),
+    )
+
+
+def translate(data, dx, dy):
+    """Retourne une copie des données déplacées de ``dx`` degrés de longitude et ``dy`` de latitude."""
+    data = copy.deepcopy(data)
+    for point in _points(data):
+        point[0] += dx
+        point[1] += dy
+    return data
+
+
+def rotate(data, angle, origin=None):
+    """
+    Retourne une copie des données tournées de ``angle`` degrés (sens horaire)
+    autour de ``origin`` (par défaut le centre de la forme).
+
+    Les formes décrites par des sommets sont tournées point par point ; les
+    rectangles, textes et demi-cercles portent leur rotation dans leurs données.
+    """
+    data = copy.deepcopy(data)
+    if 'points' in data:
+        ox, oy = origin or centroid(data)
+        k = math.cos(math.radians(oy))
+        cos, sin = math.cos(math.radians(-angle)), math.sin(math.radians(-angle))
+        for point in data['points']:
+            x, y = (point[0] - ox) * k, point[1] - oy
+            point[0] = ox + (x * cos - y * sin) / k
+            point[1] = oy + x * sin + y * cos
+    elif 'startAngle' in data:
+        data['startAngle'] = (data['startAngle'] + angle) % 360
+        data['endAngle'] = (data['endAngle'] + angle) % 360
+    elif 'bounds' in data:
+        data['rotation'] = (data.get('rotation', 0) + angle) % 360
+    return data
+
+
+def scale(data, factor, origin=None):
+    """Retourne une copie des données mises à l'échelle de ``factor`` autour de ``origin``."""
+    if factor <= 0:
+        raise ValueError("Le facteur d'échelle doit être positif")
+    data = copy.deepcopy(data)
+    ox, oy = origin or centroid(data)
+    for point in _points(data):
+        point[0] = ox + (point[0] - ox) * factor
+        point[1] = oy + (point[1] - oy) * factor
+    if 'radius' in data:
+        data['radius'] = data['radius'] * factor
+    return data
+
+
+# Nombre de segments d'un cercle complet lors de sa conversion en polygone
+CIRCLE_SEGMENTS = 64
+METERS_PER_DEGREE = 111_320
+
+
+def _arc(center, radius, start, end):
+    """
+    Points d'un arc de ``radius`` mètres autour de ``center``, de ``start`` à
+    ``end`` degrés (0 au nord, sens horaire, comme Leaflet).
+    """
+    lng, lat = center
+    k = math.cos(math.radians(lat))
+    sweep = (end - start) % 360 or 360
+    steps = max(2, math.ceil(CIRCLE_SEGMENTS * sweep / 360))
+    points = []
+    for step in range(steps + 1):
+        angle = math.radians(start + sweep * step / steps)
+        points.append([
+            lng + radius * math.sin(angle) / (METERS_PER_DEGREE * k),
+            lat + radius * math.cos(angle) / METERS_PER_DEGREE,
+        ])
+    return points
+
+
+def _closed(points):
+    ring = [list(point) for point in points]
+    if ring[0] != ring[-1]:
+        ring.append(list(ring[0]))
+    return ring
+
+
+def outline(type_forme, data):
+    """
+    Géométrie décrite par les données de la forme, sous la forme ``(type, coordonnées)``
+    avec ``type`` parmi ``Point``, ``LineString`` et ``Polygon`` (un seul anneau fermé).
+
+    Les cercles et demi-cercles sont approchés par des polygones, les rectangles
+    (et textes encadrés) tournés de leur ``rotation`` autour de leur centre.
+    """
+    if type_forme in ('LIGNE', 'ELEVATIONLINE'):
+        return 'LineString', [list(point) for point in data['points']]
+    if type_forme == 'POLYGON':
+        return 'Polygon', _closed(data['points'])
+    if type_forme == 'CERCLE':
+        arc = _arc(data['center'], data['radius'], 0, 360)
+        return 'Polygon', _closed(arc[:-1])
+    if type_forme == 'DEMI_CERCLE':
+        arc = _arc(data['center'], data['radius'], data['startAngle'], data['endAngle'])
+        return 'Polygon', _closed([list(data['center']), *arc])
+    if 'bounds' in data:
+        (west, south), (east, north) = data['bounds']['southWest'], data['bounds']['northEast']
+        corners = [[west, south], [east, south], [east, north], [west, north]]
+        if data.get('rotation'):
+            corners = rotate({'points': corners}, data['rotation'])['points']
+        return 'Polygon', _closed(corners)
+    if 'position' in data:
+        return 'Point', list(data['position'])
+    raise ValueError(f"Pas de géométrie pour le type {type_forme}")
@@ -0,0 +1,136 @@
+"""
+Mesures géodésiques des formes d'un plan : surface, périmètre et longueur.
+
+Les sommets de toutes les formes du plan sont rassemblés dans des tableaux
+numpy et mesurés en une fois (pas de boucle Python par segment). Les formules
+sont celles de turf, utilisé par l'éditeur, pour que les valeurs calculées
+côté serveur correspondent à celles affichées :
+
+- surface d'un anneau sur la sphère (Chamberlain et Duquette), rayon 6 378 137 m ;
+- distances par la formule de haversine, rayon 6 371 008,8 m ;
+- cercles et demi-cercles à partir de leur rayon en mètres.
+
+Unités : m² et m.
+"""
+from collections import defaultdict
+
+import numpy as np
+
+from . import geometry
+
+AREA_RADIUS = 6378137.0
+DISTANCE_RADIUS = 6371008.8
+
+LINE_TYPES = ('LIGNE', 'ELEVATIONLINE')
+CIRCLE_TYPES = ('CERCLE', 'DEMI_CERCLE')
+
+
+class _Paths:
+    """Suites de sommets (anneaux ou lignes) mises bout à bout dans des tableaux."""
+
+    def __init__(self):
+        self.indexes = []
+        self.points = []
+
+    def add(self, index, points):
+        points = np.asarray(points, dtype=np.float64)
+        if points.ndim != 2 or points.shape[1] != 2 or not len(points):
+            raise ValueError("Suite de coordonnées [longitude, latitude] attendue")
+        self.indexes.append(index)
+        self.points.append(points)
+
+    def arrays(self):
+        """Retourne ``(lng, lat)`` en radians, le numéro de suite de chaque sommet et la taille des suites."""
+        sizes = np.array([len(points) for points in self.points], dtype=np.int64)
+        coords = np.radians(np.concatenate(self.points))
+        path_ids = np.repeat(np.arange(len(sizes)), sizes)
+        return coords[:, 0], coords[:, 1], path_ids, sizes
+
+
+def _haversine(lng1, lat1, lng2, lat2):
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lng2 - lng1) / 2) ** 2
+    return 2 * DISTANCE_RADIUS * np.arctan2(np.sqrt(a), np.sqrt(1 - a))
+
+
+def ring_measures(paths):
+    """Surfaces et périmètres des anneaux (fermés ou non) de ``paths``."""
+    if not paths.points:
+        return np.zeros(0), np.zeros(0)
+    lng, lat, ring_ids, sizes = paths.arrays()
+    starts = np.concatenate(([0], np.cumsum(sizes)[:-1]))
+    position = np.arange(len(lng)) - starts[ring_ids]
+    following = starts[ring_ids] + (position + 1) % sizes[ring_ids]
+    preceding = starts[ring_ids] + (position - 1) % sizes[ring_ids]
+
+    terms = (lng[following] - lng[preceding]) * np.sin(lat)
+    areas = np.abs(np.bincount(ring_ids, weights=terms, minlength=len(sizes))) * AREA_RADIUS ** 2 / 2
+    edges = _haversine(lng, lat, lng[following], lat[following])
+    perimeters = np.bincount(ring_ids, weights=edges, minlength=len(sizes))
+    return areas, perimeters
+
+
+def line_lengths(paths):
+    """Longueurs des lignes de ``paths``."""
+    if not paths.points:
+        return np.zeros(0)
+    lng, lat, line_ids, sizes = paths.arrays()
+    same_line = line_ids[1:] == line_ids[:-1]
+    segments = _haversine(lng[:-1], lat[:-1], lng[1:], lat[1:]) * same_line
+    return np.bincount(line_ids[:-1], weights=segments, minlength=len(sizes))
+
+
+def measure_formes(formes):
+    """
+    Mesure des formes ``(id, type_forme, data)``. Retourne la liste des
+    mesures par forme, les totaux par type et le nombre de formes ignorées
+    (textes, données incomplètes).
+    """
+    rings, lines = _Paths(), _Paths()
+    circles = []  # (index, rayon, angle balayé en radians)
+    results, ignored = [], 0
+    for forme_id, type_forme, data in formes:
+        index = len(results)
+        try:
+            if type_forme == 'POLYGON':
+                rings.add(index, data['points'])
+            elif type_forme == 'RECTANGLE':
+                # Coins du rectangle tourné
+                rings.add(index, geometry.outline(type_forme, data)[1])
+            elif type_forme in LINE_TYPES:
+                lines.add(index, data['points'])
+            elif type_forme in CIRCLE_TYPES:
+                sweep = 360.0
+                if type_forme == 'DEMI_CERCLE':
+                    sweep = (data['endAngle'] - data['startAngle']) % 360 or 360.0
+                circles.append((index, float(data['radius']), np.radians(sweep)))
+            else:
+                ignored += 1
+                continue
+        except (KeyError, TypeError, ValueError, IndexError):
+            ignored += 1
+            continue
+        results.append({'id': forme_id, 'type_forme': type_forme, 'surface': 0.0, 'perimetre': 0.0, 'longueur': 0.0})
+
+    areas, perimeters = ring_measures(rings)
+    for index, area, perimeter in zip(rings.indexes, areas.tolist(), perimeters.tolist()):
+        results[index]['surface'] = area
+        results[index]['perimetre'] = perimeter
+    for index, length in zip(lines.indexes, line_lengths(lines).tolist()):
+        results[index]['longueur'] = length
+    if circles:
+        indexes, radii, sweeps = (np.array(column) for column in zip(*circles))
+        full = sweeps >= 2 * np.pi
+        areas = radii ** 2 * sweeps / 2
+        # Un secteur est fermé par ses deux rayons, un cercle complet non
+        perimeters = radii * sweeps + np.where(full, 0.0, 2 * radii)
+        for index, area, perimeter in zip(indexes.tolist(), areas.tolist(), perimeters.tolist()):
+            results[index]['surface'] = area
+            results[index]['perimetre'] = perimeter
+
+    totals = defaultdict(lambda: {'nombre': 0, 'surface': 0.0, 'perimetre': 0.0, 'longueur': 0.0})
+    for result in results:
+        total = totals[result['type_forme']]
+        total['nombre'] += 1
+        for key in ('surface', 'perimetre', 'longueur'):
+            total[key] += result[key]
+    return results, dict(totals), ignored
@@ -0,0 +1,19 @@
+# Generated by Django 5.1.6 on 2026-10-17 09:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("plans", "0009_remove_plan_client_plan_agriculteur"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="plan",
+            index=models.Index(
+                fields=["-date_modification", "id"], name="plans_plan_modif_id_idx"
+            ),
+        ),
+    ]
@@ -0,0 +1,120 @@
+# Generated by Django 5.1.6 on 2026-10-17 10:05
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("plans", "0010_plan_plans_plan_modif_id_idx"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="plan",
+            name="version",
+            field=models.PositiveBigIntegerField(
+                default=0,
+                help_text="Compteur incrémenté à chaque modification du plan ou de ses éléments",
+                verbose_name="Version",
+            ),
+        ),
+        migrations.AddField(
+            model_name="formegeometrique",
+            name="version",
+            field=models.PositiveBigIntegerField(
+                default=0,
+                help_text="Version du plan lors de la dernière écriture de la forme",
+                verbose_name="Version",
+            ),
+        ),
+        migrations.AddField(
+            model_name="connexion",
+            name="version",
+            field=models.PositiveBigIntegerField(
+                default=0,
+                help_text="Version du plan lors de la dernière écriture de la connexion",
+                verbose_name="Version",
+            ),
+        ),
+        migrations.AddField(
+            model_name="texteannotation",
+            name="version",
+            field=models.PositiveBigIntegerField(
+                default=0,
+                help_text="Version du plan lors de la dernière écriture de l'annotation",
+                verbose_name="Version",
+            ),
+        ),
+        migrations.CreateModel(
+            name="ElementSupprime",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "type_element",
+                    models.CharField(
+                        choices=[
+                            ("FORME", "Forme géométrique"),
+                            ("CONNEXION", "Connexion"),
+                            ("ANNOTATION", "Annotation"),
+                        ],
+                        max_length=20,
+                        verbose_name="Type d'élément",
+                    ),
+                ),
+                (
+                    "element_id",
+                    models.BigIntegerField(verbose_name="Identifiant de l'élément"),
+                ),
+                (
+                    "version",
+                    models.PositiveBigIntegerField(verbose_name="Version de suppression"),
+                ),
+                (
+                    "plan",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="suppressions",
+                        to="plans.plan",
+                        verbose_name="Plan associé",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Élément supprimé",
+                "verbose_name_plural": "Éléments supprimés",
+                "indexes": [
+                    models.Index(
+                        fields=["plan", "version"], name="plans_suppr_plan_version_idx"
+                    )
+                ],
+            },
+        ),
+        migrations.AddIndex(
+            model_name="formegeometrique",
+            index=models.Index(
+                fields=["plan", "version"], name="plans_forme_plan_version_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="connexion",
+            index=models.Index(
+                fields=["plan", "version"], name="plans_connexion_version_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="texteannotation",
+            index=models.Index(
+                fields=["plan", "version"], name="plans_annotation_version_idx"
+            ),
+        ),
+    ]
@@ -0,0 +1,49 @@
+# Generated by Django 5.1.6 on 2026-10-17 11:25
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def remplir_root_usine(apps, schema_editor):
+    Plan = apps.get_model('plans', 'Plan')
+    Utilisateur = apps.get_model('authentication', 'Utilisateur')
+
+    def usine_de(field):
+        return Subquery(
+            Utilisateur.objects.filter(pk=OuterRef(field)).values('root_usine_id')[:1]
+        )
+
+    Plan.objects.update(root_usine_id=Coalesce(
+        F('usine_id'),
+        usine_de('concessionnaire_id'),
+        usine_de('agriculteur_id'),
+    ))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("authentication", "0006_utilisateur_root_usine"),
+        ("plans", "0011_plan_version_elementsupprime_and_more"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="plan",
+            name="root_usine",
+            field=models.ForeignKey(
+                blank=True,
+                editable=False,
+                help_text="Usine en tête de la hiérarchie du plan (dénormalisée, maintenue à l'enregistrement)",
+                null=True,
+                on_delete=django.db.models.deletion.SET_NULL,
+                related_name="plans_usine_racine",
+                to=settings.AUTH_USER_MODEL,
+                verbose_name="Usine de rattachement",
+            ),
+        ),
+        migrations.RunPython(remplir_root_usine, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 5.1.6 on 2026-10-17 14:02
+
+import hashlib
+import json
+
+from django.db import migrations, models
+
+
+def remplir_content_hash(apps, schema_editor):
+    FormeGeometrique = apps.get_model('plans', 'FormeGeometrique')
+    formes = []
+    for forme in FormeGeometrique.objects.only('id', 'type_forme', 'data').iterator(chunk_size=500):
+        canonical = json.dumps([forme.type_forme, forme.data], sort_keys=True, separators=(',', ':'), ensure_ascii=False)
+        forme.content_hash = hashlib.sha256(canonical.encode()).hexdigest()
+        formes.append(forme)
+        if len(formes) >= 500:
+            FormeGeometrique.objects.bulk_update(formes, ['content_hash'])
+            formes = []
+    if formes:
+        FormeGeometrique.objects.bulk_update(formes, ['content_hash'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("plans", "0012_plan_root_usine"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="formegeometrique",
+            name="content_hash",
+            field=models.CharField(
+                blank=True,
+                editable=False,
+                help_text="SHA-256 du type et des données canonisées (voir forme_content_hash)",
+                max_length=64,
+                verbose_name="Empreinte du contenu",
+            ),
+        ),
+        migrations.RunPython(remplir_content_hash, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,88 @@
+# Generated by Django 5.1.6 on 2026-10-17 15:10
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def remplir_ordre(apps, schema_editor):
+    """Numérote les formes existantes de chaque plan dans l'ordre de création."""
+    FormeGeometrique = apps.get_model('plans', 'FormeGeometrique')
+    formes, plan_id, ordre = [], None, 0
+    for forme in FormeGeometrique.objects.only('id', 'plan_id').order_by('plan_id', 'id').iterator(chunk_size=500):
+        ordre = ordre + 1 if forme.plan_id == plan_id else 0
+        plan_id = forme.plan_id
+        forme.ordre = ordre
+        formes.append(forme)
+        if len(formes) >= 500:
+            FormeGeometrique.objects.bulk_update(formes, ['ordre'])
+            formes = []
+    if formes:
+        FormeGeometrique.objects.bulk_update(formes, ['ordre'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("plans", "0013_formegeometrique_content_hash"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name="formegeometrique",
+            options={
+                "ordering": ["ordre", "id"],
+                "verbose_name": "Forme géométrique",
+                "verbose_name_plural": "Formes géométriques",
+            },
+        ),
+        migrations.AddField(
+            model_name="formegeometrique",
+            name="ordre",
+            field=models.PositiveIntegerField(
+                default=0,
+                help_text="Position de la forme dans l'ordre de dessin du plan",
+                verbose_name="Ordre",
+            ),
+        ),
+        migrations.RunPython(remplir_ordre, migrations.RunPython.noop),
+        migrations.CreateModel(
+            name="JournalOperation",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("version", models.PositiveBigIntegerField(verbose_name="Version produite")),
+                ("base_version", models.PositiveBigIntegerField(verbose_name="Version de base")),
+                ("date", models.DateTimeField(auto_now_add=True, verbose_name="Date")),
+                ("operations", models.JSONField(default=list, verbose_name="Opérations")),
+                (
+                    "plan",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="journal",
+                        to="plans.plan",
+                        verbose_name="Plan associé",
+                    ),
+                ),
+                (
+                    "utilisateur",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        related_name="operations_plans",
+                        to=settings.AUTH_USER_MODEL,
+                        verbose_name="Utilisateur",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Journal d'opérations",
+                "verbose_name_plural": "Journaux d'opérations",
+                "ordering": ["plan", "version"],
+                "constraints": [
+                    models.UniqueConstraint(fields=("plan", "version"), name="plans_journal_plan_version_uniq"),
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,111 @@
+# Generated by Django 5.1.6 on 2026-10-17 16:40
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def creer_images_initiales(apps, schema_editor):
+    """
+    Crée une image complète de chaque plan existant, point de départ de son
+    historique. Les entrées de l'ancien champ ``historique`` sont conservées
+    dans le résumé de cette image (clé ``historique``).
+    """
+    Plan = apps.get_model('plans', 'Plan')
+    FormeGeometrique = apps.get_model('plans', 'FormeGeometrique')
+    RevisionPlan = apps.get_model('plans', 'RevisionPlan')
+    for plan in Plan.objects.only('id', 'version', 'nom', 'description', 'preferences', 'historique').iterator(chunk_size=100):
+        formes = [
+            list(forme)
+            for forme in FormeGeometrique.objects.filter(plan_id=plan.id)
+            .order_by('ordre', 'id')
+            .values_list('id', 'type_forme', 'data', 'ordre')
+        ]
+        RevisionPlan.objects.create(
+            plan_id=plan.id,
+            version=plan.version,
+            profondeur=0,
+            contenu={
+                'plan': {'nom': plan.nom, 'description': plan.description, 'preferences': plan.preferences},
+                'formes': formes,
+            },
+            resume={
+                'formes_ecrites': 0,
+                'formes_supprimees': 0,
+                **({'historique': plan.historique} if plan.historique else {}),
+            },
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("plans", "0014_formegeometrique_ordre_journaloperation"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="RevisionPlan",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("version", models.PositiveBigIntegerField(verbose_name="Version du plan")),
+                ("date", models.DateTimeField(auto_now_add=True, verbose_name="Date")),
+                (
+                    "profondeur",
+                    models.PositiveIntegerField(
+                        default=0,
+                        help_text="Nombre de deltas depuis l'image de référence",
+                        verbose_name="Profondeur",
+                    ),
+                ),
+                ("contenu", models.JSONField(verbose_name="Contenu")),
+                ("resume", models.JSONField(blank=True, default=dict, verbose_name="Résumé des modifications")),
+                (
+                    "keyframe",
+                    models.ForeignKey(
+                        blank=True,
+                        help_text="Image complète à laquelle s'appliquent les deltas (vide pour une image)",
+                        null=True,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="deltas",
+                        to="plans.revisionplan",
+                        verbose_name="Image de référence",
+                    ),
+                ),
+                (
+                    "plan",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="revisions",
+                        to="plans.plan",
+                        verbose_name="Plan associé",
+                    ),
+                ),
+                (
+                    "utilisateur",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        related_name="revisions_plans",
+                        to=settings.AUTH_USER_MODEL,
+                        verbose_name="Utilisateur",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Révision de plan",
+                "verbose_name_plural": "Révisions de plans",
+                "ordering": ["plan", "-version"],
+                "constraints": [
+                    models.UniqueConstraint(fields=("plan", "version"), name="plans_revision_plan_version_uniq"),
+                ],
+            },
+        ),
+        migrations.RunPython(creer_images_initiales, migrations.RunPython.noop),
+        migrations.RemoveField(
+            model_name="plan",
+            name="historique",
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.1.6 on 2026-10-17 17:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("plans", "0015_revisionplan_remove_plan_historique"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="formegeometrique",
+            name="type_forme",
+            field=models.CharField(
+                choices=[
+                    ("RECTANGLE", "Rectangle"),
+                    ("CERCLE", "Cercle"),
+                    ("DEMI_CERCLE", "Demi-cercle"),
+                    ("LIGNE", "Ligne"),
+                    ("TEXTE", "Texte"),
+                    ("POLYGON", "Polygone"),
+                    ("ELEVATIONLINE", "Profil altimétrique"),
+                ],
+                max_length=20,
+                verbose_name="Type de forme",
+            ),
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 5.1.6 on 2026-10-17 17:50
+
+import django.contrib.gis.db.models.fields
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("plans", "0016_alter_formegeometrique_type_forme"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="formegeometrique",
+            name="geometrie",
+            field=django.contrib.gis.db.models.fields.GeometryField(
+                blank=True,
+                editable=False,
+                help_text="Géométrie dérivée des données (cercles et rectangles tournés en polygones)",
+                null=True,
+                srid=4326,
+                verbose_name="Géométrie",
+            ),
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.1.6 on 2026-10-17 18:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("plans", "0017_formegeometrique_geometrie"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="connexion",
+            name="simplifications",
+            field=models.JSONField(
+                blank=True,
+                default=dict,
+                editable=False,
+                help_text="Points de la géométrie simplifiés par niveau de zoom (voir simplify_pyramid)",
+                verbose_name="Points simplifiés",
+            ),
+        ),
+        migrations.AddField(
+            model_name="formegeometrique",
+            name="simplifications",
+            field=models.JSONField(
+                blank=True,
+                default=dict,
+                editable=False,
+                help_text="Points des lignes et polygones simplifiés par niveau de zoom (voir simplify_pyramid)",
+                verbose_name="Points simplifiés",
+            ),
+        ),
+    ]
@@ -1,13 +1,52 @@
+import hashlib
+import json
+
 from django.contrib.gis.db import models
+from django.contrib.gis.geos import GEOSException, LineString, Point, Polygon
 from django.conf import settings
+from django.db import transaction
+from django.db.models import F, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
 from django.utils import timezone
 from django.core.exceptions import ValidationError
 from authentication.models import Utilisateur
 
+from . import geometry
+from .validation import validate_forme
+
+class VersionConflict(Exception):
+    """Le plan n'est plus dans la version attendue par l'écriture."""
+
+    def __init__(self, current_version):
+        super().__init__(f"Le plan est en version {current_version}")
+        self.current_version = current_version
+
+
+class PlanQuerySet(models.QuerySet):
+
+    def refresh_root_usine(self):
+        """
+        Recalcule l'usine de rattachement des plans du queryset en une requête :
+        l'usine assignée, sinon celle du concessionnaire, sinon celle de l'agriculteur.
+        """
+        def usine_de(field):
+            return Subquery(
+                Utilisateur.objects.filter(pk=OuterRef(field)).values('root_usine_id')[:1]
+            )
+
+        return self.update(root_usine_id=Coalesce(
+            F('usine_id'),
+            usine_de('concessionnaire_id'),
+            usine_de('agriculteur_id'),
+        ))
+
+
 class Plan(models.Model):
     """
     Modèle représentant un plan d'irrigation.
     """
+    objects = PlanQuerySet.as_manager()
+
     nom = models.CharField(max_length=200, verbose_name='Nom du plan')
     description = models.TextField(blank=True, verbose_name='Description')
     date_creation = models.DateTimeField(auto_now_add=True, verbose_name='Date de création')
@@ -45,6 +84,16 @@ class Plan(models.Model):
         verbose_name='Agriculteur assigné',
         limit_choices_to={'role': Utilisateur.Role.AGRICULTEUR}
     )
+    root_usine = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        editable=False,
+        related_name='plans_usine_racine',
+        verbose_name='Usine de rattachement',
+        help_text='Usine en tête de la hiérarchie du plan (dénormalisée, maintenue à l\'enregistrement)'
+    )
     preferences = models.JSONField(
         default=dict,
         blank=True,
@@ -57,26 +106,105 @@ class Plan(models.Model):
         verbose_name='Éléments du plan',
         help_text='Stocke les éléments du plan (formes, connexions, etc.)'
     )
-    historique = models.JSONField(
-        default=list,
-        blank=True,
-        verbose_name='Historique des modifications',
-        help_text='Stocke l\'historique des modifications du plan'
+    version = models.PositiveBigIntegerField(
+        default=0,
+        verbose_name='Version',
+        help_text='Compteur incrémenté à chaque modification du plan ou de ses éléments'
     )
 
     class Meta:
         verbose_name = 'Plan'
         verbose_name_plural = 'Plans'
         ordering = ['-date_modification']
+        indexes = [
+            # Index de la pagination par curseur de la liste des plans
+            models.Index(fields=['-date_modification', 'id'], name='plans_plan_modif_id_idx'),
+        ]
 
     def __str__(self):
         return f"{self.nom} (créé par {self.createur.get_full_name()})"
 
+    # Champs dont dépend l'usine de rattachement
+    HIERARCHY_FIELDS = {'usine', 'concessionnaire', 'agriculteur'}
+
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None or self.HIERARCHY_FIELDS & set(update_fields):
+            self.root_usine_id = self.compute_root_usine_id()
+            if update_fields is not None:
+                kwargs['update_fields'] = set(update_fields) | {'root_usine'}
+        super().save(*args, **kwargs)
+
+    def compute_root_usine_id(self):
+        """Usine en tête de la hiérarchie du plan (voir ``PlanQuerySet.refresh_root_usine``)."""
+        if self.usine_id:
+            return self.usine_id
+        if self.concessionnaire_id:
+            return self.concessionnaire.root_usine_id
+        if self.agriculteur_id:
+            return self.agriculteur.root_usine_id
+        return None
+
     def touch(self):
         """Force la mise à jour de la date de modification."""
         self.date_modification = timezone.now()
         self.save(update_fields=['date_modification'])
 
+    def bump_version(self, expected_version=None):
+        """
+        Incrémente atomiquement la version du plan et met à jour sa date de
+        modification. Retourne la nouvelle version, à reporter sur les éléments écrits.
+
+        Avec ``expected_version``, l'incrément est un compare-and-swap : si le
+        plan n'est plus dans cette version, ``VersionConflict`` est levée.
+
+        Doit être appelé dans la transaction qui écrit les éléments, de
+        préférence en premier : le verrou posé sur la ligne du plan garantit que
+        les versions sont validées dans l'ordre, et n'est tenu que jusqu'à la fin
+        de cette transaction.
+        """
+        with transaction.atomic():
+            queryset = Plan.objects.filter(pk=self.pk)
+            if expected_version is not None:
+                queryset = queryset.filter(version=expected_version)
+            updated = queryset.update(
+                version=F('version') + 1,
+                date_modification=timezone.now()
+            )
+            current = Plan.objects.filter(pk=self.pk).values_list('version', 'date_modification').first()
+            if not updated:
+                raise VersionConflict(current[0] if current else None)
+            self.version, self.date_modification = current
+        return self.version
+
+    def delete_elements(self, queryset, version):
+        """
+        Supprime les éléments du queryset en laissant une trace de suppression
+        (avec ``version``) pour la synchronisation incrémentale. Les connexions
+        supprimées en cascade avec des formes sont aussi tracées.
+        Retourne le nombre d'éléments supprimés.
+        """
+        model = queryset.model
+        ids = list(queryset.filter(plan=self).values_list('id', flat=True))
+        if not ids:
+            return 0
+
+        traces = [
+            ElementSupprime(plan=self, type_element=ElementSupprime.type_for(model), element_id=element_id, version=version)
+            for element_id in ids
+        ]
+        if model is FormeGeometrique:
+            connexion_ids = Connexion.objects.filter(
+                Q(forme_source_id__in=ids) | Q(forme_destination_id__in=ids)
+            ).values_list('id', flat=True)
+            traces += [
+                ElementSupprime(plan=self, type_element=ElementSupprime.TypeElement.CONNEXION, element_id=connexion_id, version=version)
+                for connexion_id in connexion_ids
+            ]
+        ElementSupprime.objects.bulk_create(traces)
+        model.objects.filter(id__in=ids).delete()
+        return len(ids)
+
     def clean(self):
         """Valide les relations entre usine, concessionnaire et agriculteur."""
         super().clean()
@@ -111,6 +239,73 @@ class Plan(models.Model):
                 'agriculteur': 'L\'agriculteur doit appartenir à un concessionnaire rattaché à l\'usine spécifiée.'
             })
 
+def forme_content_hash(type_forme, data):
+    """
+    Empreinte SHA-256 du contenu d'une forme (type et données canonisées :
+    clés triées, sans espaces), pour détecter les formes inchangées.
+    """
+    canonical = json.dumps([type_forme, data], sort_keys=True, separators=(',', ':'), ensure_ascii=False)
+    return hashlib.sha256(canonical.encode()).hexdigest()
+
+
+GEOMETRY_TYPES = {'Point': Point, 'LineString': LineString, 'Polygon': Polygon}
+
+
+def forme_geometry(type_forme, data):
+    """
+    Géométrie PostGIS (SRID 4326) dérivée des données d'une forme (voir
+    ``plans.geometry.outline``), ou ``None`` si les données n'en décrivent pas.
+    """
+    try:
+        kind, coords = geometry.outline(type_forme, data)
+        geom = GEOMETRY_TYPES[kind](coords)
+    except (KeyError, TypeError, ValueError, IndexError, GEOSException):
+        return None
+    geom.srid = 4326
+    return geom
+
+
+def simplification_zooms():
+    return sorted(getattr(settings, 'PLAN_SIMPLIFY_ZOOMS', (10, 13, 16)))
+
+
+def simplify_pyramid(geom):
+    """
+    Coordonnées de ``geom`` (ligne ou polygone) simplifiées pour chaque niveau
+    de ``PLAN_SIMPLIFY_ZOOMS`` : ``{"<zoom>": [[lng, lat], ...]}``. La
+    tolérance est la taille d'un pixel à ce zoom ; la simplification préserve
+    la topologie (pas d'auto-intersection). Seuls les niveaux qui retirent des
+    sommets sont conservés.
+    """
+    if geom is None or geom.geom_type not in ('LineString', 'Polygon'):
+        return {}
+    coords = geom.coords if geom.geom_type == 'LineString' else geom.coords[0]
+    pyramid, previous = {}, len(coords)
+    for zoom in reversed(simplification_zooms()):
+        tolerance = 360 / (256 * 2 ** zoom)
+        simplified = geom.simplify(tolerance, preserve_topology=True)
+        if simplified.empty or simplified.geom_type != geom.geom_type:
+            break
+        points = simplified.coords if simplified.geom_type == 'LineString' else simplified.coords[0]
+        if len(points) >= previous:
+            continue
+        pyramid[str(zoom)] = [list(point) for point in points]
+        previous = len(points)
+    return pyramid
+
+
+def pick_simplification(simplifications, zoom):
+    """
+    Points à servir pour un affichage au niveau ``zoom`` : ceux du niveau
+    simplifié le plus grossier encore fidèle à ce zoom, ou ``None`` pour la
+    géométrie complète.
+    """
+    if zoom is None or not simplifications:
+        return None
+    bands = [int(band) for band in simplifications if int(band) >= zoom]
+    return simplifications[str(min(bands))] if bands else None
+
+
 class FormeGeometrique(models.Model):
     """
     Modèle de base pour toutes les formes géométriques.
@@ -121,6 +316,8 @@ class FormeGeometrique(models.Model):
         DEMI_CERCLE = 'DEMI_CERCLE', 'Demi-cercle'
         LIGNE = 'LIGNE', 'Ligne'
         TEXTE = 'TEXTE', 'Texte'
+        POLYGON = 'POLYGON', 'Polygone'
+        ELEVATIONLINE = 'ELEVATIONLINE', 'Profil altimétrique'
 
     plan = models.ForeignKey(
         Plan,
@@ -140,35 +337,74 @@ class FormeGeometrique(models.Model):
         blank=True,
         verbose_name='Données de la forme'
     )
+    version = models.PositiveBigIntegerField(
+        default=0,
+        verbose_name='Version',
+        help_text='Version du plan lors de la dernière écriture de la forme'
+    )
+    content_hash = models.CharField(
+        max_length=64,
+        blank=True,
+        editable=False,
+        verbose_name='Empreinte du contenu',
+        help_text='SHA-256 du type et des données canonisées (voir forme_content_hash)'
+    )
+    ordre = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Ordre',
+        help_text='Position de la forme dans l\'ordre de dessin du plan'
+    )
+    # Dérivée de ``data`` à chaque écriture, indexée (GiST) pour les requêtes spatiales
+    geometrie = models.GeometryField(
+        srid=4326,
+        null=True,
+        blank=True,
+        editable=False,
+        verbose_name='Géométrie',
+        help_text='Géométrie dérivée des données (cercles et rectangles tournés en polygones)'
+    )
+    simplifications = models.JSONField(
+        default=dict,
+        blank=True,
+        editable=False,
+        verbose_name='Points simplifiés',
+        help_text='Points des lignes et polygones simplifiés par niveau de zoom (voir simplify_pyramid)'
+    )
 
     class Meta:
         verbose_name = 'Forme géométrique'
         verbose_name_plural = 'Formes géométriques'
+        ordering = ['ordre', 'id']
+        indexes = [
+            models.Index(fields=['plan', 'version'], name='plans_forme_plan_version_idx'),
+        ]
 
     def __str__(self):
         return f"{self.get_type_forme_display()} dans {self.plan.nom}"
 
+    def compute_derived(self, content_hash=None):
+        """
+        Recalcule les champs dérivés du type et des données (empreinte,
+        géométrie, points simplifiés) ; ``content_hash`` évite de recalculer
+        une empreinte déjà connue.
+        """
+        self.content_hash = content_hash or forme_content_hash(self.type_forme, self.data)
+        self.geometrie = forme_geometry(self.type_forme, self.data)
+        self.simplifications = simplify_pyramid(self.geometrie) if 'points' in self.data else {}
+
+    def save(self, *args, **kwargs):
+        self.compute_derived()
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and {'type_forme', 'data'} & set(update_fields):
+            kwargs['update_fields'] = {*update_fields, 'content_hash', 'geometrie', 'simplifications'}
+        super().save(*args, **kwargs)
+
     def clean(self):
-        """Valide les données selon le type de forme."""
+        """Valide les données selon le type de forme (voir ``plans.validation``)."""
         super().clean()
-        if not self.data:
-            raise ValidationError("Les données de la forme sont requises")
-
-        if self.type_forme == self.TypeForme.CERCLE:
-            if 'center' not in self.data or 'radius' not in self.data:
-                raise ValidationError("Un cercle nécessite un centre et un rayon")
-        elif self.type_forme == self.TypeForme.RECTANGLE:
-            if 'bounds' not in self.data:
-                raise ValidationError("Un rectangle nécessite des limites (bounds)")
-        elif self.type_forme == self.TypeForme.DEMI_CERCLE:
-            if not all(k in self.data for k in ['center', 'radius', 'startAngle', 'endAngle']):
-                raise ValidationError("Un demi-cercle nécessite un centre, un rayon et des angles")
-        elif self.type_forme == self.TypeForme.LIGNE:
-            if 'points' not in self.data:
-                raise ValidationError("Une ligne nécessite des points")
-        elif self.type_forme == self.TypeForme.TEXTE:
-            if not all(k in self.data for k in ['position', 'content']):
-                raise ValidationError("Un texte nécessite une position et un contenu")
+        error = validate_forme(self.type_forme, self.data)
+        if error:
+            raise ValidationError(error)
 
 class Connexion(models.Model):
     """
@@ -196,14 +432,36 @@ class Connexion(models.Model):
         srid=4326,
         verbose_name='Géométrie de la connexion'
     )
+    simplifications = models.JSONField(
+        default=dict,
+        blank=True,
+        editable=False,
+        verbose_name='Points simplifiés',
+        help_text='Points de la géométrie simplifiés par niveau de zoom (voir simplify_pyramid)'
+    )
+    version = models.PositiveBigIntegerField(
+        default=0,
+        verbose_name='Version',
+        help_text='Version du plan lors de la dernière écriture de la connexion'
+    )
 
     class Meta:
         verbose_name = 'Connexion'
         verbose_name_plural = 'Connexions'
+        indexes = [
+            models.Index(fields=['plan', 'version'], name='plans_connexion_version_idx'),
+        ]
 
     def __str__(self):
         return f"Connexion entre {self.forme_source} et {self.forme_destination}"
 
+    def save(self, *args, **kwargs):
+        self.simplifications = simplify_pyramid(self.geometrie)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'geometrie' in update_fields:
+            kwargs['update_fields'] = {*update_fields, 'simplifications'}
+        super().save(*args, **kwargs)
+
 class TexteAnnotation(models.Model):
     """
     Modèle pour les textes et annotations sur le plan.
@@ -220,10 +478,153 @@ class TexteAnnotation(models.Model):
         default=0,
         verbose_name='Rotation (degrés)'
     )
+    version = models.PositiveBigIntegerField(
+        default=0,
+        verbose_name='Version',
+        help_text='Version du plan lors de la dernière écriture de l\'annotation'
+    )
 
     class Meta:
         verbose_name = 'Texte d\'annotation'
         verbose_name_plural = 'Textes d\'annotation'
+        indexes = [
+            models.Index(fields=['plan', 'version'], name='plans_annotation_version_idx'),
+        ]
 
     def __str__(self):
         return f"Annotation sur {self.plan.nom}: {self.texte[:30]}..."
+
+class ElementSupprime(models.Model):
+    """
+    Trace de la suppression d'un élément de plan, conservée pour que les
+    clients puissent synchroniser un plan de manière incrémentale.
+    """
+    class TypeElement(models.TextChoices):
+        FORME = 'FORME', 'Forme géométrique'
+        CONNEXION = 'CONNEXION', 'Connexion'
+        ANNOTATION = 'ANNOTATION', 'Annotation'
+
+    plan = models.ForeignKey(
+        Plan,
+        on_delete=models.CASCADE,
+        related_name='suppressions',
+        verbose_name='Plan associé'
+    )
+    type_element = models.CharField(
+        max_length=20,
+        choices=TypeElement.choices,
+        verbose_name='Type d\'élément'
+    )
+    element_id = models.BigIntegerField(verbose_name='Identifiant de l\'élément')
+    version = models.PositiveBigIntegerField(verbose_name='Version de suppression')
+
+    class Meta:
+        verbose_name = 'Élément supprimé'
+        verbose_name_plural = 'Éléments supprimés'
+        indexes = [
+            models.Index(fields=['plan', 'version'], name='plans_suppr_plan_version_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.get_type_element_display()} {self.element_id} supprimé (version {self.version})"
+
+    @classmethod
+    def type_for(cls, model):
+        """Retourne le type d'élément correspondant à une classe de modèle."""
+        return {
+            FormeGeometrique: cls.TypeElement.FORME,
+            Connexion: cls.TypeElement.CONNEXION,
+            TexteAnnotation: cls.TypeElement.ANNOTATION,
+        }[model]
+
+
+class JournalOperation(models.Model):
+    """
+    Lot d'opérations appliqué à un plan (voir ``plans.operations``), conservé
+    dans l'ordre des versions.
+    """
+    plan = models.ForeignKey(
+        Plan,
+        on_delete=models.CASCADE,
+        related_name='journal',
+        verbose_name='Plan associé'
+    )
+    version = models.PositiveBigIntegerField(verbose_name='Version produite')
+    base_version = models.PositiveBigIntegerField(verbose_name='Version de base')
+    utilisateur = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='operations_plans',
+        verbose_name='Utilisateur'
+    )
+    date = models.DateTimeField(auto_now_add=True, verbose_name='Date')
+    operations = models.JSONField(default=list, verbose_name='Opérations')
+
+    class Meta:
+        verbose_name = 'Journal d\'opérations'
+        verbose_name_plural = 'Journaux d\'opérations'
+        ordering = ['plan', 'version']
+        constraints = [
+            models.UniqueConstraint(fields=['plan', 'version'], name='plans_journal_plan_version_uniq'),
+        ]
+
+    def __str__(self):
+        return f"{self.plan} : version {self.base_version} -> {self.version}"
+
+
+class RevisionPlan(models.Model):
+    """
+    Révision d'un plan (voir ``plans.revisions``) : une image complète
+    (keyframe) toutes les ``PLAN_REVISION_KEYFRAME_INTERVAL`` révisions, et
+    entre deux images des deltas ne contenant que les formes écrites et
+    supprimées dans la version.
+    """
+    plan = models.ForeignKey(
+        Plan,
+        on_delete=models.CASCADE,
+        related_name='revisions',
+        verbose_name='Plan associé'
+    )
+    version = models.PositiveBigIntegerField(verbose_name='Version du plan')
+    date = models.DateTimeField(auto_now_add=True, verbose_name='Date')
+    utilisateur = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='revisions_plans',
+        verbose_name='Utilisateur'
+    )
+    keyframe = models.ForeignKey(
+        'self',
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='deltas',
+        verbose_name='Image de référence',
+        help_text='Image complète à laquelle s\'appliquent les deltas (vide pour une image)'
+    )
+    profondeur = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Profondeur',
+        help_text='Nombre de deltas depuis l\'image de référence'
+    )
+    contenu = models.JSONField(verbose_name='Contenu')
+    resume = models.JSONField(default=dict, blank=True, verbose_name='Résumé des modifications')
+
+    class Meta:
+        verbose_name = 'Révision de plan'
+        verbose_name_plural = 'Révisions de plans'
+        ordering = ['plan', '-version']
+        constraints = [
+            models.UniqueConstraint(fields=['plan', 'version'], name='plans_revision_plan_version_uniq'),
+        ]
+
+    def __str__(self):
+        return f"Révision {self.version} du plan {self.plan_id}"
+
+    @property
+    def is_keyframe(self):
+        return self.keyframe_id is None
@@ -0,0 +1,242 @@
+"""
+Réseau de canalisations d'un plan : les connexions relient les formes
+(sommets du graphe) par des tuyaux dont la longueur est mesurée sur leur
+géométrie (haversine, comme ``plans.measurements``).
+
+Le graphe est construit une fois, dans des tableaux compacts (liste
+d'adjacence au format CSR : ``indptr``, sommets et connexions voisins), puis
+tous les résultats sont calculés en temps linéaire ou quasi linéaire :
+
+- composantes connexes (union-find) et connexions qui ferment une boucle ;
+- tronçons : suites de connexions entre deux embranchements ou extrémités
+  (sommets de degré différent de 2), avec leur longueur ;
+- plus court chemin (en longueur de tuyau) depuis la source d'eau jusqu'à
+  chaque forme (Dijkstra multi-sources).
+
+Les sources d'eau sont les formes qui ne sont destination d'aucune connexion ;
+une composante qui n'en a pas (boucle fermée) part de sa forme de plus petit
+identifiant. Les émetteurs sont les cercles et demi-cercles du réseau.
+"""
+import heapq
+
+import numpy as np
+
+from .measurements import _Paths, line_lengths
+
+EMITTER_TYPES = ('CERCLE', 'DEMI_CERCLE')
+
+
+class PipeNetwork:
+    """
+    Graphe des connexions ``(id, forme_source, forme_destination, type_source,
+    type_destination, coordonnées)`` d'un plan.
+    """
+
+    def __init__(self, connexions):
+        edge_ids, ends, types, paths = [], [], {}, _Paths()
+        for connexion_id, source, destination, source_type, destination_type, coords in connexions:
+            paths.add(len(edge_ids), coords)
+            edge_ids.append(connexion_id)
+            ends.append((source, destination))
+            types[source], types[destination] = source_type, destination_type
+
+        ends = np.asarray(ends, dtype=np.int64).reshape(-1, 2)
+        self.node_ids, inverse = np.unique(ends, return_inverse=True)
+        inverse = inverse.reshape(-1, 2)
+        self.node_types = [types[node_id] for node_id in self.node_ids.tolist()]
+        self.edge_ids = np.asarray(edge_ids, dtype=np.int64)
+        self.sources, self.destinations = inverse[:, 0], inverse[:, 1]
+        self.lengths = line_lengths(paths)
+        self._build_adjacency()
+        self._find_components()
+        self._find_paths()
+        self._find_branches()
+        self.summary = self._summarize()
+
+    @property
+    def node_count(self):
+        return len(self.node_ids)
+
+    @property
+    def edge_count(self):
+        return len(self.edge_ids)
+
+    def _build_adjacency(self):
+        """Adjacence non orientée au format CSR (chaque connexion apparaît à ses deux extrémités)."""
+        edges = np.arange(self.edge_count)
+        nodes = np.concatenate((self.sources, self.destinations))
+        order = np.argsort(nodes, kind='stable')
+        self.neighbours = np.concatenate((self.destinations, self.sources))[order]
+        self.neighbour_edges = np.concatenate((edges, edges))[order]
+        self.degree = np.bincount(nodes, minlength=self.node_count)
+        self.indptr = np.concatenate(([0], np.cumsum(self.degree)))
+
+    def _find_components(self):
+        parent = list(range(self.node_count))
+
+        def find(node):
+            while parent[node] != node:
+                parent[node] = parent[parent[node]]
+                node = parent[node]
+            return node
+
+        loop_edges = []
+        for edge, (source, destination) in enumerate(zip(self.sources.tolist(), self.destinations.tolist())):
+            root_source, root_destination = find(source), find(destination)
+            if root_source == root_destination:
+                loop_edges.append(edge)
+            else:
+                parent[root_source] = root_destination
+        roots = np.array([find(node) for node in range(self.node_count)], dtype=np.int64)
+        _, self.component = np.unique(roots, return_inverse=True)
+        self.component_count = int(self.component.max()) + 1 if self.node_count else 0
+        self.loop_edges = np.asarray(loop_edges, dtype=np.int64)
+
+    def _find_paths(self):
+        """Dijkstra depuis les sources : distance, source et connexion parente de chaque forme."""
+        indegree = np.bincount(self.destinations, minlength=self.node_count)
+        starts = indegree == 0
+        # Composantes sans source : départ de leur première forme
+        first = np.full(self.component_count, self.node_count, dtype=np.int64)
+        np.minimum.at(first, self.component, np.arange(self.node_count))
+        has_source = np.zeros(self.component_count, dtype=bool)
+        has_source[self.component[starts]] = True
+        starts[first[~has_source]] = True
+        self.is_source = starts
+
+        distance = [float('inf')] * self.node_count
+        origin = [-1] * self.node_count
+        parent_edge = [-1] * self.node_count
+        heap = []
+        for node in np.flatnonzero(starts).tolist():
+            distance[node], origin[node] = 0.0, node
+            heap.append((0.0, node))
+        heapq.heapify(heap)
+        indptr, neighbours = self.indptr.tolist(), self.neighbours.tolist()
+        neighbour_edges, lengths = self.neighbour_edges.tolist(), self.lengths.tolist()
+        while heap:
+            current, node = heapq.heappop(heap)
+            if current > distance[node]:
+                continue
+            for position in range(indptr[node], indptr[node + 1]):
+                neighbour, edge = neighbours[position], neighbour_edges[position]
+                candidate = current + lengths[edge]
+                if candidate < distance[neighbour]:
+                    distance[neighbour] = candidate
+                    origin[neighbour] = origin[node]
+                    parent_edge[neighbour] = edge
+                    heapq.heappush(heap, (candidate, neighbour))
+        self.distance = np.asarray(distance)
+        self.origin = np.asarray(origin, dtype=np.int64)
+        self.parent_edge = np.asarray(parent_edge, dtype=np.int64)
+
+    def _find_branches(self):
+        """Tronçons entre deux formes de degré différent de 2 (ou boucles isolées)."""
+        indptr, neighbours = self.indptr.tolist(), self.neighbours.tolist()
+        neighbour_edges, degree = self.neighbour_edges.tolist(), self.degree.tolist()
+        visited = [False] * self.edge_count
+        branches = []
+
+        def walk(start, position):
+            node, edge = neighbours[position], neighbour_edges[position]
+            chain = [edge]
+            visited[edge] = True
+            while degree[node] == 2 and node != start:
+                first, second = neighbour_edges[indptr[node]], neighbour_edges[indptr[node] + 1]
+                edge = second if first == edge else first
+                if visited[edge]:
+                    break
+                visited[edge] = True
+                chain.append(edge)
+                position = indptr[node] + (second == edge)
+                node = neighbours[position]
+            branches.append((start, node, chain))
+
+        ends = [node for node in range(self.node_count) if degree[node] != 2]
+        for start in ends + list(range(self.node_count)):
+            for position in range(indptr[start], indptr[start + 1]):
+                if not visited[neighbour_edges[position]]:
+                    walk(start, position)
+        self.branches = branches
+
+    def path(self, node):
+        """Connexions (indices) de la source jusqu'à la forme d'indice ``node``."""
+        edges = []
+        while self.parent_edge[node] >= 0:
+            edge = int(self.parent_edge[node])
+            edges.append(edge)
+            source, destination = self.sources[edge], self.destinations[edge]
+            node = int(source if destination == node else destination)
+        return edges[::-1]
+
+    def node_index(self, forme_id):
+        """Indice de la forme dans le graphe, ou ``None`` si elle n'y figure pas."""
+        index = int(np.searchsorted(self.node_ids, forme_id))
+        if index < self.node_count and self.node_ids[index] == forme_id:
+            return index
+        return None
+
+    def emitter_path(self, forme_id):
+        """Chemin depuis la source jusqu'à l'émetteur ``forme_id``, ou ``None``."""
+        node = self.node_index(forme_id)
+        if node is None or self.node_types[node] not in EMITTER_TYPES:
+            return None
+        edges = self.path(node)
+        nodes = [int(self.origin[node])]
+        for edge in edges:
+            source, destination = int(self.sources[edge]), int(self.destinations[edge])
+            nodes.append(destination if source == nodes[-1] else source)
+        return {
+            'emetteur': forme_id,
+            'source': int(self.node_ids[nodes[0]]),
+            'formes': self.node_ids[nodes].tolist(),
+            'connexions': self.edge_ids[edges].tolist(),
+            'longueur': float(self.distance[node]),
+        }
+
+    def _summarize(self):
+        """Résumé du réseau : composantes, boucles, tronçons et émetteurs."""
+        edge_component = self.component[self.sources]
+        component_lengths = np.bincount(edge_component, weights=self.lengths, minlength=self.component_count)
+        component_loops = np.zeros(self.component_count, dtype=bool)
+        component_loops[edge_component[self.loop_edges]] = True
+        order = np.argsort(self.component, kind='stable')
+        bounds = np.concatenate(([0], np.cumsum(np.bincount(self.component, minlength=self.component_count))))
+        node_ids, edge_ids, lengths = self.node_ids.tolist(), self.edge_ids.tolist(), self.lengths.tolist()
+
+        composantes = []
+        for component in range(self.component_count):
+            nodes = order[bounds[component]:bounds[component + 1]]
+            composantes.append({
+                'formes': self.node_ids[nodes].tolist(),
+                'sources': self.node_ids[nodes[self.is_source[nodes]]].tolist(),
+                'connexions': int(np.count_nonzero(edge_component == component)),
+                'longueur': float(component_lengths[component]),
+                'boucle': bool(component_loops[component]),
+            })
+        distance, origin = self.distance.tolist(), self.origin.tolist()
+        emitters = [node for node, type_forme in enumerate(self.node_types) if type_forme in EMITTER_TYPES]
+        return {
+            'formes': self.node_count,
+            'connexions': self.edge_count,
+            'longueur_totale': float(self.lengths.sum()),
+            'boucle': bool(len(self.loop_edges)),
+            'connexions_en_boucle': self.edge_ids[self.loop_edges].tolist(),
+            'composantes': composantes,
+            'troncons': [
+                {
+                    'formes': [node_ids[start], node_ids[end]],
+                    'connexions': [edge_ids[edge] for edge in chain],
+                    'longueur': sum(lengths[edge] for edge in chain),
+                }
+                for start, end, chain in self.branches
+            ],
+            'emetteurs': [
+                {
+                    'id': node_ids[node],
+                    'source': node_ids[origin[node]],
+                    'longueur': distance[node],
+                }
+                for node in emitters
+            ],
+        }
@@ -0,0 +1,219 @@
+"""
+Application d'un lot ordonné d'opérations sur les formes d'un plan :
+
+    {"op": "add", "ref": "tmp-1", "forme": {"type_forme": "CERCLE", "data": {...}}}
+    {"op": "update", "id": 12, "type_forme": "...", "data": {...}}   # data : JSON Merge Patch
+    {"op": "move", "id": 12, "dx": 0.001, "dy": -0.0005}
+    {"op": "transform", "id": 12, "translate": [dx, dy], "rotate": 15, "scale": 1.5}
+    {"op": "delete", "id": 12}
+    {"op": "reorder", "ids": [14, 12, "tmp-1"]}      # rangs échangés entre ces formes
+
+Une forme ajoutée dans le lot peut être désignée par sa référence ``ref``
+dans les opérations suivantes. Le lot est appliqué en mémoire puis écrit en
+une transaction, en un nombre de requêtes indépendant de sa taille.
+"""
+from django.db import transaction
+from django.db.models import Max
+
+from . import geometry
+from .models import FormeGeometrique, JournalOperation, Plan, VersionConflict
+from .revisions import record_revision
+from .services import FORME_WRITE_FIELDS, get_batch_size
+from .validation import validate_forme
+
+
+class OperationError(Exception):
+    """Opération invalide ; ``index`` est sa position dans le lot."""
+
+    def __init__(self, index, message):
+        super().__init__(message)
+        self.index = index
+        self.message = message
+
+
+def merge_patch(target, patch):
+    """Applique un JSON Merge Patch (RFC 7396) : ``None`` supprime la clé."""
+    if not isinstance(patch, dict):
+        return patch
+    result = dict(target) if isinstance(target, dict) else {}
+    for key, value in patch.items():
+        if value is None:
+            result.pop(key, None)
+        else:
+            result[key] = merge_patch(result.get(key), value)
+    return result
+
+
+def _referenced_ids(operations):
+    ids = set()
+    for operation in operations:
+        if not isinstance(operation, dict):
+            continue
+        keys = operation.get('ids')
+        keys = [operation.get('id'), *(keys if isinstance(keys, list) else [])]
+        ids.update(key for key in keys if isinstance(key, int))
+    return ids
+
+
+class _Batch:
+    """État en mémoire des formes touchées par le lot."""
+
+    def __init__(self, plan, formes, next_ordre):
+        self.plan = plan
+        self.formes = formes
+        self.added = {}
+        self.changed = set()
+        self.deleted = set()
+        self.next_ordre = next_ordre
+
+    def get(self, index, key):
+        forme = self.added.get(key) if isinstance(key, str) else self.formes.get(key)
+        if forme is None or key in self.deleted:
+            raise OperationError(index, f"Forme introuvable dans le plan : {key}")
+        return forme
+
+    def touch(self, key):
+        if not isinstance(key, str):
+            self.changed.add(key)
+
+    def add(self, index, operation):
+        forme_data = operation.get('forme') or {}
+        ref = operation.get('ref') or f'#{index}'
+        if ref in self.added:
+            raise OperationError(index, f"Référence déjà utilisée : {ref}")
+        self.added[ref] = _checked(index, FormeGeometrique(
+            plan=self.plan,
+            type_forme=forme_data.get('type_forme'),
+            data=forme_data.get('data', {}),
+            ordre=self.next_ordre,
+        ))
+        self.next_ordre += 1
+
+    def update(self, index, operation):
+        key = operation.get('id')
+        forme = self.get(index, key)
+        if 'type_forme' in operation:
+            forme.type_forme = operation['type_forme']
+        if 'data' in operation:
+            forme.data = merge_patch(forme.data, operation['data'])
+        _checked(index, forme)
+        self.touch(key)
+
+    def move(self, index, operation):
+        self.transform(index, {'id': operation.get('id'), 'translate': [operation.get('dx', 0), operation.get('dy', 0)]})
+
+    def transform(self, index, operation):
+        key = operation.get('id')
+        forme = self.get(index, key)
+        try:
+            data = forme.data
+            if operation.get('scale') is not None:
+                data = geometry.scale(data, float(operation['scale']))
+            if operation.get('rotate') is not None:
+                data = geometry.rotate(data, float(operation['rotate']))
+            if operation.get('translate') is not None:
+                dx, dy = operation['translate']
+                data = geometry.translate(data, float(dx), float(dy))
+        except (KeyError, TypeError, ValueError, IndexError) as e:
+            raise OperationError(index, f"Transformation impossible : {e}")
+        forme.data = data
+        _checked(index, forme)
+        self.touch(key)
+
+    def delete(self, index, operation):
+        key = operation.get('id')
+        self.get(index, key)
+        if isinstance(key, str):
+            del self.added[key]
+        else:
+            self.deleted.add(key)
+            self.changed.discard(key)
+
+    def reorder(self, index, operation):
+        keys = operation.get('ids')
+        if not isinstance(keys, list):
+            raise OperationError(index, "'ids' doit être une liste")
+        formes = [self.get(index, key) for key in keys]
+        # Les formes listées échangent leurs rangs entre elles : les formes
+        # absentes du lot gardent le leur, sans collision
+        for forme, ordre in zip(formes, sorted(forme.ordre for forme in formes)):
+            forme.ordre = ordre
+        for key in keys:
+            self.touch(key)
+
+
+def _checked(index, forme):
+    """Valide la forme après l'opération (voir ``plans.validation``)."""
+    error = validate_forme(forme.type_forme, forme.data)
+    if error:
+        raise OperationError(index, error)
+    return forme
+
+
+OPERATIONS = {
+    'add': _Batch.add,
+    'update': _Batch.update,
+    'move': _Batch.move,
+    'transform': _Batch.transform,
+    'delete': _Batch.delete,
+    'reorder': _Batch.reorder,
+}
+
+
+def apply_operations(plan, operations, base_version, user=None):
+    """
+    Applique le lot ``operations`` au plan s'il est toujours en ``base_version``
+    (sinon lève ``VersionConflict``, y compris si le plan change pendant
+    l'application du lot), le journalise et retourne la nouvelle
+    version ainsi que les identifiants créés, modifiés et supprimés.
+    """
+    if not isinstance(operations, list) or not operations:
+        raise OperationError(None, "'operations' doit être une liste non vide")
+
+    current = Plan.objects.filter(pk=plan.pk).values_list('version', flat=True).get()
+    if current != base_version:
+        raise VersionConflict(current)
+
+    # Application en mémoire, hors transaction : le compare-and-swap sur la
+    # version garantit que les formes lues n'ont pas changé avant l'écriture
+    formes = FormeGeometrique.objects.filter(plan=plan, id__in=_referenced_ids(operations)).in_bulk()
+    next_ordre = FormeGeometrique.objects.filter(plan=plan).aggregate(ordre=Max('ordre'))['ordre']
+    batch = _Batch(plan, formes, 0 if next_ordre is None else next_ordre + 1)
+    for index, operation in enumerate(operations):
+        handler = OPERATIONS.get(operation.get('op')) if isinstance(operation, dict) else None
+        if handler is None:
+            raise OperationError(index, "Opération inconnue")
+        handler(batch, index, operation)
+
+    created = list(batch.added.values())
+    updated = [batch.formes[key] for key in batch.changed]
+    for forme in (*created, *updated):
+        forme.compute_derived()
+    batch_size = get_batch_size()
+
+    with transaction.atomic():
+        version = plan.bump_version(expected_version=base_version)
+        for forme in (*created, *updated):
+            forme.version = version
+        if batch.deleted:
+            plan.delete_elements(FormeGeometrique.objects.filter(id__in=batch.deleted), version)
+        if created:
+            FormeGeometrique.objects.bulk_create(created, batch_size=batch_size)
+        if updated:
+            FormeGeometrique.objects.bulk_update(updated, FORME_WRITE_FIELDS, batch_size=batch_size)
+        JournalOperation.objects.create(
+            plan=plan,
+            version=version,
+            base_version=base_version,
+            utilisateur=user,
+            operations=operations,
+        )
+        record_revision(plan, version, user)
+
+    return {
+        'version': version,
+        'base_version': base_version,
+        'created': {ref: forme.id for ref, forme in batch.added.items()},
+        'updated': sorted(batch.changed),
+        'deleted': sorted(batch.deleted),
+    }
@@ -0,0 +1,142 @@
+"""
+Historique des plans.
+
+Chaque version écrite d'un plan donne une ``RevisionPlan`` :
+
+- une image complète (champs du plan et toutes ses formes) toutes les
+  ``PLAN_REVISION_KEYFRAME_INTERVAL`` révisions ;
+- sinon un delta : les champs du plan, les formes écrites et les formes
+  supprimées dans cette version, lus grâce aux colonnes ``version`` des formes
+  et des traces de suppression.
+
+Reconstruire une révision coûte donc une image et au plus ``intervalle - 1``
+deltas, lus en une requête. Seuls les champs du plan et les formes sont
+historisés : les connexions et annotations ne sont pas éditées par l'éditeur.
+"""
+from collections import defaultdict
+
+from django.conf import settings
+from django.db.models import Q
+
+from .models import ElementSupprime, FormeGeometrique, Plan, RevisionPlan
+
+PLAN_FIELDS = ('nom', 'description', 'preferences')
+FORME_FIELDS = ('id', 'type_forme', 'data', 'ordre')
+
+
+def get_keyframe_interval():
+    return max(1, getattr(settings, 'PLAN_REVISION_KEYFRAME_INTERVAL', 20))
+
+
+def record_revision(plan, version, user=None):
+    """
+    Enregistre la révision ``version`` du plan. À appeler dans la transaction
+    d'écriture, après les écritures : les formes de cette version sont celles
+    dont la colonne ``version`` vaut ``version``.
+    """
+    plan_fields = dict(zip(PLAN_FIELDS, Plan.objects.filter(pk=plan.pk).values_list(*PLAN_FIELDS).get()))
+    supprimes = list(
+        ElementSupprime.objects.filter(
+            plan=plan, version=version, type_element=ElementSupprime.TypeElement.FORME
+        ).values_list('element_id', flat=True)
+    )
+    last = (
+        RevisionPlan.objects.filter(plan=plan)
+        .only('id', 'version', 'keyframe_id', 'profondeur')
+        .order_by('-version')
+        .first()
+    )
+
+    # Image complète périodiquement, ou si la chaîne de deltas est interrompue
+    if last is None or last.version != version - 1 or last.profondeur + 1 >= get_keyframe_interval():
+        formes = list(FormeGeometrique.objects.filter(plan=plan).values_list(*FORME_FIELDS, 'version'))
+        written = sum(1 for forme in formes if forme[-1] == version)
+        contenu = {'plan': plan_fields, 'formes': [list(forme[:-1]) for forme in formes]}
+        keyframe_id, profondeur = None, 0
+    else:
+        formes = list(FormeGeometrique.objects.filter(plan=plan, version=version).values_list(*FORME_FIELDS))
+        written = len(formes)
+        contenu = {'plan': plan_fields, 'formes': [list(forme) for forme in formes], 'supprimes': supprimes}
+        keyframe_id, profondeur = last.keyframe_id or last.id, last.profondeur + 1
+
+    return RevisionPlan.objects.create(
+        plan=plan,
+        version=version,
+        utilisateur=user,
+        keyframe_id=keyframe_id,
+        profondeur=profondeur,
+        contenu=contenu,
+        resume={'formes_ecrites': written, 'formes_supprimees': len(supprimes)},
+    )
+
+
+def materialize(revision):
+    """
+    Reconstruit l'état du plan à ``revision`` : retourne les champs du plan et
+    les formes (``{id: [id, type_forme, data, ordre]}``).
+    """
+    keyframe_id = revision.keyframe_id or revision.id
+    chain = list(
+        RevisionPlan.objects.filter(
+            Q(pk=keyframe_id) | Q(keyframe_id=keyframe_id, version__lte=revision.version)
+        ).order_by('version').values_list('contenu', flat=True)
+    )
+    plan_fields, formes = {}, {}
+    for contenu in chain:
+        plan_fields = contenu['plan']
+        for forme in contenu['formes']:
+            formes[forme[0]] = forme
+        for forme_id in contenu.get('supprimes', []):
+            formes.pop(forme_id, None)
+    return plan_fields, formes
+
+
+def record_field_revisions(plans, user=None):
+    """
+    Enregistre en bloc la révision courante de plans dont seuls les champs ont
+    changé (aucune forme écrite ni supprimée) : un nombre de requêtes constant
+    quel que soit le nombre de plans. ``plans`` porte les valeurs écrites.
+    """
+    if not plans:
+        return []
+    last_revisions = {
+        revision.plan_id: revision
+        for revision in RevisionPlan.objects.filter(plan__in=plans)
+        .order_by('plan_id', '-version')
+        .distinct('plan_id')
+        .only('id', 'plan_id', 'version', 'keyframe_id', 'profondeur')
+    }
+    interval = get_keyframe_interval()
+
+    def needs_keyframe(plan):
+        last = last_revisions.get(plan.pk)
+        return last is None or last.version != plan.version - 1 or last.profondeur + 1 >= interval
+
+    keyframe_ids = [plan.pk for plan in plans if needs_keyframe(plan)]
+    formes = defaultdict(list)
+    if keyframe_ids:
+        for plan_id, *forme in FormeGeometrique.objects.filter(plan_id__in=keyframe_ids).values_list(
+            'plan_id', *FORME_FIELDS
+        ):
+            formes[plan_id].append(forme)
+
+    revisions = []
+    for plan in plans:
+        plan_fields = {name: getattr(plan, name) for name in PLAN_FIELDS}
+        if needs_keyframe(plan):
+            contenu = {'plan': plan_fields, 'formes': formes[plan.pk]}
+            keyframe_id, profondeur = None, 0
+        else:
+            last = last_revisions[plan.pk]
+            contenu = {'plan': plan_fields, 'formes': [], 'supprimes': []}
+            keyframe_id, profondeur = last.keyframe_id or last.id, last.profondeur + 1
+        revisions.append(RevisionPlan(
+            plan=plan,
+            version=plan.version,
+            utilisateur=user,
+            keyframe_id=keyframe_id,
+            profondeur=profondeur,
+            contenu=contenu,
+            resume={'formes_ecrites': 0, 'formes_supprimees': 0},
+        ))
+    return RevisionPlan.objects.bulk_create(revisions)
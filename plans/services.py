@@ -0,0 +1,341 @@
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Connexion, FormeGeometrique, Plan, TexteAnnotation, VersionConflict, forme_content_hash
+from .revisions import materialize, record_field_revisions, record_revision
+
+
+# Colonnes réécrites lors de la mise à jour d'une forme (données et champs dérivés)
+FORME_WRITE_FIELDS = ['type_forme', 'data', 'content_hash', 'geometrie', 'simplifications', 'ordre', 'version']
+
+
+def get_batch_size():
+    return getattr(settings, 'PLAN_SAVE_BATCH_SIZE', 500)
+
+
+def _explicit_ordre(forme_data):
+    ordre = forme_data.get('ordre')
+    return ordre if type(ordre) is int and ordre >= 0 else None
+
+
+def diff_formes(plan, formes_data, replace_all=False, elements_to_delete=()):
+    """
+    Compare les formes envoyées aux formes enregistrées du plan, en une requête
+    (identifiants, empreintes de contenu et ordre).
+
+    Ordre de dessin : un champ ``ordre`` envoyé avec la forme est repris tel
+    quel. Sinon, si la liste envoyée est complète (toutes les formes du plan
+    hors ``elements_to_delete``), l'ordre est la position dans la liste ; si
+    elle ne l'est pas, les formes existantes gardent leur ordre enregistré et
+    les nouvelles sont placées après les autres, dans l'ordre de la liste.
+
+    Retourne ``(à créer, à mettre à jour, ignorées, positions)`` : les formes
+    sans identifiant ou dont l'identifiant n'appartient pas au plan sont à
+    créer, celles dont l'empreinte et l'ordre n'ont pas changé sont ignorées.
+    ``positions`` donne la position dans ``formes_data`` de chaque forme à
+    créer. La version des formes retournées reste à renseigner.
+
+    Avec ``replace_all`` (formes existantes supprimées), toutes les formes
+    sont à créer et aucune requête n'est exécutée.
+    """
+    existing = {}
+    if not replace_all:
+        existing = {
+            forme_id: (content_hash, ordre)
+            for forme_id, content_hash, ordre in FormeGeometrique.objects.filter(
+                plan=plan
+            ).values_list('id', 'content_hash', 'ordre')
+        }
+    requested_ids = {forme_data.get('id') for forme_data in formes_data}
+    complete = existing.keys() <= requested_ids | set(elements_to_delete)
+    next_ordre = max((ordre for _, ordre in existing.values()), default=-1) + 1
+
+    to_create, to_update, skipped, positions = [], [], 0, []
+    for position, forme_data in enumerate(formes_data):
+        forme_id = forme_data.get('id')
+        type_forme = forme_data.get('type_forme')
+        data = forme_data.get('data', {})
+        content_hash = forme_content_hash(type_forme, data)
+        ordre = _explicit_ordre(forme_data)
+        if ordre is None:
+            if complete:
+                ordre = position
+            elif forme_id in existing:
+                ordre = existing[forme_id][1]
+            else:
+                ordre, next_ordre = next_ordre, next_ordre + 1
+        if existing.get(forme_id) == (content_hash, ordre):
+            skipped += 1
+            continue
+        forme = FormeGeometrique(plan=plan, type_forme=type_forme, data=data, ordre=ordre)
+        forme.compute_derived(content_hash)
+        if forme_id in existing:
+            forme.id = forme_id
+            to_update.append(forme)
+        else:
+            to_create.append(forme)
+            positions.append(position)
+    return to_create, to_update, skipped, positions
+
+
+def write_formes(to_create, to_update, version, batch_size=None):
+    """Écrit les formes par lots de ``batch_size`` (``bulk_create``/``bulk_update``)."""
+    batch_size = batch_size or get_batch_size()
+    for forme in (*to_create, *to_update):
+        forme.version = version
+    if to_create:
+        FormeGeometrique.objects.bulk_create(to_create, batch_size=batch_size)
+    if to_update:
+        FormeGeometrique.objects.bulk_update(
+            to_update, FORME_WRITE_FIELDS, batch_size=batch_size
+        )
+
+
+def get_max_retries():
+    return getattr(settings, 'PLAN_SAVE_MAX_RETRIES', 3)
+
+
+def save_plan_elements(plan, formes_data=(), elements_to_delete=(), clear_existing=False,
+                       preferences=None, expected_version=None, user=None):
+    """
+    Enregistre les éléments envoyés par l'éditeur : suppressions (tracées),
+    création/mise à jour des formes et préférences.
+
+    Seules les formes dont le contenu a changé sont écrites ; si rien n'a
+    changé, la version du plan n'est pas incrémentée. Le nombre de requêtes ne
+    dépend pas du nombre de formes (au nombre de lots près).
+
+    Concurrence optimiste : les formes sont comparées hors transaction, puis
+    l'écriture commence par un compare-and-swap sur la version du plan, seul
+    verrou de la transaction (courte). Avec ``expected_version`` (version
+    connue du client), un conflit lève ``VersionConflict`` ; sans, la
+    comparaison est refaite sur la nouvelle version (dernier écrivain gagnant).
+    Retourne la version du plan, les compteurs d'écriture et les identifiants
+    des formes créées (``ids`` : position dans ``formes_data`` -> identifiant).
+    """
+    for attempt in range(get_max_retries()):
+        base_version, current_preferences = (
+            Plan.objects.filter(pk=plan.pk).values_list('version', 'preferences').get()
+        )
+        if expected_version is not None and base_version != expected_version:
+            raise VersionConflict(base_version)
+
+        to_create, to_update, skipped, positions = diff_formes(
+            plan, formes_data, replace_all=clear_existing, elements_to_delete=elements_to_delete
+        )
+        preferences_changed = bool(preferences) and preferences != current_preferences
+        if not (clear_existing or elements_to_delete or to_create or to_update or preferences_changed):
+            plan.version = base_version
+            return {'version': base_version, 'created': 0, 'updated': 0, 'skipped': skipped, 'deleted': 0, 'ids': {}}
+
+        try:
+            with transaction.atomic():
+                # Nouvelle version du plan, reportée sur chaque élément écrit
+                version = plan.bump_version(expected_version=base_version)
+
+                deleted = 0
+                if clear_existing:
+                    deleted += plan.delete_elements(Connexion.objects.all(), version)
+                    deleted += plan.delete_elements(FormeGeometrique.objects.all(), version)
+                    deleted += plan.delete_elements(TexteAnnotation.objects.all(), version)
+                if elements_to_delete:
+                    deleted += plan.delete_elements(FormeGeometrique.objects.filter(id__in=elements_to_delete), version)
+
+                write_formes(to_create, to_update, version)
+
+                if preferences_changed:
+                    Plan.objects.filter(pk=plan.pk).update(preferences=preferences)
+                    plan.preferences = preferences
+
+                record_revision(plan, version, user)
+        except VersionConflict:
+            if expected_version is not None or attempt == get_max_retries() - 1:
+                raise
+            continue
+
+        return {
+            'version': version,
+            'created': len(to_create),
+            'updated': len(to_update),
+            'skipped': skipped,
+            'deleted': deleted,
+            # Identifiant attribué à chaque forme créée, par position dans formes_data
+            'ids': {position: forme.id for position, forme in zip(positions, to_create)},
+        }
+
+
+def restore_plan_revision(plan, revision, expected_version=None, user=None):
+    """
+    Rétablit le plan dans l'état de ``revision`` en écrivant une nouvelle
+    version (l'historique est conservé). Les formes supprimées depuis sont
+    recréées avec leur identifiant, sauf s'il a été réattribué à un autre plan.
+    Retourne la nouvelle version.
+    """
+    plan_fields, target = materialize(revision)
+    base_version = Plan.objects.filter(pk=plan.pk).values_list('version', flat=True).get()
+    if expected_version is not None and base_version != expected_version:
+        raise VersionConflict(base_version)
+
+    current = {
+        forme_id: (content_hash, ordre)
+        for forme_id, content_hash, ordre in FormeGeometrique.objects.filter(plan=plan).values_list(
+            'id', 'content_hash', 'ordre'
+        )
+    }
+    missing = target.keys() - current.keys()
+    taken = set(FormeGeometrique.objects.filter(id__in=missing).values_list('id', flat=True)) if missing else set()
+
+    to_create, to_update = [], []
+    for forme_id, type_forme, data, ordre in target.values():
+        content_hash = forme_content_hash(type_forme, data)
+        if current.get(forme_id) == (content_hash, ordre):
+            continue
+        forme = FormeGeometrique(plan=plan, type_forme=type_forme, data=data, ordre=ordre)
+        forme.compute_derived(content_hash)
+        if forme_id in current:
+            forme.id = forme_id
+            to_update.append(forme)
+        else:
+            forme.id = None if forme_id in taken else forme_id
+            to_create.append(forme)
+    to_delete = current.keys() - target.keys()
+
+    with transaction.atomic():
+        version = plan.bump_version(expected_version=base_version)
+        if to_delete:
+            plan.delete_elements(FormeGeometrique.objects.filter(id__in=to_delete), version)
+        write_formes(to_create, to_update, version)
+        Plan.objects.filter(pk=plan.pk).update(**plan_fields)
+        for name, value in plan_fields.items():
+            setattr(plan, name, value)
+        record_revision(plan, version, user)
+    return version
+
+
+BATCH_FIELDS = ('nom', 'description', 'preferences')
+BATCH_RELATIONS = {
+    'usine': 'USINE',
+    'concessionnaire': 'CONCESSIONNAIRE',
+    'agriculteur': 'AGRICULTEUR',
+}
+
+
+def _validate_batch_edit(edit, plan, users, user):
+    """
+    Valide la modification ``edit`` du plan et retourne ``(valeurs, erreurs)`` ;
+    ``valeurs`` associe les attributs du plan à leur nouvelle valeur.
+    """
+    values, errors = {}, {}
+    if 'nom' in edit:
+        if not isinstance(edit['nom'], str) or not edit['nom'].strip():
+            errors['nom'] = 'Le nom doit être une chaîne non vide.'
+        elif len(edit['nom']) > Plan._meta.get_field('nom').max_length:
+            errors['nom'] = 'Le nom est trop long.'
+        else:
+            values['nom'] = edit['nom']
+    if 'description' in edit:
+        if not isinstance(edit['description'], str):
+            errors['description'] = 'La description doit être une chaîne.'
+        else:
+            values['description'] = edit['description']
+    if 'preferences' in edit:
+        if not isinstance(edit['preferences'], dict):
+            errors['preferences'] = 'Les préférences doivent être un objet.'
+        else:
+            values['preferences'] = edit['preferences']
+
+    for field, role in BATCH_RELATIONS.items():
+        if field not in edit:
+            continue
+        related_id = edit[field]
+        if user.role == 'AGRICULTEUR':
+            errors[field] = 'Modification non autorisée.'
+        elif related_id is None:
+            values[f'{field}_id'] = None
+        elif not isinstance(related_id, int) or getattr(users.get(related_id), 'role', None) != role:
+            errors[field] = f'Utilisateur {role.lower()} introuvable : {related_id}'
+        else:
+            values[f'{field}_id'] = related_id
+    if errors:
+        return values, errors
+
+    # Cohérence de la hiérarchie après modification (mêmes règles que PlanSerializer)
+    final = {name: values.get(name, getattr(plan, name)) for name in ('usine_id', 'concessionnaire_id', 'agriculteur_id')}
+    if final['agriculteur_id'] and not final['concessionnaire_id']:
+        errors['concessionnaire'] = 'Un concessionnaire doit être spécifié si un agriculteur est assigné.'
+    if final['concessionnaire_id'] and not final['usine_id']:
+        errors['usine'] = 'Une usine doit être spécifiée si un concessionnaire est assigné.'
+    if values.get('agriculteur_id'):
+        # Si un agriculteur est assigné, il devient le créateur
+        values['createur_id'] = values['agriculteur_id']
+    return values, errors
+
+
+def batch_update_plans(queryset, edits, user):
+    """
+    Applique des modifications de champs à plusieurs plans en une transaction :
+    les plans de ``queryset`` (déjà restreint aux plans visibles par
+    ``user``) et les utilisateurs assignés sont chargés en une requête chacun,
+    puis les plans modifiés sont écrits par ``bulk_update``.
+
+    Chaque modification est un objet ``{"id": ..., "version": ..., <champs>}`` ;
+    ``version`` est optionnelle et rend l'écriture conditionnelle. Retourne un
+    statut par modification, dans l'ordre reçu : ``ok`` (avec la nouvelle
+    version), ``conflict`` (avec la version courante), ``not_found`` ou
+    ``invalid`` (avec les erreurs). Une modification refusée n'empêche pas
+    l'écriture des autres.
+    """
+    plan_ids = {edit.get('id') for edit in edits if isinstance(edit, dict) and isinstance(edit.get('id'), int)}
+    user_ids = {
+        edit[field]
+        for edit in edits if isinstance(edit, dict)
+        for field in BATCH_RELATIONS if isinstance(edit.get(field), int)
+    }
+
+    with transaction.atomic():
+        plans = queryset.filter(id__in=plan_ids).select_for_update().only(
+            'id', 'version', 'createur_id', 'usine_id', 'concessionnaire_id', 'agriculteur_id', *BATCH_FIELDS
+        ).in_bulk()
+        users = get_user_model().objects.filter(id__in=user_ids).only('id', 'role').in_bulk() if user_ids else {}
+
+        results, changed, fields, relations_changed, seen = [], [], set(), [], set()
+        now = timezone.now()
+        for edit in edits:
+            plan_id = edit.get('id') if isinstance(edit, dict) else None
+            if not isinstance(plan_id, int) or plan_id in seen:
+                results.append({'id': plan_id, 'status': 'invalid', 'errors': {'id': 'Identifiant invalide ou répété.'}})
+                continue
+            seen.add(plan_id)
+            plan = plans.get(plan_id)
+            if plan is None:
+                results.append({'id': plan_id, 'status': 'not_found'})
+                continue
+            if edit.get('version') is not None and edit['version'] != plan.version:
+                results.append({'id': plan_id, 'status': 'conflict', 'version': plan.version})
+                continue
+            values, errors = _validate_batch_edit(edit, plan, users, user)
+            if errors:
+                results.append({'id': plan_id, 'status': 'invalid', 'errors': errors})
+                continue
+
+            for name, value in values.items():
+                setattr(plan, name, value)
+            # Lignes verrouillées : l'incrément ne peut pas entrer en conflit
+            plan.version += 1
+            plan.date_modification = now
+            fields.update(values)
+            changed.append(plan)
+            if any(name.endswith('_id') for name in values):
+                relations_changed.append(plan_id)
+            results.append({'id': plan_id, 'status': 'ok', 'version': plan.version})
+
+        if changed:
+            Plan.objects.bulk_update(
+                changed, [*sorted(fields), 'version', 'date_modification'], batch_size=get_batch_size()
+            )
+            if relations_changed:
+                Plan.objects.filter(id__in=relations_changed).refresh_root_usine()
+            record_field_revisions(changed, user)
+    return results
@@ -0,0 +1,23 @@
+from django.conf import settings
+from django.db.models import Q
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+
+from authentication.models import Utilisateur
+
+from .models import Plan
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+def synchroniser_usine_des_plans(sender, instance, created, update_fields=None, **kwargs):
+    """
+    Répercute un changement de hiérarchie d'un utilisateur sur l'usine de
+    rattachement de ses plans (et de ceux de ses agriculteurs pour un concessionnaire).
+    """
+    if created:
+        return
+    if update_fields is not None and not Utilisateur.HIERARCHY_FIELDS & set(update_fields):
+        return
+    Plan.objects.filter(
+        Q(concessionnaire=instance) | Q(agriculteur=instance) | Q(agriculteur__concessionnaire=instance)
+    ).refresh_root_usine()
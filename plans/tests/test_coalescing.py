@@ -0,0 +1,114 @@
+import threading
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from plans.coalescing import PlanSaveCoalescer, SaveSnapshot, merge_snapshots, snapshot_ids
+
+
+def cercle(radius, forme_id=None):
+    forme = {'type_forme': 'CERCLE', 'data': {'center': [2.35, 48.85], 'radius': radius}}
+    return {'id': forme_id, **forme} if forme_id else forme
+
+
+class MergeSnapshotsTests(SimpleTestCase):
+    """Fusion des instantanés d'une fenêtre de regroupement."""
+
+    def test_latest_formes_and_union_of_deletions(self):
+        first = SaveSnapshot([cercle(5, forme_id=1)], elements_to_delete=[7], preferences={'a': 1})
+        last = SaveSnapshot([cercle(6, forme_id=1)], elements_to_delete=[8])
+        merged = merge_snapshots([first, last])
+        self.assertEqual(merged.formes_data, [cercle(6, forme_id=1)])
+        self.assertEqual(merged.elements_to_delete, [7, 8])
+        self.assertEqual(merged.preferences, {'a': 1})
+
+    def test_new_formes_of_earlier_snapshots_are_kept(self):
+        # Deux onglets : chacun ajoute sa forme, le dernier ne connaît pas celle de l'autre
+        first = SaveSnapshot([cercle(1), cercle(2)])
+        last = SaveSnapshot([cercle(1), cercle(3)])
+        merged = merge_snapshots([first, last])
+        self.assertEqual(merged.formes_data, [cercle(1), cercle(3), cercle(2)])
+
+    def test_repeated_snapshots_are_not_duplicated(self):
+        snapshots = [SaveSnapshot([cercle(1), cercle(1)]) for _ in range(3)]
+        self.assertEqual(merge_snapshots(snapshots).formes_data, [cercle(1), cercle(1)])
+
+    def test_ids_by_snapshot_position(self):
+        first = SaveSnapshot([cercle(2), cercle(9, forme_id=4)])
+        last = SaveSnapshot([cercle(9, forme_id=4), cercle(1)])
+        merged = merge_snapshots([first, last])
+        # Écriture : positions dans l'instantané fusionné -> identifiants créés
+        ids = {1: 101, 2: 102}
+        self.assertEqual(snapshot_ids(last, merged, ids), {1: 101})
+        self.assertEqual(snapshot_ids(first, merged, ids), {0: 102})
+
+
+class PlanSaveCoalescerTests(SimpleTestCase):
+    """File d'enregistrement : regroupement, identifiants et annulation."""
+
+    def setUp(self):
+        patcher = mock.patch('plans.coalescing.Plan.objects.get')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_snapshots_are_written_once(self):
+        calls = []
+
+        def save(plan, formes_data, **kwargs):
+            calls.append(formes_data)
+            return {'version': 2, 'created': 2, 'updated': 0, 'skipped': 0, 'deleted': 0,
+                    'ids': {position: 100 + position for position in range(len(formes_data))}}
+
+        coalescer = PlanSaveCoalescer(window=0.05, workers=2)
+        with mock.patch('plans.coalescing.save_plan_elements', side_effect=save):
+            first = coalescer.submit(1, SaveSnapshot([cercle(1)]))
+            last = coalescer.submit(1, SaveSnapshot([cercle(2)]))
+            results = first.result(timeout=5), last.result(timeout=5)
+
+        self.assertEqual(calls, [[cercle(2), cercle(1)]])
+        self.assertEqual([result['coalesced'] for result in results], [2, 2])
+        self.assertEqual(results[0]['ids'], {0: 101})
+        self.assertEqual(results[1]['ids'], {0: 100})
+
+    def test_cancel_before_write(self):
+        coalescer = PlanSaveCoalescer(window=60, workers=1)
+        with mock.patch('plans.coalescing.save_plan_elements') as save:
+            future = coalescer.submit(1, SaveSnapshot([cercle(1)]))
+            self.assertTrue(coalescer.cancel(1, future))
+            self.assertTrue(future.cancelled())
+            self.assertFalse(coalescer.cancel(1, future))
+        save.assert_not_called()
+
+    def test_cancel_during_write(self):
+        started, release = threading.Event(), threading.Event()
+
+        def save(plan, formes_data, **kwargs):
+            started.set()
+            release.wait(5)
+            return {'version': 2, 'created': 1, 'updated': 0, 'skipped': 0, 'deleted': 0, 'ids': {0: 100}}
+
+        coalescer = PlanSaveCoalescer(window=0.01, workers=1)
+        with mock.patch('plans.coalescing.save_plan_elements', side_effect=save):
+            future = coalescer.submit(1, SaveSnapshot([cercle(1)]))
+            self.assertTrue(started.wait(5))
+            # Lot en cours d'écriture : il ne peut plus être retiré
+            self.assertFalse(coalescer.cancel(1, future))
+            release.set()
+            self.assertEqual(future.result(timeout=5)['ids'], {0: 100})
+
+    def test_slow_plan_does_not_block_others(self):
+        release = threading.Event()
+
+        def save(plan, formes_data, **kwargs):
+            if formes_data == [cercle(1)]:
+                release.wait(5)
+            return {'version': 2, 'created': 0, 'updated': 0, 'skipped': 0, 'deleted': 0, 'ids': {}}
+
+        coalescer = PlanSaveCoalescer(window=0.01, workers=2)
+        with mock.patch('plans.coalescing.save_plan_elements', side_effect=save):
+            slow = coalescer.submit(1, SaveSnapshot([cercle(1)]))
+            fast = coalescer.submit(2, SaveSnapshot([cercle(2)]))
+            self.assertEqual(fast.result(timeout=5)['version'], 2)
+            self.assertFalse(slow.done())
+            release.set()
+            slow.result(timeout=5)
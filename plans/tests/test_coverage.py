@@ -0,0 +1,104 @@
+import math
+
+import numpy as np
+from django.test import SimpleTestCase
+
+from plans import geometry
+from plans.coverage import GridIndex, compute_coverage
+
+LNG0, LAT0 = 4.0, 45.0
+KX = geometry.METERS_PER_DEGREE * math.cos(math.radians(LAT0))
+
+
+def pt(x, y):
+    """Point à ``x`` m à l'est et ``y`` m au nord de l'origine."""
+    return [LNG0 + x / KX, LAT0 + y / geometry.METERS_PER_DEGREE]
+
+
+def rectangle(forme_id, x0, y0, x1, y1):
+    return forme_id, 'RECTANGLE', {'bounds': {'southWest': pt(x0, y0), 'northEast': pt(x1, y1)}}
+
+
+def cercle(forme_id, x, y, radius):
+    return forme_id, 'CERCLE', {'center': pt(x, y), 'radius': radius}
+
+
+# Lentille commune à deux cercles de rayon 20 m dont les centres sont à 10 m
+LENS = 2 * (400 * math.acos(0.25) - 5 * math.sqrt(375))
+
+
+class CoverageTests(SimpleTestCase):
+    """Surfaces couvertes, non couvertes et arrosées plusieurs fois."""
+
+    def assertArea(self, value, expected):
+        # Arcs approchés par des segments : écart inférieur à 0,2 %
+        self.assertAlmostEqual(value, expected, delta=expected * 0.002 + 0.01)
+
+    def test_circle_inside_parcel(self):
+        result = compute_coverage([rectangle(1, 0, 0, 100, 100), cercle(2, 50, 50, 20)])
+        self.assertArea(result['surface_parcelles'], 10000)
+        self.assertArea(result['surface_couverte'], math.pi * 400)
+        self.assertArea(result['surface_non_couverte'], 10000 - math.pi * 400)
+        self.assertEqual(result['surface_recouvrement'], 0)
+        parcelle, = result['parcelles']
+        self.assertEqual(parcelle['id'], 1)
+        self.assertArea(parcelle['taux_couverture'], math.pi * 400 / 100)
+
+    def test_overlapping_circles(self):
+        result = compute_coverage([rectangle(1, 0, 0, 100, 100), cercle(2, 50, 50, 20), cercle(3, 60, 50, 20)])
+        self.assertArea(result['surface_couverte'], 2 * math.pi * 400 - LENS)
+        self.assertArea(result['surface_recouvrement'], LENS)
+
+    def test_circle_clipped_by_parcel_and_half_circle(self):
+        result = compute_coverage([
+            rectangle(1, 0, 0, 100, 100),
+            (2, 'DEMI_CERCLE', {'center': pt(0, 0), 'radius': 30, 'startAngle': 0, 'endAngle': 90}),
+            cercle(3, 100, 100, 10),
+        ])
+        self.assertArea(result['surface_couverte'], math.pi * 900 / 4 + math.pi * 100 / 4)
+
+    def test_overlapping_parcels_are_counted_once(self):
+        result = compute_coverage([
+            rectangle(1, 0, 0, 100, 100), rectangle(2, 50, 0, 150, 100), cercle(3, 75, 50, 20),
+        ])
+        self.assertArea(result['surface_parcelles'], 15000)
+        self.assertArea(result['surface_couverte'], math.pi * 400)
+        self.assertEqual([parcelle['id'] for parcelle in result['parcelles']], [1, 2])
+        for parcelle in result['parcelles']:
+            self.assertArea(parcelle['surface_couverte'], math.pi * 400)
+
+    def test_invalid_emitters_are_ignored(self):
+        result = compute_coverage([
+            rectangle(1, 0, 0, 100, 100),
+            cercle(2, 50, 50, -3),
+            cercle(3, 50, 50, float('nan')),
+            (4, 'CERCLE', {'radius': 5}),
+        ])
+        self.assertEqual(result['emetteurs'], 0)
+        self.assertEqual(result['emetteurs_ignores'], 3)
+        self.assertEqual(result['surface_couverte'], 0)
+        self.assertEqual(result['parcelles'][0]['taux_couverture'], 0)
+
+    def test_pivot_among_small_sprinklers(self):
+        formes = [rectangle(1, 0, 0, 100, 100), cercle(2, 50, 50, 50000)]
+        formes += [cercle(10 + i, 10 + 20 * i, 10, 5) for i in range(5)]
+        result = compute_coverage(formes)
+        self.assertArea(result['surface_couverte'], 10000)
+        self.assertArea(result['surface_recouvrement'], 5 * math.pi * 25)
+
+    def test_no_parcel(self):
+        result = compute_coverage([cercle(1, 0, 0, 10)])
+        self.assertEqual(result['parcelles'], [])
+        self.assertIsNone(result['taux_couverture'])
+
+
+class GridIndexTests(SimpleTestCase):
+    def test_oversized_boxes_are_kept_apart(self):
+        boxes = np.array([[0, 0, 10, 10], [20, 0, 30, 10], [-1e5, -1e5, 1e5, 1e5]], dtype=np.float64)
+        index = GridIndex(boxes, cell_size=10.0, max_cells=16)
+        self.assertEqual(index.oversized.tolist(), [2])
+        self.assertLessEqual(len(index.keys), 8)
+        self.assertEqual(sorted(index.query((5, 5, 6, 6)).tolist()), [0, 2])
+        self.assertEqual(sorted(index.query((21, 1, 22, 2)).tolist()), [1, 2])
+        self.assertEqual(index.query((5e4, 5e4, 6e4, 6e4)).tolist(), [2])
+        self.assertEqual(index.query((2e5, 2e5, 3e5, 3e5)).tolist(), [])
@@ -0,0 +1,87 @@
+import math
+
+from django.test import SimpleTestCase
+
+from plans.measurements import AREA_RADIUS, DISTANCE_RADIUS, _Paths, measure_formes, ring_measures
+
+# Côté d'un carré de 0,001° sur l'équateur, pour la distance et pour la surface
+SIDE = DISTANCE_RADIUS * math.radians(0.001)
+AREA_SIDE = AREA_RADIUS * math.radians(0.001)
+SQUARE = [[0, 0], [0.001, 0], [0.001, 0.001], [0, 0.001]]
+
+
+class RingMeasuresTests(SimpleTestCase):
+    def test_closed_and_open_rings(self):
+        paths = _Paths()
+        paths.add(0, SQUARE)
+        paths.add(1, SQUARE + SQUARE[:1])
+        areas, perimeters = ring_measures(paths)
+        for area, perimeter in zip(areas, perimeters):
+            self.assertAlmostEqual(area, AREA_SIDE ** 2, delta=AREA_SIDE ** 2 * 1e-4)
+            self.assertAlmostEqual(perimeter, 4 * SIDE, delta=SIDE * 1e-4)
+        # Le sommet de fermeture répété ne change ni la surface ni le périmètre
+        self.assertAlmostEqual(areas[0], areas[1], places=6)
+        self.assertAlmostEqual(perimeters[0], perimeters[1], places=6)
+
+    def test_orientation_does_not_change_area(self):
+        paths = _Paths()
+        paths.add(0, SQUARE)
+        paths.add(1, SQUARE[::-1])
+        areas, _ = ring_measures(paths)
+        self.assertAlmostEqual(areas[0], areas[1], places=6)
+
+    def test_empty(self):
+        areas, perimeters = ring_measures(_Paths())
+        self.assertEqual((len(areas), len(perimeters)), (0, 0))
+
+
+class MeasureFormesTests(SimpleTestCase):
+    """Mesures par forme et totaux par type."""
+
+    def measures(self, *formes):
+        mesures, par_type, ignorees = measure_formes(formes)
+        return {mesure['id']: mesure for mesure in mesures}, par_type, ignorees
+
+    def test_circles(self):
+        mesures, par_type, _ = self.measures(
+            (1, 'CERCLE', {'center': [0, 0], 'radius': 10}),
+            (2, 'DEMI_CERCLE', {'center': [0, 0], 'radius': 10, 'startAngle': 0, 'endAngle': 180}),
+            # Angles égaux : cercle complet
+            (3, 'DEMI_CERCLE', {'center': [0, 0], 'radius': 10, 'startAngle': 90, 'endAngle': 90}),
+        )
+        self.assertAlmostEqual(mesures[1]['surface'], math.pi * 100)
+        self.assertAlmostEqual(mesures[1]['perimetre'], 2 * math.pi * 10)
+        # Un demi-cercle est fermé par son diamètre
+        self.assertAlmostEqual(mesures[2]['surface'], math.pi * 50)
+        self.assertAlmostEqual(mesures[2]['perimetre'], math.pi * 10 + 20)
+        self.assertAlmostEqual(mesures[3]['perimetre'], 2 * math.pi * 10)
+        self.assertEqual(par_type['DEMI_CERCLE']['nombre'], 2)
+        self.assertAlmostEqual(par_type['DEMI_CERCLE']['surface'], math.pi * 150)
+
+    def test_polygon_and_line(self):
+        mesures, par_type, _ = self.measures(
+            (1, 'POLYGON', {'points': SQUARE}),
+            (2, 'LIGNE', {'points': [[0, 0], [0.001, 0], [0.002, 0]]}),
+            (3, 'ELEVATIONLINE', {'points': [[0, 0], [0.001, 0]]}),
+        )
+        self.assertAlmostEqual(mesures[1]['surface'], AREA_SIDE ** 2, delta=AREA_SIDE ** 2 * 1e-4)
+        self.assertEqual(mesures[1]['longueur'], 0)
+        # Une ligne n'est pas refermée
+        self.assertAlmostEqual(mesures[2]['longueur'], 2 * SIDE, places=6)
+        self.assertEqual(mesures[2]['surface'], 0)
+        self.assertAlmostEqual(mesures[3]['longueur'], SIDE, places=6)
+        self.assertAlmostEqual(par_type['LIGNE']['longueur'], 2 * SIDE, places=6)
+
+    def test_ignored_formes(self):
+        mesures, par_type, ignorees = self.measures(
+            (1, 'TEXTE', {'content': 'Parcelle'}),
+            (2, 'POLYGON', {'points': []}),
+            (3, 'CERCLE', {'center': [0, 0]}),
+            (4, 'LIGNE', {'points': [[0, 0], [0.001, 0]]}),
+        )
+        self.assertEqual(list(mesures), [4])
+        self.assertEqual(list(par_type), ['LIGNE'])
+        self.assertEqual(ignorees, 3)
+
+    def test_empty(self):
+        self.assertEqual(measure_formes([]), ([], {}, 0))
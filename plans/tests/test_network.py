@@ -0,0 +1,108 @@
+import math
+
+from django.test import SimpleTestCase
+
+from plans.measurements import DISTANCE_RADIUS
+from plans.network import PipeNetwork
+
+# Longueur d'un pas de 0,001° le long de l'équateur
+STEP = DISTANCE_RADIUS * math.radians(0.001)
+
+
+def point(index):
+    return [index * 0.001, 0.0]
+
+
+def connexion(connexion_id, source, destination, types=('RECTANGLE', 'RECTANGLE')):
+    """Connexion rectiligne entre les formes ``source`` et ``destination``, placées à l'abscisse de leur identifiant."""
+    return (connexion_id, source, destination, *types, [point(source), point(destination)])
+
+
+class PipeNetworkTests(SimpleTestCase):
+    """Composantes, boucles, tronçons et chemins du réseau de canalisations."""
+
+    def assertLength(self, value, steps):
+        self.assertAlmostEqual(value, steps * STEP, places=3)
+
+    def test_chain(self):
+        network = PipeNetwork([
+            connexion(10, 1, 2),
+            connexion(11, 2, 3, types=('RECTANGLE', 'CERCLE')),
+        ])
+        summary = network.summary
+        self.assertEqual((summary['formes'], summary['connexions']), (3, 2))
+        self.assertLength(summary['longueur_totale'], 2)
+        self.assertFalse(summary['boucle'])
+        composante, = summary['composantes']
+        self.assertEqual(composante['formes'], [1, 2, 3])
+        self.assertEqual(composante['sources'], [1])
+        troncon, = summary['troncons']
+        self.assertEqual(sorted(troncon['formes']), [1, 3])
+        self.assertEqual(sorted(troncon['connexions']), [10, 11])
+        emetteur, = summary['emetteurs']
+        self.assertEqual((emetteur['id'], emetteur['source']), (3, 1))
+        self.assertLength(emetteur['longueur'], 2)
+
+        path = network.emitter_path(3)
+        self.assertEqual(path['formes'], [1, 2, 3])
+        self.assertEqual(path['connexions'], [10, 11])
+        self.assertLength(path['longueur'], 2)
+        # Ni une forme qui n'est pas un émetteur ni une forme absente du réseau
+        self.assertIsNone(network.emitter_path(2))
+        self.assertIsNone(network.emitter_path(99))
+
+    def test_branch(self):
+        network = PipeNetwork([
+            connexion(10, 1, 2),
+            connexion(11, 2, 3, types=('RECTANGLE', 'CERCLE')),
+            connexion(12, 2, 5, types=('RECTANGLE', 'DEMI_CERCLE')),
+        ])
+        troncons = {tuple(troncon['connexions']) for troncon in network.summary['troncons']}
+        self.assertEqual(troncons, {(10,), (11,), (12,)})
+        emetteurs = {emetteur['id']: emetteur['longueur'] for emetteur in network.summary['emetteurs']}
+        self.assertEqual(set(emetteurs), {3, 5})
+        self.assertLength(emetteurs[3], 2)
+        self.assertLength(emetteurs[5], 4)
+        self.assertEqual(network.emitter_path(5)['formes'], [1, 2, 5])
+
+    def test_loop(self):
+        network = PipeNetwork([connexion(10, 1, 2), connexion(11, 2, 3), connexion(12, 3, 1)])
+        summary = network.summary
+        self.assertTrue(summary['boucle'])
+        self.assertEqual(summary['connexions_en_boucle'], [12])
+        composante, = summary['composantes']
+        self.assertTrue(composante['boucle'])
+        # Aucune forme n'est seulement source : départ de la forme de plus petit identifiant
+        self.assertEqual(composante['sources'], [1])
+        troncon, = summary['troncons']
+        self.assertEqual(sorted(troncon['connexions']), [10, 11, 12])
+        self.assertLength(troncon['longueur'], 4)
+
+    def test_self_loop(self):
+        network = PipeNetwork([
+            (10, 1, 1, 'RECTANGLE', 'RECTANGLE', [point(1), point(1)]),
+            connexion(11, 1, 2, types=('RECTANGLE', 'CERCLE')),
+        ])
+        summary = network.summary
+        self.assertEqual(summary['formes'], 2)
+        self.assertEqual(summary['connexions_en_boucle'], [10])
+        self.assertEqual(network.component_count, 1)
+        self.assertEqual(sorted(tuple(troncon['connexions']) for troncon in summary['troncons']), [(10,), (11,)])
+        self.assertEqual(network.emitter_path(2)['connexions'], [11])
+
+    def test_separate_components(self):
+        network = PipeNetwork([connexion(10, 1, 2), connexion(11, 5, 6)])
+        self.assertEqual(network.component_count, 2)
+        self.assertEqual(
+            [composante['sources'] for composante in network.summary['composantes']], [[1], [5]]
+        )
+
+    def test_empty(self):
+        network = PipeNetwork([])
+        summary = network.summary
+        self.assertEqual((summary['formes'], summary['connexions']), (0, 0))
+        self.assertEqual(summary['longueur_totale'], 0)
+        self.assertEqual(summary['composantes'], [])
+        self.assertEqual(summary['troncons'], [])
+        self.assertEqual(summary['emetteurs'], [])
+        self.assertIsNone(network.emitter_path(1))
@@ -0,0 +1,188 @@
+"""
+Validation des données des formes.
+
+Chaque type de forme est décrit par un schéma (champs requis, champs
+optionnels, au moins un champ parmi un groupe) compilé une fois pour toutes
+en une fonction qui parcourt le dictionnaire brut en une passe : structure,
+types numériques, coordonnées ``[longitude, latitude]`` dans les limites,
+anneaux des polygones. Pas de machinerie de champs DRF, ce qui permet de
+valider des milliers de formes par enregistrement.
+"""
+import math
+
+_NUMBER_TYPES = (int, float)
+
+
+def _is_number(value):
+    # bool est une sous-classe d'int : on compare le type exact
+    return type(value) in _NUMBER_TYPES and math.isfinite(value)
+
+
+def _coord(value):
+    if type(value) not in (list, tuple) or len(value) != 2:
+        return "coordonnée [longitude, latitude] attendue"
+    lng, lat = value
+    if type(lng) not in _NUMBER_TYPES or type(lat) not in _NUMBER_TYPES:
+        return "coordonnées numériques attendues"
+    # Les comparaisons sont fausses pour NaN : rejeté comme hors limites
+    if not (-180 <= lng <= 180 and -90 <= lat <= 90):
+        return "coordonnées hors limites"
+    return None
+
+
+def _points(min_points):
+    def check(value):
+        if type(value) is not list or len(value) < min_points:
+            return f"au moins {min_points} points attendus"
+        for point in value:
+            error = _coord(point)
+            if error:
+                return error
+        return None
+    return check
+
+
+def _ring(value):
+    """Anneau d'un polygone : fermé ou non, au moins trois sommets distincts."""
+    error = _points(3)(value)
+    if error:
+        return error
+    closed = value[0] == value[-1]
+    if len(value) - closed < 3:
+        return "un anneau fermé nécessite au moins trois sommets distincts"
+    return None
+
+
+def _bounds(value):
+    if type(value) is not dict:
+        return "limites {southWest, northEast} attendues"
+    south_west, north_east = value.get('southWest'), value.get('northEast')
+    error = _coord(south_west) or _coord(north_east)
+    if error:
+        return error
+    if south_west[0] > north_east[0] or south_west[1] > north_east[1]:
+        return "southWest doit être au sud-ouest de northEast"
+    return None
+
+
+def _number(value):
+    return None if _is_number(value) else "nombre attendu"
+
+
+def _positive(value):
+    return None if _is_number(value) and value > 0 else "nombre strictement positif attendu"
+
+
+def _string(value):
+    return None if type(value) is str else "chaîne attendue"
+
+
+def _object(value):
+    return None if type(value) is dict else "objet attendu"
+
+
+def _list(value):
+    return None if type(value) is list else "liste attendue"
+
+
+# Champs communs à tous les types
+COMMON_FIELDS = {'style': _object, 'rotation': _number}
+
+
+def compile_schema(message, required, optional=None, one_of=()):
+    """
+    Compile un schéma en fonction de validation ``data -> message | None``.
+    ``message`` décrit les champs requis du type (message d'erreur historique).
+    """
+    required = tuple(required.items())
+    optional = tuple({**COMMON_FIELDS, **(optional or {})}.items())
+    one_of = tuple(one_of)
+
+    def validate(data):
+        for key, check in required:
+            if key not in data:
+                return message
+            error = check(data[key])
+            if error:
+                return f"{key} : {error}"
+        if one_of and not any(key in data for key in one_of):
+            return message
+        for key, check in optional:
+            value = data.get(key)
+            if value is not None:
+                error = check(value)
+                if error:
+                    return f"{key} : {error}"
+        return None
+
+    return validate
+
+
+SCHEMAS = {
+    'CERCLE': compile_schema(
+        "Un cercle nécessite un centre et un rayon",
+        {'center': _coord, 'radius': _positive},
+    ),
+    'DEMI_CERCLE': compile_schema(
+        "Un demi-cercle nécessite un centre, un rayon et des angles",
+        {'center': _coord, 'radius': _positive, 'startAngle': _number, 'endAngle': _number},
+    ),
+    'RECTANGLE': compile_schema(
+        "Un rectangle nécessite des limites (bounds)",
+        {'bounds': _bounds},
+    ),
+    'LIGNE': compile_schema(
+        "Une ligne nécessite des points",
+        {'points': _points(2)},
+    ),
+    'ELEVATIONLINE': compile_schema(
+        "Un profil altimétrique nécessite des points",
+        {'points': _points(2)},
+        {'elevationData': _list, 'samplePointStyle': _object, 'minMaxPointStyle': _object},
+    ),
+    'POLYGON': compile_schema(
+        "Un polygone nécessite des points",
+        {'points': _ring},
+    ),
+    # L'éditeur place les textes dans un rectangle (bounds), l'ancien format par une position
+    'TEXTE': compile_schema(
+        "Un texte nécessite une position et un contenu",
+        {'content': _string},
+        {'position': _coord, 'bounds': _bounds},
+        one_of=('position', 'bounds'),
+    ),
+}
+
+
+def validate_forme(type_forme, data):
+    """Retourne le message d'erreur des données de la forme, ou ``None`` si elles sont valides."""
+    validate = SCHEMAS.get(type_forme)
+    if validate is None:
+        return f"Type de forme invalide : {type_forme}"
+    if type(data) is not dict or not data:
+        return "Les données de la forme sont requises"
+    return validate(data)
+
+
+def validate_formes(formes_data):
+    """
+    Valide une liste de formes ``{"type_forme": ..., "data": ...}`` et
+    retourne les erreurs par position dans la liste (vide si tout est valide).
+    """
+    schemas = SCHEMAS
+    errors = {}
+    for index, forme in enumerate(formes_data):
+        if type(forme) is not dict:
+            errors[index] = "Objet attendu"
+            continue
+        type_forme, data = forme.get('type_forme'), forme.get('data')
+        validate = schemas.get(type_forme)
+        if validate is None:
+            errors[index] = f"Type de forme invalide : {type_forme}"
+        elif type(data) is not dict or not data:
+            errors[index] = "Les données de la forme sont requises"
+        else:
+            error = validate(data)
+            if error:
+                errors[index] = error
+    return errors